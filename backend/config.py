@@ -14,13 +14,19 @@ class AppConfig:
 
         # Scopus API Configuration
         self.scopus_api_key = os.getenv('SCOPUS_API_KEY')
+        self.scopus_api_keys = self._get_list_env('SCOPUS_API_KEYS',
+                                                  [self.scopus_api_key] if self.scopus_api_key else [])
         self.scopus_api_base = os.getenv('SCOPUS_API_BASE')
+        self.scopus_api_concurrency = int(os.getenv('SCOPUS_API_CONCURRENCY', '1'))
+        self.scopus_api_cursor = self._get_bool_env('SCOPUS_API_CURSOR', False)
 
         # Scopus Batch Configuration
         self.scopus_batch_cookie_file = os.getenv('SCOPUS_BATCH_COOKIE_FILE')
         self.scopus_batch_base = os.getenv('SCOPUS_BATCH_BASE', 'https://www.scopus.com')
         self.scopus_batch_cookie_jwt_domain = os.getenv('SCOPUS_BATCH_COOKIE_JWT_DOMAIN', '.scopus.com')
         self.scopus_batch_user_agent = os.getenv('SCOPUS_BATCH_USER_AGENT')
+        self.scopus_batch_concurrency = int(os.getenv('SCOPUS_BATCH_CONCURRENCY', '4'))
+        self.scopus_batch_profile = os.getenv('SCOPUS_BATCH_PROFILE', 'database')
 
         # Logging
         self.log_level = os.getenv('LOG_LEVEL', 'INFO')
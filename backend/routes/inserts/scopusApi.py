@@ -10,6 +10,7 @@ from database.dbInserts.scopusAPIInsert import scopusAPIInsert
 from backend.routes import logger
 from database.dbInsertsAIOptimised.scopusApiInsertOptimised import scopusAPIInsertOptimised
 from fetcher.scopus.api import ScopusApi
+from fetcher.scopus.models import PaginationMode
 
 ns_scopus_api = Namespace('scopus-api', description='Scopus API operations')
 insert_request_model = ns_scopus_api.model('SearchRequest', insert_request_fields)
@@ -45,9 +46,9 @@ class ScopusApiSearch(Resource):
             ssl_insecure = config.get_ssl_config()
             prod_proxies, debug_proxy = config.get_proxy_config()
 
-            if not config.scopus_api_base or not config.scopus_api_key:
+            if not config.scopus_api_base or not config.scopus_api_keys:
                 return {
-                    'error': 'SCOPUS_API_KEY and SCOPUS_API_BASE must be set in environment variables'
+                    'error': 'SCOPUS_API_KEY (or SCOPUS_API_KEYS) and SCOPUS_API_BASE must be set in environment variables'
                 }, 500
 
             logger.info(f'Scopus API search for: "{search_query}"')
@@ -61,11 +62,14 @@ class ScopusApiSearch(Resource):
 
                 :return: Search results from Scopus API containing academic publication data.
                 """
+                pagination = PaginationMode.CURSOR if config.scopus_api_cursor else PaginationMode.OFFSET
                 async with ScopusApi(
-                        api_key=config.scopus_api_key,
+                        api_key=config.scopus_api_keys,
                         api_endpoint=config.scopus_api_base,
                         proxies=prod_proxies if prod_proxies else None,
-                        verify_ssl=not ssl_insecure) as client:
+                        verify_ssl=not ssl_insecure,
+                        max_concurrency=config.scopus_api_concurrency,
+                        pagination=pagination) as client:
                     return await client.search(search_query)
 
             # Run the async function
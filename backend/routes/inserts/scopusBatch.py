@@ -1,6 +1,9 @@
 import asyncio
+import hashlib
 import os
+import tempfile
 import traceback
+from contextlib import ExitStack, closing
 
 from flask import request
 from flask_restx import Resource, Namespace
@@ -9,8 +12,11 @@ import http.cookies
 from backend.config import config
 from backend.models import insert_request_fields, insert_response_fields, error_response_fields
 from backend.routes import logger
-from database.dbInsertsAIOptimised.scopusBatchInsertOptimised import scopusBatchInsertOptimised
-from fetcher.scopus_batch.models import all_identifiers, ExportFileType
+from database.dbInsertsAIOptimised.scopusBatchInsertOptimised import scopusBatchInsertOptimised, \
+    scopusBatchBeginInsert, scopusBatchConsumedFields
+from database.insertFingerprint import getInsertByFingerprint, saveInsertFingerprint
+from fetcher.scopus_batch.cache import hash_file
+from fetcher.scopus_batch.models import ExportProfile, ExportFileType
 from fetcher.scopus_batch.parser import ScopusCsvParser
 from fetcher.scopus_batch.scraper import ScopusScraper, ScopusScraperConfig
 
@@ -53,11 +59,15 @@ class ScopusBatchExport(Resource):
             logger.info(f'Scopus batch export for: "{search_query}"')
             logger.info(f'SSL insecure: {ssl_insecure}, Debug proxy: {debug_proxy}')
 
-            # Use local file if provided
+            # The export is streamed into a temporary file and parsed from it
+            files = ExitStack()
+            export_file = None
+
+            # Use local file if provided (it is memory-mapped and parsed in place)
             if batch_file_path:
                 logger.info(f'Scopus batch: reading from local file: {batch_file_path}')
-                with open(batch_file_path, 'r') as b_file:
-                    export_data = b_file.read()
+                if os.path.getsize(batch_file_path) == 0:
+                    return {'error': 'No data was exported'}, 500
             else:
                 # Use cookies for web scraping
                 if not config.scopus_batch_cookie_file or not os.path.isfile(config.scopus_batch_cookie_file):
@@ -102,10 +112,9 @@ class ScopusBatchExport(Resource):
                     Execute asynchronous Scopus batch export using authenticated web scraping.
                     Creates ScopusScraper instance with complete cookie-based authentication including
                     JWT tokens, session identifiers, and load balancer cookies. Performs bulk export
-                    of search results in CSV format with all available publication identifiers.
+                    of search results in CSV format with the field groups of the configured export profile.
 
-                    :return: Raw CSV export data from Scopus batch export containing publication metadata.
-                    :rtype: str
+                    The raw CSV export data containing publication metadata is written to `export_file`.
                     """
                     async with ScopusScraper(ScopusScraperConfig(
                             user_agent=config.scopus_batch_user_agent,
@@ -116,36 +125,68 @@ class ScopusBatchExport(Resource):
                             sc_session_id=scopus_batch_sc_session_id.value),
                             verify_ssl=not ssl_insecure,
                             base_uri=config.scopus_batch_base,
-                            proxy=debug_proxy) as sc_batch:
-                        return await sc_batch.export_all(
+                            proxy=debug_proxy,
+                            max_concurrency=config.scopus_batch_concurrency) as sc_batch:
+                        await sc_batch.export_all(
                             search_query,
                             file_type=ExportFileType.CSV,
-                            fields=all_identifiers())
-
-                export_data = asyncio.run(run_scopus_batch())
-
-            if not export_data:
-                return {'error': 'No data was exported'}, 500
-
-            # Parse the CSV data
-            logger.info('Scopus batch: parsing data')
-            export_data = export_data.removeprefix('\ufeff')  # Remove BOM
-            parser = ScopusCsvParser(export_data)
-
-            scopus_batch_pubs = parser.read_all_publications()
-            logger.info(f'Parsed publications: {len(scopus_batch_pubs)}')
-
-            try:
-                insertCount = scopusBatchInsertOptimised(scopus_batch_pubs)
-                logger.info(f'Successfully inserted {len(scopus_batch_pubs)} records into database')
-                return {
-                    'success': True,
-                    'search_query': search_query,
-                    'count': insertCount
-                }
-            except Exception as db_error:
-                logger.error(f'Database insertion error: {str(db_error)}')
-                return {'error': str(db_error)}, 500
+                            fields=ExportProfile(config.scopus_batch_profile).identifiers(),
+                            sink=export_file)
+
+                export_file = files.enter_context(tempfile.TemporaryFile('w+', encoding='utf-8', newline=''))
+                asyncio.run(run_scopus_batch())
+                export_file.seek(0)
+
+            with files:
+                # Parse the CSV data (the parser removes the BOM) and insert it batch by batch,
+                # so the whole export is never held in memory. Only the stored columns are parsed.
+                if export_file is None:
+                    content_hash = hash_file(batch_file_path)
+                    # The memory map of the file is released on every path, including the early returns
+                    parser = files.enter_context(
+                        closing(ScopusCsvParser.from_file(batch_file_path, fields=scopusBatchConsumedFields())))
+                else:
+                    if not export_file.readline():
+                        return {'error': 'No data was exported'}, 500
+                    export_file.seek(0)
+                    export_hash = hashlib.sha256()
+                    for line in export_file:
+                        export_hash.update(line.encode('utf-8'))
+                    export_file.seek(0)
+                    content_hash = export_hash.hexdigest()
+                    parser = ScopusCsvParser(export_file, fields=scopusBatchConsumedFields())
+
+                # The same data (by its SHA-256 hash) was imported before, nothing to insert
+                previous_insert_id = getInsertByFingerprint('Scopus', content_hash)
+                if previous_insert_id is not None:
+                    logger.info(f'Scopus batch: the data was already imported (InsertLog {previous_insert_id})')
+                    return {
+                        'success': True,
+                        'search_query': search_query,
+                        'count': 0
+                    }
+                logger.info('Scopus batch: parsing and inserting data')
+
+                insert_id = None
+                insertCount = 0
+                for batch in parser.iter_batches():
+                    try:
+                        if insert_id is None:
+                            insert_id = scopusBatchBeginInsert()
+                        insertCount += scopusBatchInsertOptimised(batch, insert_id=insert_id)
+                    except Exception as db_error:
+                        logger.error(f'Database insertion error: {str(db_error)}')
+                        return {'error': str(db_error)}, 500
+                    logger.info(f'Parsed publications: {insertCount}')
+                if insert_id is not None:
+                    saveInsertFingerprint(insert_id, content_hash)
+
+            logger.info(f'Successfully inserted {insertCount} records into database')
+            return {
+                'success': True,
+                'search_query': search_query,
+                'count': insertCount
+            }
 
         except Exception as e:
             logger.error(f'Scopus batch export error: {str(e)}')
@@ -26,7 +26,7 @@ class Status(Resource):
                 '/system/status - This status endpoint'
             ],
             'environment': {
-                'scopus_api_configured': bool(config.scopus_api_key and config.scopus_api_base),
+                'scopus_api_configured': bool(config.scopus_api_keys and config.scopus_api_base),
                 'scopus_batch_configured': bool(config.scopus_batch_cookie_file),
             },
             'configuration': {
@@ -49,7 +49,7 @@ class Configuration(Resource):
                 'default_proxies': config.default_proxies
             },
             'api_configuration': {
-                'scopus_api_configured': bool(config.scopus_api_key and config.scopus_api_base),
+                'scopus_api_configured': bool(config.scopus_api_keys and config.scopus_api_base),
                 'scopus_batch_configured': bool(config.scopus_batch_cookie_file)
             },
             'logging': {
@@ -1,46 +1,109 @@
 import json
 import logging
 import os
-from typing import Optional
+from contextlib import nullcontext
+from datetime import date
+from typing import Optional, Callable, Any
 
 from httpx import NetworkError, HTTPError
 
 from cli.options import CommonFetcherOptions, FetcherModuleResult
-from cli.utils import write_dump
-from fetcher.exceptions import InvalidAPIKeyError
-from fetcher.scopus.api import ScopusApi
-from fetcher.scopus.models import SearchEntry
+from cli.utils import write_dump, open_dump
+from fetcher.exceptions import InvalidAPIKeyError, QuotaExceededError
+from fetcher.scopus.api import ScopusApi, SCOBUS_SEARCH_MAX_OFFSET
+from fetcher.scopus.cache import ResponseCache
+from fetcher.scopus.models import SearchEntry, PaginationMode
 
 
-async def use(options: CommonFetcherOptions, output_path: Optional[str] = None) -> FetcherModuleResult:
+def get_api_keys() -> list[str]:
+    """
+    Read the Elsevier API keys from the environment.
+
+    `SCOPUS_API_KEYS` holds a comma-separated list of keys. If it is not set, the single
+    `SCOPUS_API_KEY` key is used.
+    """
+    keys = [k.strip() for k in os.getenv('SCOPUS_API_KEYS', '').split(',') if k.strip()]
+    if len(keys) <= 0 and os.getenv('SCOPUS_API_KEY'):
+        keys = [os.getenv('SCOPUS_API_KEY')]
+    return keys
+
+
+async def use(options: CommonFetcherOptions,
+              output_path: Optional[str] = None,
+              concurrency: int = 1,
+              pagination: PaginationMode = PaginationMode.OFFSET,
+              cache_path: Optional[str] = None,
+              cache_ttl: float = ResponseCache.DEFAULT_TTL,
+              fields: Optional[list[str]] = None,
+              loaded_after: Optional[date] = None,
+              shard_by_year: bool = False,
+              on_batch: Optional[Callable[[list[SearchEntry]], Any]] = None) -> FetcherModuleResult:
+    """
+    Search the Elsevier API for `options.search_query`.
+
+    Without `on_batch`, all entries are collected and returned in the result. With `on_batch`,
+    every page of entries is handed to the callback as soon as it arrives and is not kept in memory
+    (the result then contains no entries), so memory usage does not depend on the result count.
+
+    With `cache_path`, result pages are cached in that file for `cache_ttl` seconds, so repeated
+    searches do not use up the API quota.
+
+    With `fields`, only these Scopus Search API fields are requested (see `SearchEntry.api_fields`),
+    the other attributes of the returned entries are left empty.
+
+    With `loaded_after`, only the records first loaded into Scopus after that date are searched for
+    (incremental harvest).
+
+    With `shard_by_year`, the search is split into publication year ranges small enough for
+    offset pagination, which are harvested concurrently.
+
+    The result is not `complete` if offset pagination stopped at its limit before all the results were fetched.
+    """
     errors = []
     logger = logging.getLogger(__name__)
 
-    scopus_key = os.getenv('SCOPUS_API_KEY')
+    scopus_keys = get_api_keys()
+    shard_size = SCOBUS_SEARCH_MAX_OFFSET if shard_by_year else None
     scopus_base = os.getenv('SCOPUS_API_BASE')
 
     r = []
-    if scopus_base is None or scopus_base is None:
-        e = ("Please set SCOPUS_API_KEY and SCOPUS_API_BASE in .env (check out .env.sample) or with "
-             "environment variables")
+    complete = True
+    if len(scopus_keys) <= 0 or scopus_base is None:
+        e = ("Please set SCOPUS_API_KEY (or SCOPUS_API_KEYS) and SCOPUS_API_BASE in .env (check out .env.sample) or "
+             "with environment variables")
         logger.critical(e)
         errors.append(e)
     else:
         try:
-            async with ScopusApi(
-                    api_key=scopus_key,
-                    api_endpoint=scopus_base,
-                    proxies=[options.debug_proxy],
-                    verify_ssl=options.verify_ssl) as client:
-                r = await client.search(options.search_query)
-                if output_path:
-                    write_dump(
-                        output_path,
-                        json.dumps([p.to_dict() for p in r], ensure_ascii=False),
-                        __name__,
-                        logger)
-                for entry in r:
-                    logger.debug(entry)
+            with ResponseCache(cache_path, ttl=cache_ttl) if cache_path else nullcontext() as cache:
+                async with ScopusApi(
+                        api_key=scopus_keys,
+                        api_endpoint=scopus_base,
+                        proxies=[options.debug_proxy],
+                        verify_ssl=options.verify_ssl,
+                        max_concurrency=concurrency,
+                        pagination=pagination,
+                        cache=cache,
+                        fields=fields) as client:
+                    if on_batch is None:
+                        r = await client.search(options.search_query, loaded_after=loaded_after,
+                                                shard_size=shard_size)
+                        if output_path:
+                            write_dump(
+                                output_path,
+                                json.dumps([p.to_dict() for p in r], ensure_ascii=False),
+                                __name__,
+                                logger)
+                        for entry in r:
+                            logger.debug(entry)
+                    else:
+                        await _stream_search(client, options.search_query, loaded_after, shard_size, output_path,
+                                             on_batch, logger)
+                    complete = not client.truncated
+                    for key, budget in client.rate_limit_budgets.items():
+                        logger.info(f'API key {key} budget: {budget}')
+                if cache is not None:
+                    logger.info(f'Response cache: {cache.hits} hits, {cache.misses} misses')
         except HTTPError as h_error:
             e = f'HTTP error: {h_error}'
             logger.error(e)
@@ -53,6 +116,39 @@ async def use(options: CommonFetcherOptions, output_path: Optional[str] = None)
             e = f'Invalid API key: {api_key_error}'
             logger.error(e)
             errors.append(e)
+        except QuotaExceededError as quota_error:
+            e = f'Quota exceeded: {quota_error}'
+            logger.error(e)
+            errors.append(e)
         except Exception as err:
             raise err
-    return FetcherModuleResult(module=__name__, results=r, errors=errors)
+    return FetcherModuleResult(module=__name__, results=r, errors=errors, complete=complete)
+
+
+async def _stream_search(client: ScopusApi,
+                         search_query: str,
+                         loaded_after: Optional[date],
+                         shard_size: Optional[int],
+                         output_path: Optional[str],
+                         on_batch: Callable[[list[SearchEntry]], Any],
+                         logger: logging.Logger):
+    output_file = open_dump(output_path, __name__, logger) if output_path else None
+    streamed_count = 0
+    try:
+        if output_file:
+            output_file.write('[')
+        async for batch in client.iter_search(search_query, loaded_after=loaded_after, shard_size=shard_size):
+            for entry in batch:
+                if output_file:
+                    if streamed_count > 0:
+                        output_file.write(', ')
+                    output_file.write(json.dumps(entry.to_dict(), ensure_ascii=False))
+                logger.debug(entry)
+                streamed_count += 1
+            on_batch(batch)
+            logger.info(f'streamed {streamed_count} entries')
+        if output_file:
+            output_file.write(']')
+    finally:
+        if output_file:
+            output_file.close()
@@ -19,6 +19,8 @@ class FetcherModuleResult:
     module: str
     results: Any
     errors: List[str]
+    # False if the module fetched only part of the results (e.g. a search over the API pagination limit)
+    complete: bool = True
 
     def get_error_message(self) -> Optional[str]:
         if len(self.errors) > 0:
@@ -1,22 +1,33 @@
+import csv
+import glob
+import hashlib
 import http.cookies
 import logging
 import os
-from typing import Optional, Any
+import tempfile
+import time
+from contextlib import ExitStack, closing
+from itertools import groupby
+from typing import Optional, Any, TextIO, Callable, Collection, Iterable, Iterator
 
 from httpx import NetworkError
 
 from cli.error_container import _ErrorContainer
 from cli.options import CommonFetcherOptions, FetcherModuleResult
-from cli.utils import write_dump
+from cli.utils import open_dump
 from fetcher.exceptions import InvalidCookiesError
 from fetcher.scopus_batch import consts
-from fetcher.scopus_batch.models import ExportFileType, all_identifiers
-from fetcher.scopus_batch.parser import ScopusCsvParser
+from fetcher.scopus_batch.cache import ParsedExportCache, hash_file
+from fetcher.scopus_batch.journal import ExportJournal
+from fetcher.scopus_batch.models import ExportFileType, ExportProfile
+from fetcher.scopus_batch.parser import ScopusCsvParser, parse_files_in_parallel
+from fetcher.scopus_batch.parser_models import ParsedFilePart, Publication
 from fetcher.scopus_batch.scraper import ScopusScraper, ScopusScraperConfig
 
 ENV_BATCH_COOKIE_FILE = 'SCOPUS_BATCH_COOKIE_FILE'
 ENV_BATCH_BASE = 'SCOPUS_BATCH_BASE'
 ENV_BATCH_COOKIE_JWT_DOMAIN = 'SCOPUS_BATCH_COOKIE_JWT_DOMAIN'
+ENV_BATCH_JOURNAL_DIR = 'SCOPUS_BATCH_JOURNAL_DIR'
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -51,13 +62,51 @@ def save_cookies(config: ScopusScraperConfig, filename: str):
 
 async def use(options: CommonFetcherOptions,
               input_file_path:Optional[str] = None,
-              raw_output_path: Optional[str] = None) -> FetcherModuleResult:
+              raw_output_path: Optional[str] = None,
+              concurrency: int = ScopusScraper.DEFAULT_MAX_CONCURRENCY,
+              shard_by_year: bool = False,
+              profile: ExportProfile = ExportProfile.DATABASE,
+              resume: bool = False,
+              skip_eids: Optional[Callable[[list[str]], Collection[str]]] = None,
+              on_batch: Optional[Callable[[list[Publication]], Any]] = None,
+              fields: Optional[Collection[str]] = None,
+              parse_workers: int = 1,
+              cache_path: Optional[str] = None,
+              is_imported: Optional[Callable[[str], bool]] = None,
+              on_imported: Optional[Callable[[str], Any]] = None,
+              on_import_end: Optional[Callable[[], Any]] = None) -> FetcherModuleResult:
+    """
+    Export `options.search_query` from Scopus (or read the `input_file_path` dumps) and parse the publications.
+
+    `input_file_path` is a dump file, a directory (all of its .csv files are read) or a glob pattern.
+    The dumps are read one after another, a dump which cannot be parsed is reported and the others are still read.
+
+    Without `on_batch`, all publications are collected and returned in the result. With `on_batch`,
+    the publications are handed to the callback in batches while the export is parsed and are not kept
+    in memory (the result then contains no publications), so memory usage does not depend on the export size.
+
+    With `fields`, only these Publication attributes are parsed (see `ScopusCsvParser`),
+    the other attributes of the publications are left empty.
+
+    With `parse_workers` greater than 1, the `input_file_path` dumps are parsed in that many processes
+    (see `parse_files_in_parallel`), while the parsed publications are handed to `on_batch` in this process.
+
+    With `cache_path`, the publications parsed from the `input_file_path` dumps are cached in that file
+    (see `ParsedExportCache`), so importing the same dump again does not parse it again.
+
+    The CSV data (the export, or each dump) is identified by its SHA-256 hash (its fingerprint). With `is_imported`,
+    the data is not parsed at all if the callback returns True for its fingerprint (the same data was imported before).
+    `on_imported` is called with the fingerprint once all the publications were parsed (and handed to `on_batch`).
+    `on_import_end` is called after the export, or each dump, was imported, whether it succeeded or failed
+    (e.g. to start a new import for the next dump).
+    """
     errors = _ErrorContainer(logger)
 
     logger.debug('using Scopus batch export')
     cookie_file_path = os.getenv(ENV_BATCH_COOKIE_FILE)
     scopus_batch_uri = os.getenv(ENV_BATCH_BASE)
     scopus_cookie_domain_name = os.getenv(ENV_BATCH_COOKIE_JWT_DOMAIN)
+    journal_dir = os.getenv(ENV_BATCH_JOURNAL_DIR) or os.path.join(tempfile.gettempdir(), 'scopus-batch-journals')
 
     if not scopus_cookie_domain_name:
         logger.warning(f'SCOPUS_BATCH_COOKIE_JWT_DOMAIN not set, defaulting to .scopus.com')
@@ -66,11 +115,18 @@ async def use(options: CommonFetcherOptions,
         logger.warning(f'SCOPUS_BATCH_BASE not set, defaulting to {ScopusScraper.BASE_URI}')
         scopus_batch_uri = ScopusScraper.BASE_URI
 
-    export_data = None
+    # The export is streamed into a temporary file (and the raw output file), then parsed from it,
+    # so it is never held in memory as a whole (a local dump is parsed from the file itself)
+    files = ExitStack()
+    export_file: Optional[TextIO] = None
+    export_hash = hashlib.sha256()
+    input_paths = []
     if input_file_path is not None:
-        logger.info(f'reading from local file: {input_file_path}')
-        with open(input_file_path, 'r') as b_file:
-            export_data = b_file.read()
+        input_paths = _expand_input_paths(input_file_path)
+        if not input_paths:
+            errors.add_error(f'No Scopus batch dump found (path: "{input_file_path}")')
+        for path in input_paths:
+            logger.info(f'reading from local file: {path}')
     elif not os.path.isfile(cookie_file_path):
         errors.add_error(f'SCOPUS_BATCH_COOKIE_FILE file does not exist (path: "{cookie_file_path}")')
     else:
@@ -105,19 +161,35 @@ async def use(options: CommonFetcherOptions,
                                                          sc_session_id=scopus_batch_sc_session_id.value),
                                      verify_ssl=options.verify_ssl,
                                      base_uri=scopus_batch_uri,
-                                     proxy=options.debug_proxy) as sc_batch:
+                                     proxy=options.debug_proxy,
+                                     max_concurrency=concurrency,
+                                     on_cookies_refreshed=lambda c: save_cookies(c, cookie_file_path)) as sc_batch:
                 from httpx import HTTPError
+                export_file = files.enter_context(tempfile.TemporaryFile('w+', encoding='utf-8', newline=''))
+                raw_output_file = open_dump(raw_output_path, f_module=__name__, logger=logger) \
+                    if raw_output_path else None
+                if raw_output_file is not None:
+                    files.enter_context(raw_output_file)
+                shard_size = ScopusScraper.MAX_EXPORT_SHARD_SIZE if shard_by_year else None
+                # Every export is journaled, so an interrupted one can be continued with `resume`
+                journal = ExportJournal.for_export(journal_dir, options.search_query, ExportFileType.CSV,
+                                                   profile.identifiers(), shard_size=shard_size,
+                                                   skip_known=skip_eids is not None,
+                                                   batch_prefix=ScopusScraper.get_batch_id_prefix(), resume=resume)
                 try:
-                    export_data = await sc_batch.export_all(
-                        options.search_query,
-                        file_type=ExportFileType.CSV,
-                        fields=all_identifiers())
-                    if raw_output_path:
-                        write_dump(
-                            raw_output_path,
-                            export_data,
-                            f_module=__name__,
-                            logger=logger)
+                    async for part in sc_batch.iter_export(
+                            options.search_query,
+                            file_type=ExportFileType.CSV,
+                            fields=profile.identifiers(),
+                            shard_size=shard_size,
+                            journal=journal,
+                            skip_eids=skip_eids):
+                        export_file.write(part)
+                        export_hash.update(part.encode('utf-8'))
+                        if raw_output_file is not None:
+                            raw_output_file.write(part)
+                    export_file.seek(0)
+                    journal.remove()
                 except HTTPError as h_error:
                     errors.add_error(f'HTTP error: {h_error}')
                 except NetworkError as n_error:
@@ -127,22 +199,152 @@ async def use(options: CommonFetcherOptions,
                 except Exception as err:
                     raise err
                 finally:
-                    new_cookies = sc_batch.get_cookies()
-                    if new_cookies is not None:
-                        save_cookies(new_cookies, cookie_file_path)
+                    if errors.get_errors():
+                        logger.info(f'the export can be continued with --resume (journal: "{journal.path}")')
 
     scopus_batch_pubs = []
-    try:
-        if export_data:
-            logger.debug('parsing data')
-            # TODO: Find a more elegant solution for handling BOM?
-            export_data = export_data.removeprefix('\ufeff')
-            parser = ScopusCsvParser(export_data)
-
-            scopus_batch_pubs = parser.read_all_publications()
-            logger.info(f'parsed publications: {len(scopus_batch_pubs)}')
-            for pub in scopus_batch_pubs:
-                logger.debug(pub.to_debug_string())
-    except ValueError as v_error:
-        errors.add_error(str(v_error))
+
+    def import_batches(batches: Iterable[list[Publication]], content_hash: Optional[str]) -> int:
+        parsed_count = 0
+        try:
+            for batch in batches:
+                for pub in batch:
+                    logger.debug(pub.to_debug_string())
+                if on_batch is None:
+                    scopus_batch_pubs.extend(batch)
+                else:
+                    on_batch(batch)
+                parsed_count += len(batch)
+                logger.info(f'parsed publications: {parsed_count}')
+            if on_imported is not None:
+                on_imported(content_hash)
+        finally:
+            if on_import_end is not None:
+                on_import_end()
+        return parsed_count
+
+    with files:
+        if export_file is not None and not errors.get_errors():
+            # Identifies the CSV data, to skip repeated imports
+            content_hash = export_hash.hexdigest()
+            if is_imported is not None and is_imported(content_hash):
+                logger.info(f'the same data was already imported, skipping it (SHA-256: {content_hash})')
+            else:
+                try:
+                    logger.debug('parsing data')
+                    import_batches(ScopusCsvParser(export_file, fields=fields).iter_batches(), content_hash)
+                except (ValueError, csv.Error) as v_error:
+                    errors.add_error(str(v_error))
+        elif input_paths:
+            _import_dumps(input_paths, import_batches, errors, fields, parse_workers, cache_path, is_imported,
+                          hash_dumps=bool(cache_path) or is_imported is not None or on_imported is not None)
     return FetcherModuleResult(module=__name__, results=scopus_batch_pubs, errors=errors.get_errors())
+
+
+def _expand_input_paths(input_path: str) -> list[str]:
+    """The dump files of a file path, a directory (its .csv files) or a glob pattern, in name order."""
+    if os.path.isfile(input_path):
+        return [input_path]
+    if os.path.isdir(input_path):
+        input_path = os.path.join(glob.escape(input_path), '*.csv')
+    return sorted(path for path in glob.glob(input_path) if os.path.isfile(path))
+
+
+def _import_dumps(paths: list[str],
+                  import_batches: Callable[[Iterable[list[Publication]], Optional[str]], int],
+                  errors: _ErrorContainer,
+                  fields: Optional[Collection[str]],
+                  parse_workers: int,
+                  cache_path: Optional[str],
+                  is_imported: Optional[Callable[[str], bool]],
+                  hash_dumps: bool):
+    """
+    Parse the local dumps (from the parsed-data cache if possible) and import them one after another.
+
+    The dumps are parsed ahead in the worker processes, but imported in this process only, so there is
+    a single writer. The status of each dump and the overall import rate are logged.
+    """
+    started = time.perf_counter()
+    statuses = {}
+    imported_count = 0
+
+    def report(path: str, status: str, count: int = 0, seconds: float = 0.0):
+        statuses[status] = statuses.get(status, 0) + 1
+        logger.info(f'{path}: {status}, {count} publications ({_rate(count, seconds):.0f} rows/s)')
+
+    def import_dump(path: str, status: str, batches: Iterable[list[Publication]], content_hash: Optional[str]):
+        nonlocal imported_count
+        dump_started = time.perf_counter()
+        try:
+            count = import_batches(batches, content_hash)
+        except (OSError, ValueError, csv.Error) as error:
+            errors.add_error(f'{path}: {error}')
+            status, count = 'failed', 0
+        imported_count += count
+        report(path, status, count, time.perf_counter() - dump_started)
+
+    with ExitStack() as files:
+        cache = files.enter_context(ParsedExportCache(cache_path)) if cache_path else None
+
+        # (path, content hash, cache key) of the dumps to parse
+        pending = []
+        for path in paths:
+            try:
+                content_hash = hash_file(path) if hash_dumps else None
+            except OSError as os_error:
+                errors.add_error(f'{path}: {os_error}')
+                report(path, 'failed')
+                continue
+            if is_imported is not None and is_imported(content_hash):
+                logger.info(f'{path}: the same data was already imported (SHA-256: {content_hash})')
+                report(path, 'skipped')
+                continue
+            cache_key = ParsedExportCache.build_key(content_hash, fields) if cache is not None else None
+            cached_batches = cache.get(cache_key) if cache is not None else None
+            if cached_batches is not None:
+                import_dump(path, 'cached', cached_batches, content_hash)
+            else:
+                pending.append((path, content_hash, cache_key))
+
+        if parse_workers > 1 and pending:
+            logger.debug(f'parsing data in {parse_workers} processes')
+            parts = parse_files_in_parallel([path for path, _, _ in pending], workers=parse_workers, fields=fields)
+            # Stops the worker processes if the import is interrupted
+            files.callback(parts.close)
+            parsed = (_iter_part_batches(group) for _, group in groupby(parts, key=lambda part: part.path))
+        else:
+            # The local dumps are memory-mapped and parsed in place
+            parsed = (_iter_file_batches(path, fields) for path, _, _ in pending)
+
+        for (path, content_hash, cache_key), batches in zip(pending, parsed):
+            if cache is not None:
+                batches = cache.put(cache_key, batches)
+            try:
+                import_dump(path, 'imported', batches, content_hash)
+            finally:
+                # An incomplete cache entry is rolled back
+                if cache is not None:
+                    batches.close()
+
+    elapsed = time.perf_counter() - started
+    summary = ', '.join(f'{count} {status}' for status, count in sorted(statuses.items()))
+    logger.info(f'imported {imported_count} publications from {len(paths)} files ({summary}) '
+                f'in {elapsed:.1f} s ({_rate(imported_count, elapsed):.0f} rows/s)')
+
+
+def _iter_file_batches(path: str, fields: Optional[Collection[str]]) -> Iterator[list[Publication]]:
+    logger.debug(f'parsing data: {path}')
+    with closing(ScopusCsvParser.from_file(path, fields=fields)) as parser:
+        yield from parser.iter_batches()
+
+
+def _iter_part_batches(parts: Iterable[ParsedFilePart]) -> Iterator[list[Publication]]:
+    for part in parts:
+        if part.error is not None:
+            raise part.error
+        if part.publications:
+            yield part.publications
+
+
+def _rate(count: int, seconds: float) -> float:
+    return count / seconds if seconds > 0 else 0.0
@@ -1,5 +1,5 @@
 import logging
-from typing import AnyStr
+from typing import AnyStr, Optional, TextIO
 
 
 def write_dump(filename: str, data: AnyStr, f_module: str, logger: logging.Logger):
@@ -32,4 +32,33 @@ def write_dump(filename: str, data: AnyStr, f_module: str, logger: logging.Logge
     except IsADirectoryError as e:
         logger.error(f'{f_module}: output file path "{e.filename}" is a directory')
     except OSError as e:
-        logger.error(f'{f_module}: os error [{e.errno}] {e.strerror}')
\ No newline at end of file
+        logger.error(f'{f_module}: os error [{e.errno}] {e.strerror}')
+
+
+def open_dump(filename: str, f_module: str, logger: logging.Logger) -> Optional[TextIO]:
+    """
+    Open a file for writing a dump incrementally, logging progress and any errors encountered.
+
+    :param filename: Path to the file where data will be written.
+    :type filename: str
+    :param f_module: Name of the calling module or function, used in log messages.
+    :type f_module: str
+    :param logger: Logger instance used for informational and error messages.
+    :type logger: logging.Logger
+
+    :returns: The opened file (the caller is responsible for closing it) or None, if the file could not be opened.
+    :rtype: Optional[TextIO]
+
+    :note: Errors are handled the same way as in `write_dump`: they are logged and not propagated.
+    """
+
+    logger.info(f'{f_module}: writing output to "{filename}"')
+    try:
+        return open(filename, 'w')
+    except PermissionError as e:
+        logger.error(f'{f_module}: permission denied to output file: {e.filename}')
+    except IsADirectoryError as e:
+        logger.error(f'{f_module}: output file path "{e.filename}" is a directory')
+    except OSError as e:
+        logger.error(f'{f_module}: os error [{e.errno}] {e.strerror}')
+    return None
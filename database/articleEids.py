@@ -0,0 +1,21 @@
+from typing import Iterable
+
+from database.dbContext import get_db
+from database.dbInsertsAIOptimised.scopusBatchInsertOptimised import batch_lookup_existing_eids
+
+
+def getKnownEids(eids: Iterable[str]) -> set[str]:
+    """
+    Find out which Scopus documents are already stored in the database.
+
+    :param Iterable[str] eids: EIDs of the documents (e.g. "2-s2.0-85000000000").
+    :return: The EIDs of the documents with an Article row.
+    :rtype: set[str]
+    """
+    db = get_db()
+    cursor = db.cursor()
+
+    try:
+        return batch_lookup_existing_eids(list(dict.fromkeys(eid for eid in eids if eid)), cursor)
+    finally:
+        cursor.close()
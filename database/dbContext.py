@@ -37,3 +37,36 @@ def create_db_if_missing():
         sql_script = pkgutil.get_data('database', 'dbCreateScript.sql').decode('utf-8')
         cursor.executescript(sql_script)
         db.commit()
+    else:
+        migrate_db(db)
+    db.close()
+
+
+def migrate_db(db):
+    """
+    Bring a database created by an older version up to date with dbCreateScript.sql.
+    Every step must be safe to run again.
+    """
+    cursor = db.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS "HarvestWatermark" (
+            "ID"	INTEGER,
+            "Source"	TEXT NOT NULL,
+            "Query"	TEXT NOT NULL,
+            "LastRunTimestamp"	TEXT NOT NULL,
+            "MaxCoverDate"	TEXT,
+            "LastInsertID"	INTEGER,
+            PRIMARY KEY("ID" AUTOINCREMENT),
+            UNIQUE("Source", "Query"),
+            CONSTRAINT "FK_Insert" FOREIGN KEY("LastInsertID") REFERENCES "InsertLog"("ID")
+        )
+    """)
+    article_columns = [row[1] for row in cursor.execute('PRAGMA table_info("Article")')]
+    if 'EID' not in article_columns:
+        cursor.execute('ALTER TABLE "Article" ADD COLUMN "EID" TEXT')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_article_eid ON Article(EID)')
+    insert_log_columns = [row[1] for row in cursor.execute('PRAGMA table_info("InsertLog")')]
+    if 'Fingerprint' not in insert_log_columns:
+        cursor.execute('ALTER TABLE "InsertLog" ADD COLUMN "Fingerprint" TEXT')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_insertlog_fingerprint ON InsertLog(Source, Fingerprint)')
+    db.commit()
@@ -25,6 +25,7 @@ CREATE TABLE IF NOT EXISTS "Article" (
 	"SubType"	TEXT,
 	"CitedByCount"	INTEGER,
 	"Sponsor"	TEXT,
+	"EID"	TEXT,
 	"InsertID"	INTEGER NOT NULL,
 	PRIMARY KEY("ID" AUTOINCREMENT),
 	CONSTRAINT "FK_Insert" FOREIGN KEY("InsertID") REFERENCES "InsertLog"("ID")
@@ -70,8 +71,20 @@ CREATE TABLE IF NOT EXISTS "InsertLog" (
 	"InsertTimestamp"	TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
 	"ArticleInsertCount"	INTEGER,
 	"Source"	TEXT,
+	"Fingerprint"	TEXT,
 	PRIMARY KEY("ID" AUTOINCREMENT)
 );
+CREATE TABLE IF NOT EXISTS "HarvestWatermark" (
+	"ID"	INTEGER,
+	"Source"	TEXT NOT NULL,
+	"Query"	TEXT NOT NULL,
+	"LastRunTimestamp"	TEXT NOT NULL,
+	"MaxCoverDate"	TEXT,
+	"LastInsertID"	INTEGER,
+	PRIMARY KEY("ID" AUTOINCREMENT),
+	UNIQUE("Source", "Query"),
+	CONSTRAINT "FK_Insert" FOREIGN KEY("LastInsertID") REFERENCES "InsertLog"("ID")
+);
 CREATE TABLE IF NOT EXISTS "Keywords" (
 	"ID"	INTEGER NOT NULL,
 	"Keyword"	TEXT,
@@ -82,3 +95,5 @@ CREATE TABLE IF NOT EXISTS "Keywords" (
 CREATE INDEX idx_author_sourceid ON Author(SourceID);
 CREATE INDEX idx_affiliation_sourceid ON Affiliation(SourceID);
 CREATE INDEX idx_keywords_keyword ON Keywords(Keyword);
+CREATE INDEX idx_article_eid ON Article(EID);
+CREATE INDEX idx_insertlog_fingerprint ON InsertLog(Source, Fingerprint);
@@ -280,8 +280,8 @@ def insert_article(article: SearchEntry, insert_id: int, cursor) -> int:
                 SourceID, SourceURL, Name, PublishDate,
                 ISSN, EISSN, Volume, Description, Type,
                 SubType, CitedByCount, Sponsor, 
-                InsertID
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                EID, InsertID
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             's' + article.identifier,
             article.url,
@@ -295,6 +295,7 @@ def insert_article(article: SearchEntry, insert_id: int, cursor) -> int:
             article.subtype_description,
             article.citedby_count,
             article.fundSponsor,
+            article.eid,
             insert_id
         ))
         article_id = cursor.lastrowid
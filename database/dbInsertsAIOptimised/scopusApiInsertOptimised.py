@@ -1,10 +1,52 @@
+from typing import Optional
+
 from database.dbContext import get_db
+from database.dbInsertsAIOptimised.scopusBatchInsertOptimised import (batch_lookup_existing_articles,
+                                                                     batch_lookup_existing_eids)
 from fetcher.scopus.models import *
 
+# SearchEntry attributes read by scopusAPIInsertOptimised
+# (fetcher/tests/test_consumed_attributes.py fails if the inserts below read anything else)
+CONSUMED_ATTRIBUTES = (
+    'eid', 'doi', 'identifier', 'url', 'title', 'cover_date', 'issn', 'eissn', 'volume', 'description',
+    'aggregation_type', 'subtype_description', 'citedby_count', 'fundSponsor', 'authkeywords',
+    'authors.authid', 'authors.author_url', 'authors.authname', 'authors.surname', 'authors.given_name',
+    'authors.initials',
+    'affiliations.afid', 'affiliations.affiliation_url', 'affiliations.affilname',
+    'affiliations.affiliation_country', 'affiliations.affiliation_city'
+)
+
+
+def scopusAPIConsumedFields() -> list[str]:
+    """
+    Scopus Search API fields needed by scopusAPIInsertOptimised.
+    Requesting only these (the `fields` option of ScopusApi) makes the responses smaller.
+    """
+    return SearchEntry.api_fields(CONSUMED_ATTRIBUTES)
+
+
+def scopusAPIBeginInsert() -> int:
+    """
+    Create an empty InsertLog row for entries that will be inserted batch by batch.
+    The returned ID is meant to be passed to scopusAPIInsertOptimised as `insert_id`.
+    """
+    db = get_db()
+    cursor = db.cursor()
+
+    try:
+        cursor.execute("INSERT INTO InsertLog (Source, articleInsertCount) VALUES (?, ?)", ("Scopus", 0))
+        db.commit()
+        return cursor.lastrowid
+    finally:
+        cursor.close()
+
 
-def scopusAPIInsertOptimised(data: list[SearchEntry]) -> int:
+def scopusAPIInsertOptimised(data: list[SearchEntry], insert_id: Optional[int] = None) -> int:
     """
     Optimized version with batch operations and reduced database roundtrips.
+    Entries whose articles are already stored (by EID or DOI) are skipped, e.g. the overlap of incremental harvests.
+    When `insert_id` is given, the entries are added to that (already existing) InsertLog row,
+    which allows inserting a streamed search result one page at a time.
     """
     db = get_db()
     cursor = db.cursor()
@@ -12,8 +54,28 @@ def scopusAPIInsertOptimised(data: list[SearchEntry]) -> int:
     try:
         insert_count = len(data)
 
-        cursor.execute("INSERT INTO InsertLog (Source, articleInsertCount) VALUES (?, ?)", ("Scopus", insert_count))
-        insert_id = cursor.lastrowid
+        if insert_id is None:
+            cursor.execute("INSERT INTO InsertLog (Source, articleInsertCount) VALUES (?, ?)",
+                           ("Scopus", insert_count))
+            insert_id = cursor.lastrowid
+        else:
+            cursor.execute("UPDATE InsertLog SET articleInsertCount = articleInsertCount + ? WHERE ID = ?",
+                           (insert_count, insert_id))
+        if insert_count <= 0:
+            db.commit()
+            return 0
+
+        # Skip the articles which already exist first, so that a repeated harvest only processes
+        # the entities of the new articles
+        all_dois = {e.doi.strip() for e in data if e.doi and e.doi.strip()}
+        all_eids = {e.eid for e in data if e.eid}
+        existing_articles = batch_lookup_existing_articles(list(all_dois), cursor)
+        existing_eids = batch_lookup_existing_eids(list(all_eids), cursor)
+        data = [e for e in data
+                if not (e.doi and e.doi.strip() in existing_articles) and not (e.eid and e.eid in existing_eids)]
+        if not data:
+            db.commit()
+            return insert_count
 
         # Pre-load existing entities to minimize database lookups
         existing_authors, existing_affiliations, existing_keywords = preload_existing_entities(data, cursor)
@@ -208,14 +270,15 @@ def batch_insert_articles_and_relationships(data: list[SearchEntry], all_authors
             article.subtype_description,
             article.citedby_count,
             article.fundSponsor,
+            article.eid,
             insert_id
         ))
 
     # Batch insert articles
     cursor.executemany("""
         INSERT INTO Article (SourceID, SourceURL, Name, PublishDate, ISSN, EISSN, 
-                           Volume, Description, Type, SubType, CitedByCount, Sponsor, InsertID)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                           Volume, Description, Type, SubType, CitedByCount, Sponsor, EID, InsertID)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
     """, article_data)
 
     # Get article IDs (assuming sequential IDs)
@@ -1,23 +1,75 @@
 from fetcher.scopus_batch.parser_models import Publication
 from database.dbContext import get_db
-from typing import List, Dict, Set
+from typing import List, Dict, Set, Optional
 from dataclasses import dataclass, field
 
+# Publication attributes read by scopusBatchInsertOptimised
+# (fetcher/tests/test_consumed_attributes.py fails if the inserts below read anything else)
+CONSUMED_ATTRIBUTES = (
+    'eid', 'link', 'source_title', 'year', 'issn', 'volume', 'abstract', 'document_type', 'cited_by',
+    'funding_details', 'doi', 'publisher', 'authors', 'affiliations', 'author_keywords', 'index_keywords'
+)
 
-def scopusBatchInsertOptimised(data: List[Publication]):
+
+def scopusBatchConsumedFields() -> list[str]:
+    """
+    Publication attributes needed by scopusBatchInsertOptimised.
+    Parsing only these (the `fields` option of ScopusCsvParser) skips the other columns of the export.
+    """
+    return list(CONSUMED_ATTRIBUTES)
+
+
+def scopusBatchBeginInsert() -> int:
+    """
+    Create an empty InsertLog row for publications that will be inserted batch by batch.
+    The returned ID is meant to be passed to scopusBatchInsertOptimised as `insert_id`.
+    """
+    db = get_db()
+    cursor = db.cursor()
+
+    try:
+        cursor.execute("INSERT INTO InsertLog (Source, articleInsertCount) VALUES (?, ?)", ("Scopus", 0))
+        db.commit()
+        return cursor.lastrowid
+    finally:
+        cursor.close()
+
+
+def scopusBatchInsertOptimised(data: List[Publication], insert_id: Optional[int] = None):
+    """
+    Insert parsed Scopus batch export publications, skipping the ones already stored.
+    When `insert_id` is given, the publications are added to that (already existing) InsertLog row,
+    which allows inserting a streamed export one batch at a time.
+    """
     db = get_db()
     cursor = db.cursor()
 
     try:
         insert_count = len(data)
-        cursor.execute("INSERT INTO InsertLog (Source, articleInsertCount) VALUES (?, ?)", ("Scopus", insert_count))
-        insert_id = cursor.lastrowid
+        if insert_id is None:
+            cursor.execute("INSERT INTO InsertLog (Source, articleInsertCount) VALUES (?, ?)",
+                           ("Scopus", insert_count))
+            insert_id = cursor.lastrowid
+        else:
+            cursor.execute("UPDATE InsertLog SET articleInsertCount = articleInsertCount + ? WHERE ID = ?",
+                           (insert_count, insert_id))
+
+        # Skip the articles which already exist first, so that a repeated import only processes
+        # the entities of the new articles
+        all_dois = {p.doi.strip() for p in data if p.doi and p.doi.strip()}
+        all_eids = {p.eid for p in data if p.eid}
+        existing_articles = batch_lookup_existing_articles(list(all_dois), cursor)
+        existing_eids = batch_lookup_existing_eids(list(all_eids), cursor)
+        data = [p for p in data
+                if not (p.doi and p.doi.strip() in existing_articles) and not (p.eid and p.eid in existing_eids)]
+        if not data:
+            db.commit()
+            return insert_count
 
         # Batch process all entities first - collect UNIQUE entities only
         all_authors = set()
         all_affiliations = set()
         all_keywords = set()
-        all_dois = set()
 
         # Collect all unique entities with proper normalization
         for publication in data:
@@ -40,15 +92,10 @@ def scopusBatchInsertOptimised(data: List[Publication]):
                 if keyword_clean:
                     all_keywords.add(keyword_clean)
 
-            # Deduplicate DOIs
-            if publication.doi and publication.doi.strip():
-                all_dois.add(publication.doi.strip())
-
         # Batch lookup and insert entities
         author_cache = batch_process_authors(list(all_authors), insert_id, cursor)
         affiliation_cache = batch_process_affiliations(list(all_affiliations), insert_id, cursor)
         keyword_cache = batch_process_keywords(list(all_keywords), insert_id, cursor)
-        existing_articles = batch_lookup_existing_articles(list(all_dois), cursor)
 
         # Process articles and relationships
         article_author_relations = []
@@ -56,10 +103,6 @@ def scopusBatchInsertOptimised(data: List[Publication]):
         article_keyword_relations = []
 
         for publication in data:
-            # Skip if article already exists
-            if publication.doi and publication.doi.strip() in existing_articles:
-                continue
-
             # Insert article
             article_id = insert_publication_article(publication, insert_id, cursor)
 
@@ -120,6 +163,20 @@ def batch_lookup_existing_articles(dois: List[str], cursor) -> Set[str]:
     return existing_dois
 
 
+def batch_lookup_existing_eids(eids: List[str], cursor) -> Set[str]:
+    """Batch lookup existing articles by EID with chunking"""
+    existing_eids = set()
+    chunk_size = 999  # SQLite variable limit
+
+    for i in range(0, len(eids), chunk_size):
+        chunk = eids[i:i + chunk_size]
+        placeholders = ','.join('?' * len(chunk))
+        cursor.execute(f"SELECT EID FROM Article WHERE EID IN ({placeholders})", chunk)
+        existing_eids.update(row[0] for row in cursor.fetchall())
+
+    return existing_eids
+
+
 def batch_process_authors(authors: List[str], insert_id: int, cursor) -> Dict[str, int]:
     """Batch process authors and return name->id mapping with chunking and deduplication"""
     if not authors:
@@ -347,13 +404,13 @@ def insert_publication_article(publication: Publication, insert_id: int, cursor)
         INSERT INTO Article (
             SourceID, SourceURL, Name, PublishDate, ISSN, EISSN, 
             Volume, Description, Type, SubType, CitedByCount, 
-            Sponsor, DOI, Publisher, InsertID
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            Sponsor, DOI, Publisher, EID, InsertID
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
     """, (
         None, publication.link, publication.source_title, publish_date,
         publication.issn, None, publication.volume, publication.abstract,
         None, publication.document_type, publication.cited_by,
-        publication.funding_details, publication.doi, publication.publisher, insert_id
+        publication.funding_details, publication.doi, publication.publisher, publication.eid or None, insert_id
     ))
     return cursor.lastrowid
 
@@ -0,0 +1,81 @@
+from datetime import datetime, date, timedelta, timezone
+from typing import Optional
+
+from database.dbContext import get_db
+
+# Records loaded on the day of the last run may have been loaded after the run started,
+# so incremental searches overlap the previous run by one day
+WATERMARK_OVERLAP = timedelta(days=1)
+
+
+def getHarvestWatermark(source: str, query: str) -> Optional[dict]:
+    """
+    Get the watermark of the last successful harvest of a query.
+
+    :param str source: Data source (InsertLog.Source, e.g. "Scopus").
+    :param str query: The search query.
+    :return: Dictionary with LastRunTimestamp (datetime, UTC), MaxCoverDate and LastInsertID,
+             or None if the query was never harvested.
+    :rtype: Optional[dict]
+    """
+    db = get_db()
+    cursor = db.cursor()
+
+    try:
+        cursor.execute("""
+            SELECT LastRunTimestamp, MaxCoverDate, LastInsertID FROM HarvestWatermark
+            WHERE Source = ? AND Query = ?
+        """, (source, query))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return {
+            'LastRunTimestamp': datetime.fromisoformat(row[0]),
+            'MaxCoverDate': row[1],
+            'LastInsertID': row[2]
+        }
+    finally:
+        cursor.close()
+
+
+def getIncrementalStartDate(source: str, query: str) -> Optional[date]:
+    """
+    Date after which records have to be fetched to catch up with the last harvest of a query.
+
+    :param str source: Data source (InsertLog.Source, e.g. "Scopus").
+    :param str query: The search query.
+    :return: The date, or None if the query was never harvested (everything has to be fetched).
+    :rtype: Optional[date]
+    """
+    watermark = getHarvestWatermark(source, query)
+    if watermark is None:
+        return None
+    return (watermark['LastRunTimestamp'] - WATERMARK_OVERLAP).date()
+
+
+def saveHarvestWatermark(source: str, query: str, run_timestamp: datetime,
+                         max_cover_date: Optional[str] = None, insert_id: Optional[int] = None):
+    """
+    Record a successful harvest of a query.
+
+    :param str source: Data source (InsertLog.Source, e.g. "Scopus").
+    :param str query: The search query.
+    :param datetime run_timestamp: When the harvest started (records loaded after that are fetched by the next run).
+    :param Optional[str] max_cover_date: The latest cover date of the harvested records (kept if None or older).
+    :param Optional[int] insert_id: InsertLog ID of the harvest (kept if None).
+    """
+    db = get_db()
+    cursor = db.cursor()
+
+    try:
+        cursor.execute("""
+            INSERT INTO HarvestWatermark (Source, Query, LastRunTimestamp, MaxCoverDate, LastInsertID)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(Source, Query) DO UPDATE SET
+                LastRunTimestamp = excluded.LastRunTimestamp,
+                MaxCoverDate = NULLIF(MAX(COALESCE(excluded.MaxCoverDate, ''), COALESCE(MaxCoverDate, '')), ''),
+                LastInsertID = COALESCE(excluded.LastInsertID, LastInsertID)
+        """, (source, query, run_timestamp.astimezone(timezone.utc).isoformat(), max_cover_date, insert_id))
+        db.commit()
+    finally:
+        cursor.close()
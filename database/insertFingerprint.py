@@ -0,0 +1,41 @@
+from typing import Optional
+
+from database.dbContext import get_db
+
+
+def getInsertByFingerprint(source: str, fingerprint: str) -> Optional[int]:
+    """
+    Find a completed import of the same source data.
+
+    :param str source: Data source (InsertLog.Source, e.g. "Scopus").
+    :param str fingerprint: Fingerprint of the imported data (e.g. the hash of an export file).
+    :return: ID of the (latest) InsertLog row of the import, or None if the data was never imported.
+    :rtype: Optional[int]
+    """
+    db = get_db()
+    cursor = db.cursor()
+
+    try:
+        cursor.execute("""
+            SELECT MAX(ID) FROM InsertLog WHERE Source = ? AND Fingerprint = ?
+        """, (source, fingerprint))
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+
+
+def saveInsertFingerprint(insert_id: int, fingerprint: str):
+    """
+    Record the fingerprint of the data of an import, once all of it was inserted.
+
+    :param int insert_id: InsertLog ID of the import.
+    :param str fingerprint: Fingerprint of the imported data.
+    """
+    db = get_db()
+    cursor = db.cursor()
+
+    try:
+        cursor.execute("UPDATE InsertLog SET Fingerprint = ? WHERE ID = ?", (fingerprint, insert_id))
+        db.commit()
+    finally:
+        cursor.close()
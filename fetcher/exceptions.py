@@ -1,3 +1,6 @@
+from datetime import datetime
+
+
 class InvalidAPIKeyError(Exception):
     def __init__(self, url: str):
         self.url = url
@@ -8,3 +11,12 @@ class InvalidCookiesError(Exception):
     def __init__(self, url: str):
         self.url = url
         super().__init__(f'Invalid cookies, the service rejected access to {self.url}')
+
+
+class QuotaExceededError(Exception):
+    def __init__(self, reset: float | None):
+        self.reset = reset
+        message = 'The API quota was exceeded'
+        if reset is not None:
+            message += f', it resets at {datetime.fromtimestamp(reset).isoformat(sep=" ", timespec="seconds")}'
+        super().__init__(message)
@@ -1,40 +1,93 @@
+import asyncio
 import logging
+from collections import deque
+from datetime import date
+from typing import Optional, AsyncIterator, Callable, Iterable
+
 import httpx
 
-from fetcher.exceptions import InvalidAPIKeyError
+from fetcher.exceptions import InvalidAPIKeyError, QuotaExceededError
 from fetcher.proxy.rotator import ProxyRotator
-from fetcher.scopus.models import SearchResults, SearchEntry
+from fetcher.sharding import plan_year_shards, YearShard
+from fetcher.scopus.models import SearchResults, SearchEntry, PaginationMode
+from fetcher.scopus.cache import ResponseCache
+from fetcher.scopus.decoding import JsonLoads, fast_loads
+from fetcher.scopus.key_pool import ApiKeyPool
+from fetcher.scopus.rate_limiter import RateLimiter, RateLimitBudget
 
 SCOBUS_SEARCH_MAX_COUNT = 25
 
+SCOBUS_SEARCH_MAX_OFFSET = 5000
+"""Maximum `start + count` value accepted by the search endpoint (offset pagination only)."""
+
+SHARD_MAX_RETRIES = 2
+"""How many times a failed shard of a sharded search is harvested again."""
+
 
 class ScopusApi:
     """
-    Fetcher for searching the Scopus API with automatic proxy rotation.
+    Fetcher for searching the Scopus API with automatic proxy rotation and API key pooling.
 
     Provides asynchronous context-manager support, paginated search across
-    all result pages, and single-page search.
+    all result pages (either by offsets, optionally fetching up to `max_concurrency`
+    pages at once, or by following the API cursor), and single-page search.
+
+    :ivar bool truncated: Whether the last search returned fewer results than the API reported,
+                          because offset pagination stops at `SCOBUS_SEARCH_MAX_OFFSET`.
     """
 
     BASE_URI = 'https://api.elsevier.com'
 
-    def __init__(self, api_key: str, api_endpoint: str | None = BASE_URI, verify_ssl: bool = True, proxies: list[str] | None = None):
+    def __init__(self, api_key: str | list[str], api_endpoint: str | None = BASE_URI, verify_ssl: bool = True,
+                 proxies: list[str] | None = None, max_concurrency: int = 1,
+                 pagination: PaginationMode = PaginationMode.OFFSET,
+                 rate_limiter_factory: Callable[[], RateLimiter] = RateLimiter,
+                 cache: Optional[ResponseCache] = None,
+                 fields: Optional[Iterable[str]] = None,
+                 json_loads: JsonLoads = fast_loads,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
         """
         Initialize the ScopusApi client.
 
-        :param str api_key:              Your Elsevier API key.
+        :param str | list[str] api_key:  Your Elsevier API key, or a list of keys to spread the requests across.
         :param str | None api_endpoint:  Override the base API endpoint (default: BASE_URI).
         :param bool verify_ssl:          Whether to verify SSL certificates (default: True).
         :param list[str] | None proxies: List of proxy URLs to rotate (default: None).
+        :param int max_concurrency:      Maximum number of page requests in flight at once (default: 1).
+                                         Not used with cursor pagination, which is sequential by nature.
+        :param PaginationMode pagination: How to walk through the result pages (default: OFFSET).
+        :param Callable[[], RateLimiter] rate_limiter_factory: Creates the scheduler pacing the requests
+                                                               of each API key to its quota
+                                                               (default: `RateLimiter` with default settings).
+        :param Optional[ResponseCache] cache: Cache of the offset-paginated result pages (default: None, no cache).
+                                              Cursor pages are never cached, the cursors expire.
+        :param Optional[Iterable[str]] fields: Scopus Search API fields to request, instead of the whole
+                                               COMPLETE view (default: None, all fields).
+                                               See `SearchEntry.api_fields`.
+        :param JsonLoads json_loads: Decodes the JSON responses (default: orjson if installed, otherwise
+                                     the standard library json module).
+        :param Optional[httpx.AsyncBaseTransport] transport: Use a custom HTTPX transport
+        :raises ValueError: If `max_concurrency` is lower than 1 or no API key was given.
         """
 
+        if max_concurrency < 1:
+            raise ValueError(f'max_concurrency must be at least 1 (was {max_concurrency})')
+
         self._proxy_rotator = ProxyRotator(proxies=proxies)
-        self._session = httpx.AsyncClient(proxy=self._proxy_rotator.use_next_proxy(), verify=verify_ssl)
+        self._session = httpx.AsyncClient(proxy=self._proxy_rotator.use_next_proxy(), verify=verify_ssl,
+                                          transport=transport)
         self._base = api_endpoint
+        self._max_concurrency = max_concurrency
+        self._pagination = pagination
+        self._cache = cache
+        self._fields = list(fields) if fields is not None else None
+        self._json_loads = json_loads
+        self.truncated = False
+        self._key_pool = ApiKeyPool([api_key] if isinstance(api_key, str) else api_key,
+                                    rate_limiter_factory=rate_limiter_factory)
         self._session.headers.update({
             'Accept': 'application/json',
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.10 Safari/605.1.1',
-            'X-ELS-APIKey': api_key
+            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.10 Safari/605.1.1'
         })
         self._logger = logging.getLogger(__name__)
 
@@ -44,35 +97,196 @@ class ScopusApi:
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         await self._session.aclose()
 
-    async def search(self, title: str) -> list[SearchEntry]:
+    @property
+    def rate_limit_budgets(self) -> dict[str, RateLimitBudget]:
+        """
+        The current request budget (token bucket and quota) of every API key still in use, keyed by the masked key.
+
+        :rtype: dict[str, RateLimitBudget]
+        """
+        return self._key_pool.budgets
+
+    async def search(self, title: str, loaded_after: Optional[date] = None,
+                     shard_size: Optional[int] = None) -> list[SearchEntry]:
         """
         Search Scopus for all pages of results matching the given title.
 
-        Iterates page by page until `totalResults` is reached,
-        aggregating `SearchEntry` items into a single list.
+        Collects every batch yielded by :meth:`iter_search` into a single list.
 
         :param str title: The title or keyword to search in Scopus records.
+        :param Optional[date] loaded_after: Only return records first loaded into Scopus after this date.
+        :param Optional[int] shard_size: Split the query into publication year ranges of at most this many
+                                         results (see :meth:`iter_search`).
         :return: List of all `SearchEntry` objects matching the query.
         :rtype: list[SearchEntry]
         """
-        self._logger.info(f'Searching (all pages) for "{title}"')
+        entries = []
+        async for batch in self.iter_search(title, loaded_after=loaded_after, shard_size=shard_size):
+            entries.extend(batch)
+        return entries
 
-        first_page = await self.search_one_page(title)
-        start_index = first_page.itemsPerPage
-        entries_on_page = first_page.itemsPerPage
+    async def iter_search(self, title: str, loaded_after: Optional[date] = None,
+                          shard_size: Optional[int] = None) -> AsyncIterator[list[SearchEntry]]:
+        """
+        Search Scopus for all pages of results matching the given title, yielding one batch per page.
 
-        entries = first_page.entry
+        With offset pagination, the first page reveals `totalResults`, so the offsets
+        of all remaining pages are known up front. These pages are fetched with at most
+        `max_concurrency` requests in flight and yielded in page order. At most
+        `max_concurrency` pages are buffered at any time, so memory usage does not grow
+        with the result count. The API refuses offsets past `SCOBUS_SEARCH_MAX_OFFSET`,
+        so larger result sets are truncated (use cursor pagination for those) and `truncated` is set.
 
-        while (start_index + entries_on_page) < first_page.totalResults:
-            start_index += min(first_page.itemsPerPage, first_page.totalResults - first_page.itemsPerPage)
-            entries_on_page = min(first_page.itemsPerPage, first_page.totalResults - start_index)
+        With cursor pagination, the pages are fetched one by one, each request using
+        the cursor returned with the previous page. This mode has no result count limit.
 
-            # TODO: Parallel?
-            page = await self.search_one_page(title, start=start_index, count=entries_on_page)
-            entries.extend(page.entry)
-        return entries
+        With `shard_size`, the query is first split into disjoint publication year ranges
+        (shards) of at most `shard_size` results, based on the result counts reported by the API
+        (see :func:`fetcher.sharding.plan_year_shards`). Up to `max_concurrency` shards are then
+        harvested at once, each one page at a time, and their batches are yielded as they arrive
+        (not in page order), without entries already yielded (by EID). A shard that fails is
+        harvested again, up to `SHARD_MAX_RETRIES` times. Sharding with a `shard_size` of
+        `SCOBUS_SEARCH_MAX_OFFSET` lifts the offset pagination limit.
+
+        :param str title: The title or keyword to search in Scopus records.
+        :param Optional[date] loaded_after: Only return records first loaded into Scopus after this date
+                                            (used to fetch only the records added since the last harvest).
+        :param Optional[int] shard_size: Split the query into publication year ranges of at most this many results.
+        :return: Async iterator of `SearchEntry` batches, one batch per result page.
+        :rtype: AsyncIterator[list[SearchEntry]]
+        """
+        self._logger.info(f'Searching (all pages, {self._pagination.value} pagination) for "{title}"')
+        self.truncated = False
+
+        search_query = self.build_query(title, loaded_after)
+        if shard_size is not None:
+            async for batch in self._iter_sharded_batches(search_query, shard_size):
+                yield batch
+            return
+
+        async for page in self._iter_pages(search_query, self._max_concurrency):
+            yield page.entry
+
+    async def _iter_sharded_batches(self, search_query: str, shard_size: int) -> AsyncIterator[list[SearchEntry]]:
+        shards = await plan_year_shards(search_query, self._count_results, shard_size)
+        remaining_shards = iter(shards)
+        batches = asyncio.Queue(maxsize=self._max_concurrency)
+        done = object()
+
+        async def harvest(shard: YearShard):
+            attempt = 0
+            while True:
+                try:
+                    async for page in self._iter_pages(shard.restrict(search_query), window=1):
+                        await batches.put(page.entry)
+                    return
+                except httpx.HTTPError as error:
+                    if attempt >= SHARD_MAX_RETRIES:
+                        raise
+                    attempt += 1
+                    # Entries yielded by the failed attempt are dropped as duplicates
+                    self._logger.warning(f'Harvesting shard {shard} failed ({error}), '
+                                         f'retrying (attempt {attempt}/{SHARD_MAX_RETRIES})')
+
+        async def worker():
+            try:
+                for shard in remaining_shards:
+                    await harvest(shard)
+            except Exception as error:
+                # Handed over to the consumer, which stops the other workers
+                await batches.put(error)
+            await batches.put(done)
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(self._max_concurrency, len(shards)))]
+        running = len(workers)
+        seen_eids = set()
+        try:
+            while running > 0:
+                batch = await batches.get()
+                if batch is done:
+                    running -= 1
+                    continue
+                if isinstance(batch, Exception):
+                    raise batch
+
+                new_entries = []
+                for entry in batch:
+                    if entry.eid is not None:
+                        if entry.eid in seen_eids:
+                            continue
+                        seen_eids.add(entry.eid)
+                    new_entries.append(entry)
+                if new_entries:
+                    yield new_entries
+        finally:
+            for task in workers:
+                task.cancel()
+
+    async def _count_results(self, search_query: str) -> int:
+        page = await self._search_page(search_query, count=1)
+        return page.totalResults
 
-    async def search_one_page(self, title: str, start: int = 0, count: int = SCOBUS_SEARCH_MAX_COUNT) -> SearchResults:
+    def _iter_pages(self, search_query: str, window: int) -> AsyncIterator[SearchResults]:
+        if self._pagination == PaginationMode.CURSOR:
+            return self._iter_cursor_pages(search_query)
+        return self._iter_offset_pages(search_query, window)
+
+    async def _iter_offset_pages(self, search_query: str, window: int) -> AsyncIterator[SearchResults]:
+        first_page = await self._search_page(search_query)
+        if first_page.totalResults <= 0:
+            # The API returns a single error entry when the result set is empty
+            return
+        yield first_page
+
+        page_size = first_page.itemsPerPage
+        if page_size <= 0:
+            return
+
+        last_index = first_page.totalResults
+        if last_index > SCOBUS_SEARCH_MAX_OFFSET:
+            self._logger.warning(f'Offset pagination is limited to {SCOBUS_SEARCH_MAX_OFFSET} results, '
+                                 f'but the query returned {last_index}. Use cursor pagination to fetch all of them.')
+            last_index = SCOBUS_SEARCH_MAX_OFFSET
+            self.truncated = True
+
+        offsets = iter(range(page_size, last_index, page_size))
+        pending = deque()
+
+        def schedule_next() -> None:
+            start = next(offsets, None)
+            if start is not None:
+                count = min(page_size, last_index - start)
+                pending.append(asyncio.create_task(self._search_page(search_query, start=start, count=count)))
+
+        try:
+            for _ in range(window):
+                schedule_next()
+            while pending:
+                page = await pending.popleft()
+                schedule_next()
+                yield page
+        finally:
+            # The consumer stopped early or a page failed: don't leave orphaned requests behind
+            for task in pending:
+                task.cancel()
+
+    async def _iter_cursor_pages(self, search_query: str) -> AsyncIterator[SearchResults]:
+        cursor = '*'
+        fetched = 0
+        while True:
+            page = await self._search_page(search_query, cursor=cursor)
+            if page.totalResults <= 0 or len(page.entry) <= 0:
+                return
+            yield page
+
+            fetched += len(page.entry)
+            # The last page still carries a cursor, so the result count has to be checked as well
+            if fetched >= page.totalResults or not page.next_cursor or page.next_cursor == cursor:
+                return
+            cursor = page.next_cursor
+
+    async def search_one_page(self, title: str, start: int = 0, count: int = SCOBUS_SEARCH_MAX_COUNT,
+                              cursor: Optional[str] = None, loaded_after: Optional[date] = None) -> SearchResults:
         """
         Search a single page of Scopus results with pagination parameters.
 
@@ -80,48 +294,131 @@ class ScopusApi:
         constructs the query, logs request and response details,
         and returns a `SearchResults` object parsed from JSON.
 
+        Offset-paginated pages are served from the response cache, when one is configured
+        and holds a fresh copy of the page.
+
+        Each request is sent with one of the pooled API keys, paced by that key's rate limiter.
+        Throttled (429 Too Many Requests) and failed (5xx) requests are retried after a randomized,
+        exponentially growing delay. Keys rejected as invalid or out of quota are retired and
+        the request is repeated with another key.
+
         :param str title:  The title or keyword to search.
         :param int start:  Zero-based index of the first result to return.
         :param int count:  Number of results to return on this page
                            (must be ≤ :const:`SCOBUS_SEARCH_MAX_COUNT`).
+        :param Optional[str] cursor: Cursor to use instead of `start` (`*` for the first page,
+                                     then `SearchResults.next_cursor` of the previous page).
+        :param Optional[date] loaded_after: Only return records first loaded into Scopus after this date.
         :raises ValueError: If `count` > `SCOBUS_SEARCH_MAX_COUNT`.
-        :raises InvalidAPIKeyError: If the provided API key is invalid (service returned a 401 Unauthorized)
-        :raises HTTPError: If the HTTP response status code indicates failure (other than 401 Unauthorized)
+        :raises InvalidAPIKeyError: If the provided API keys are invalid (service returned a 401 Unauthorized)
+        :raises QuotaExceededError: If the quota of the API keys is used up and won't reset soon
+        :raises HTTPError: If the HTTP response status code indicates failure (other than 401 Unauthorized),
+                           or the request still fails after all retries
         :return: Parsed search results for this page.
         :rtype: SearchResults
         """
-        self._logger.info(f'Searching (single page) for "{title}", start: {start}, count: {count}')
+        return await self._search_page(self.build_query(title, loaded_after), start, count, cursor)
+
+    async def _search_page(self, search_query: str, start: int = 0, count: int = SCOBUS_SEARCH_MAX_COUNT,
+                           cursor: Optional[str] = None) -> SearchResults:
+        self._logger.info(f'Searching (single page) for "{search_query}", start: {start}, count: {count}, '
+                          f'cursor: {cursor}')
 
         if count > SCOBUS_SEARCH_MAX_COUNT:
             raise ValueError(f"Count must be less than SCOBUS_SEARCH_MAX_COUNT ({SCOBUS_SEARCH_MAX_COUNT}, but was {count})")
 
-        query = self._build_search_query(title, start, count)
-        self._logger.debug(f'Search query: {query}')
+        query = self._build_search_query(search_query, start, count, cursor, self._fields)
+        self._logger.debug('Search query: %s', query)
 
-        response = await self._session.get(f'{self._base}/content/search/scopus', params=query)
-        self._logger.debug(f'Response status: {str(response.status_code)}')
-        self._logger.debug(f'Response text: {response.text}')
+        endpoint = f'{self._base}/content/search/scopus'
+        cache_key = None
+        if self._cache is not None and cursor is None:
+            cache_key = ResponseCache.build_key(endpoint, query)
+            cached_text = self._cache.get(cache_key)
+            if cached_text is not None:
+                self._logger.debug('Serving the page from cache')
+                return SearchResults(json_data=self._json_loads(cached_text))
 
-        if response.status_code == httpx.codes.UNAUTHORIZED:
-            raise InvalidAPIKeyError(str(response.url))
-        response.raise_for_status()
+        attempt = 0
+        while True:
+            api_key = await self._key_pool.acquire()
+            rate_limiter = self._key_pool.limiter(api_key)
 
-        return SearchResults(json_data=response.json())
+            request = self._session.build_request('GET', endpoint, params=query,
+                                                  headers={'X-ELS-APIKey': api_key})
+            response = await self._session.send(request)
+            rate_limiter.update(response)
+            self._logger.debug('Response status: %s', response.status_code)
+
+            if response.status_code == httpx.codes.UNAUTHORIZED:
+                await response.aclose()
+                self._key_pool.retire(api_key, InvalidAPIKeyError(str(response.url)))
+                continue
+            if RateLimiter.is_quota_exceeded(response):
+                await response.aclose()
+                self._key_pool.retire(api_key, QuotaExceededError(rate_limiter.budget.quota_reset))
+                continue
+            if not RateLimiter.is_retryable(response) or attempt >= rate_limiter.max_retries:
+                break
+
+            await response.aclose()
+            delay = rate_limiter.backoff_delay(attempt, response)
+            self._logger.warning(f'Request failed with status {response.status_code}, '
+                                 f'retrying in {delay:.2f}s (attempt {attempt + 1}/{rate_limiter.max_retries})')
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        try:
+            response.raise_for_status()
+            # Decoding the body to text is only needed for the debug log and the cache
+            if self._logger.isEnabledFor(logging.DEBUG):
+                self._logger.debug('Response text: %s', response.text)
+            json_data = self._json_loads(response.content)
+        finally:
+            await response.aclose()
+
+        if cache_key is not None:
+            self._cache.put(cache_key, response.text)
+        return SearchResults(json_data=json_data)
 
     @staticmethod
-    def _build_search_query(title: str, start: int, count: int) -> dict:
+    def build_query(title: str, loaded_after: Optional[date] = None) -> str:
         """
-        Construct the query parameters dict for the Scopus API search endpoint.
+        Build the Scopus search query string.
 
         :param str title: The title or keyword to search.
-        :param int start: Zero-based index of the first result.
+        :param Optional[date] loaded_after: Restrict the query to records first loaded after this date.
+        :return: The query, e.g. `TITLE-ABS-KEY(python)`.
+        :rtype: str
+        """
+        search_query = f'TITLE-ABS-KEY({title})'
+        if loaded_after is not None:
+            search_query += f' AND ORIG-LOAD-DATE AFT {loaded_after:%Y%m%d}'
+        return search_query
+
+    @staticmethod
+    def _build_search_query(search_query: str, start: int, count: int, cursor: Optional[str] = None,
+                            fields: Optional[list[str]] = None) -> dict:
+        """
+        Construct the query parameters dict for the Scopus API search endpoint.
+
+        :param str search_query: The Scopus search query (see :meth:`build_query`).
+        :param int start: Zero-based index of the first result (ignored when `cursor` is set).
         :param int count: Number of results to request.
+        :param Optional[str] cursor: Pagination cursor.
+        :param Optional[list[str]] fields: Fields to request (all fields of the view if None).
         :return: Dictionary of query parameters.
         :rtype: dict
         """
-        return {
-            'query': f'TITLE-ABS-KEY({title})',
+        query = {
+            'query': search_query,
             'view': 'COMPLETE',
-            'start': str(start),
             'count': str(count)
         }
+        if fields:
+            query['field'] = ','.join(fields)
+        if cursor is not None:
+            query['cursor'] = cursor
+        else:
+            query['start'] = str(start)
+        return query
@@ -0,0 +1,123 @@
+import json
+import logging
+import sqlite3
+import time
+import zlib
+from typing import Optional
+
+
+class ResponseCache:
+    """
+    Persistent, size-bounded cache of raw API responses, stored in an SQLite file.
+
+    Entries expire `ttl` seconds after they were stored. When the total (compressed) size of the
+    entries grows over `max_size` bytes, the least recently used entries are evicted.
+
+    :ivar int hits:    Number of lookups served from the cache.
+    :ivar int misses:  Number of lookups not found in the cache (or expired).
+    """
+
+    DEFAULT_TTL = 24 * 60 * 60
+    DEFAULT_MAX_SIZE = 512 * 1024 * 1024
+
+    def __init__(self, path: str, ttl: float = DEFAULT_TTL, max_size: int = DEFAULT_MAX_SIZE):
+        """
+        Open (or create) the cache.
+
+        :param str path:       Path to the cache file.
+        :param float ttl:      Time to live of an entry, in seconds (default: 24 hours).
+        :param int max_size:   Maximum total size of the stored entries, in bytes (default: 512 MiB).
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        self._db = sqlite3.connect(path)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS Response (
+                Key TEXT PRIMARY KEY,
+                Body BLOB NOT NULL,
+                Size INTEGER NOT NULL,
+                Created REAL NOT NULL,
+                Accessed REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_response_accessed ON Response(Accessed)")
+        self._db.commit()
+        self._size = self._db.execute("SELECT COALESCE(SUM(Size), 0) FROM Response").fetchone()[0]
+        self._logger = logging.getLogger(__name__)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._db.close()
+
+    @staticmethod
+    def build_key(endpoint: str, params: dict) -> str:
+        """
+        Build a cache key from the request endpoint and query parameters.
+
+        :param str endpoint:  Request URL without the query string.
+        :param dict params:   Query parameters.
+        :rtype: str
+        """
+        return json.dumps([endpoint, sorted(params.items())], ensure_ascii=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a response.
+
+        :param str key: Key built with :meth:`build_key`.
+        :return: The cached response text, or None if it's not cached or has expired.
+        :rtype: Optional[str]
+        """
+        now = time.time()
+        row = self._db.execute("SELECT Body, Created FROM Response WHERE Key = ?", (key,)).fetchone()
+        if row is None or now - row[1] > self.ttl:
+            if row is not None:
+                self._delete(key)
+                self._db.commit()
+            self.misses += 1
+            return None
+
+        self._db.execute("UPDATE Response SET Accessed = ? WHERE Key = ?", (now, key))
+        self._db.commit()
+        self.hits += 1
+        return zlib.decompress(row[0]).decode('utf-8')
+
+    def put(self, key: str, text: str):
+        """
+        Store a response, evicting the least recently used entries if the cache grows too big.
+
+        :param str key:   Key built with :meth:`build_key`.
+        :param str text:  The response text.
+        """
+        body = zlib.compress(text.encode('utf-8'))
+        if len(body) > self.max_size:
+            return
+
+        now = time.time()
+        self._delete(key)
+        self._db.execute("INSERT INTO Response (Key, Body, Size, Created, Accessed) VALUES (?, ?, ?, ?, ?)",
+                         (key, body, len(body), now, now))
+        self._size += len(body)
+        self._evict()
+        self._db.commit()
+
+    def _delete(self, key: str):
+        row = self._db.execute("SELECT Size FROM Response WHERE Key = ?", (key,)).fetchone()
+        if row is not None:
+            self._db.execute("DELETE FROM Response WHERE Key = ?", (key,))
+            self._size -= row[0]
+
+    def _evict(self):
+        while self._size > self.max_size:
+            key, size = self._db.execute("SELECT Key, Size FROM Response ORDER BY Accessed LIMIT 1").fetchone()
+            self._logger.debug(f'Evicting cached response: {key}')
+            self._db.execute("DELETE FROM Response WHERE Key = ?", (key,))
+            self._size -= size
@@ -0,0 +1,25 @@
+import json
+from typing import Any, Callable
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+JsonLoads = Callable[[str | bytes], Any]
+
+
+def stdlib_loads(data: str | bytes) -> Any:
+    """
+    Decode JSON with the standard library :mod:`json` module.
+    """
+    return json.loads(data)
+
+
+if orjson is not None:
+    fast_loads: JsonLoads = orjson.loads
+    FAST_BACKEND = 'orjson'
+else:
+    fast_loads: JsonLoads = stdlib_loads
+    FAST_BACKEND = 'json'
+
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import math
+from typing import Callable, Optional
+
+from fetcher.exceptions import QuotaExceededError
+from fetcher.scopus.rate_limiter import RateLimiter, RateLimitBudget
+
+
+def mask_api_key(api_key: str) -> str:
+    """
+    Shorten an API key, so that it can be logged safely.
+
+    :param str api_key: The API key.
+    :return: First and last 4 characters of the key.
+    :rtype: str
+    """
+    if len(api_key) <= 8:
+        return '*' * len(api_key)
+    return f'{api_key[:4]}...{api_key[-4:]}'
+
+
+class ApiKeyPool:
+    """
+    Pool of Elsevier API keys, each one paced by its own :class:`RateLimiter`.
+
+    Every request takes a token from one of the keys. Keys with the most remaining quota are
+    preferred, and a key whose bucket is empty is skipped in favor of the next one, so the
+    aggregate request rate grows with the number of keys. Keys rejected by the API (invalid or
+    out of quota) are retired and not used again.
+    """
+
+    def __init__(self, api_keys: list[str], rate_limiter_factory: Callable[[], RateLimiter] = RateLimiter):
+        """
+        Initialize the pool.
+
+        :param list[str] api_keys:  The API keys (duplicates are ignored).
+        :param Callable[[], RateLimiter] rate_limiter_factory: Creates the rate limiter of each key
+                                                               (default: `RateLimiter` with default settings).
+        :raises ValueError: If no API keys were given.
+        """
+        keys = list(dict.fromkeys(k for k in api_keys if k))
+        if len(keys) <= 0:
+            raise ValueError('At least one API key is required')
+
+        self._limiters = {key: rate_limiter_factory() for key in keys}
+        self._retired: dict[str, Exception] = {}
+        self._last_error: Optional[Exception] = None
+        self._logger = logging.getLogger(__name__)
+
+    @property
+    def active_keys(self) -> list[str]:
+        """
+        Keys that were not retired.
+
+        :rtype: list[str]
+        """
+        return [k for k in self._limiters if k not in self._retired]
+
+    @property
+    def budgets(self) -> dict[str, RateLimitBudget]:
+        """
+        The current request budget of every active key, keyed by the masked key.
+
+        :rtype: dict[str, RateLimitBudget]
+        """
+        return {mask_api_key(k): self._limiters[k].budget for k in self.active_keys}
+
+    def limiter(self, api_key: str) -> RateLimiter:
+        """
+        Get the rate limiter of a key.
+
+        :param str api_key: One of the pooled keys.
+        :rtype: RateLimiter
+        """
+        return self._limiters[api_key]
+
+    def retire(self, api_key: str, reason: Exception):
+        """
+        Stop using a key.
+
+        :param str api_key:       One of the pooled keys.
+        :param Exception reason:  Why the key was retired. Raised by :meth:`acquire` once no keys are left.
+        """
+        if api_key in self._retired:
+            return
+        self._logger.warning(f'Retiring API key {mask_api_key(api_key)}: {reason}')
+        self._retired[api_key] = reason
+        self._last_error = reason
+
+    async def acquire(self) -> str:
+        """
+        Wait until one of the keys can send a request, then take a token from it.
+
+        :raises Exception: The reason of the last retirement (`QuotaExceededError`, `InvalidAPIKeyError`),
+                           if all the keys were retired.
+        :return: The key to use for the request.
+        :rtype: str
+        """
+        while True:
+            keys = self.active_keys
+            if len(keys) <= 0:
+                raise self._last_error
+
+            # Prefer the keys with the most quota left (unknown quota goes first)
+            keys.sort(key=lambda k: self._quota_remaining(k), reverse=True)
+
+            min_wait = math.inf
+            for key in keys:
+                limiter = self._limiters[key]
+                wait = limiter.try_acquire()
+                if wait <= 0:
+                    return key
+                if limiter.quota_wait() > limiter.max_quota_wait:
+                    self.retire(key, QuotaExceededError(limiter.budget.quota_reset))
+                    continue
+                min_wait = min(min_wait, wait)
+
+            if min_wait < math.inf:
+                await asyncio.sleep(min_wait)
+
+    def _quota_remaining(self, api_key: str) -> float:
+        remaining = self._limiters[api_key].budget.quota_remaining
+        return math.inf if remaining is None else remaining
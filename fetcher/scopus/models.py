@@ -1,13 +1,90 @@
-class Author:
-    def __init__(self, json_data):
-        self.seq = json_data.get('@seq')
-        self.author_url = json_data.get('author-url')
-        self.authid = json_data.get('authid')
-        self.authname = json_data.get('authname')
-        self.surname = json_data.get('surname')
-        self.given_name = json_data.get('given-name')
-        self.initials = json_data.get('initials')
-        self.afid = json_data.get('afid', [])
+from enum import Enum
+from typing import Iterable, Any, Callable, Optional
+
+
+class PaginationMode(Enum):
+    OFFSET = "offset"
+    CURSOR = "cursor"
+
+
+class ApiField:
+    """
+    Model attribute read from the raw API JSON object on first access.
+
+    Plain fields are looked up in the JSON object on every access (a single dict lookup).
+    Fields with a `decode` function are decoded once and the result is kept on the instance.
+    """
+    __slots__ = ('key', 'decode', 'name')
+
+    def __init__(self, key: str, decode: Optional[Callable[[Any], Any]] = None):
+        """
+        :param str key: Field name in the API JSON object.
+        :param Optional[Callable[[Any], Any]] decode: Converts the raw value (None if the field is missing).
+        """
+        self.key = key
+        self.decode = decode
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        if self.decode is None:
+            return instance._json_data.get(self.key)
+
+        decoded = instance._decoded
+        if decoded is None:
+            decoded = instance._decoded = {}
+        if self.name not in decoded:
+            decoded[self.name] = self.decode(instance._json_data.get(self.key))
+        return decoded[self.name]
+
+
+class ApiModel:
+    """
+    Base of the models wrapping an API JSON object. The object is kept as is and the
+    :class:`ApiField` attributes are decoded from it lazily, so that unused fields cost nothing.
+
+    :cvar dict[str, str] API_FIELDS: API field names of the attributes, collected from the :class:`ApiField`
+                                     declarations (see `SearchEntry.api_fields`).
+    """
+    __slots__ = ('_json_data', '_decoded')
+    API_FIELDS: dict[str, str] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.API_FIELDS = {name: f.key for name, f in vars(cls).items() if isinstance(f, ApiField)}
+
+    def __init__(self, json_data: dict):
+        self._json_data = json_data
+        self._decoded: Optional[dict] = None
+
+
+def _list(value) -> list:
+    return value if value is not None else []
+
+
+def _keywords(value) -> list[str]:
+    return value.split(' | ') if value else []
+
+
+def _values(value) -> list:
+    return value.get('value', []) if value is not None else []
+
+
+class Author(ApiModel):
+    __slots__ = ()
+
+    seq = ApiField('@seq')
+    author_url = ApiField('author-url')
+    authid = ApiField('authid')
+    authname = ApiField('authname')
+    surname = ApiField('surname')
+    given_name = ApiField('given-name')
+    initials = ApiField('initials')
+    afid = ApiField('afid', _list)
 
     def __str__(self):
         return f"{self.authname} ({self.authid})"
@@ -25,13 +102,14 @@ class Author:
         }
 
 
-class Affiliation:
-    def __init__(self, json_data):
-        self.affiliation_url = json_data.get('affiliation-url')
-        self.afid = json_data.get('afid')
-        self.affilname = json_data.get('affilname')
-        self.affiliation_city = json_data.get('affiliation-city')
-        self.affiliation_country = json_data.get('affiliation-country')
+class Affiliation(ApiModel):
+    __slots__ = ()
+
+    affiliation_url = ApiField('affiliation-url')
+    afid = ApiField('afid')
+    affilname = ApiField('affilname')
+    affiliation_city = ApiField('affiliation-city')
+    affiliation_country = ApiField('affiliation-country')
 
     def __str__(self):
         return f"{self.affilname}, {self.affiliation_city}, {self.affiliation_country}"
@@ -46,10 +124,11 @@ class Affiliation:
         }
 
 
-class Link:
-    def __init__(self, json_data):
-        self.ref = json_data.get('@ref')
-        self.href = json_data.get('@href')
+class Link(ApiModel):
+    __slots__ = ()
+
+    ref = ApiField('@ref')
+    href = ApiField('@href')
 
     def __str__(self):
         return f"{self.ref}: {self.href}"
@@ -61,41 +140,73 @@ class Link:
         }
 
 
-class SearchEntry:
-    def __init__(self, json_data):
-        self.eid = json_data.get('eid')
-        self.title = json_data.get('dc:title')
-        self.creator = json_data.get('dc:creator')
-        self.description = json_data.get('dc:description')
-        self.identifier = json_data.get('dc:identifier')
-        self.publication_name = json_data.get('prism:publicationName')
-        self.issn = json_data.get('prism:issn')
-        self.eissn = json_data.get('prism:eIssn')
-        self.volume = json_data.get('prism:volume')
-        self.issue = json_data.get('prism:issueIdentifier')
-        self.page_range = json_data.get('prism:pageRange')
-        self.cover_date = json_data.get('prism:coverDate')
-        self.cover_display_date = json_data.get('prism:coverDisplayDate')
-        self.doi = json_data.get('prism:doi')
-        self.citedby_count = json_data.get('citedby-count')
-        self.aggregation_type = json_data.get('prism:aggregationType')
-        self.subtype = json_data.get('subtype')
-        self.subtype_description = json_data.get('subtypeDescription')
-        self.authkeywords = json_data.get('authkeywords', '').split(' | ') if json_data.get('authkeywords') else []
-        self.article_number = json_data.get('article-number')
-        self.source_id = json_data.get('source-id')
-        self.openaccess = json_data.get('openaccess')
-        self.openaccess_flag = json_data.get('openaccessFlag')
-        self.freetoread = json_data.get('freetoread', {}).get('value', [])
-        self.freetoread_label = json_data.get('freetoreadLabel', {}).get('value', [])
-        self.fundNo = json_data.get('fund-no')
-        self.fundAcr = json_data.get('fund-acr')
-        self.fundSponsor = json_data.get('fund-sponsor')
-        self.url = json_data.get('prism:url')
-
-        self.links = [Link(link) for link in json_data.get('link', [])]
-        self.affiliations = [Affiliation(affil) for affil in json_data.get('affiliation', [])]
-        self.authors = [Author(author) for author in json_data.get('author', [])]
+class SearchEntry(ApiModel):
+    __slots__ = ()
+
+    eid = ApiField('eid')
+    title = ApiField('dc:title')
+    creator = ApiField('dc:creator')
+    description = ApiField('dc:description')
+    identifier = ApiField('dc:identifier')
+    publication_name = ApiField('prism:publicationName')
+    issn = ApiField('prism:issn')
+    eissn = ApiField('prism:eIssn')
+    volume = ApiField('prism:volume')
+    issue = ApiField('prism:issueIdentifier')
+    page_range = ApiField('prism:pageRange')
+    cover_date = ApiField('prism:coverDate')
+    cover_display_date = ApiField('prism:coverDisplayDate')
+    doi = ApiField('prism:doi')
+    citedby_count = ApiField('citedby-count')
+    aggregation_type = ApiField('prism:aggregationType')
+    subtype = ApiField('subtype')
+    subtype_description = ApiField('subtypeDescription')
+    authkeywords = ApiField('authkeywords', _keywords)
+    article_number = ApiField('article-number')
+    source_id = ApiField('source-id')
+    openaccess = ApiField('openaccess')
+    openaccess_flag = ApiField('openaccessFlag')
+    freetoread = ApiField('freetoread', _values)
+    freetoread_label = ApiField('freetoreadLabel', _values)
+    fundNo = ApiField('fund-no')
+    fundAcr = ApiField('fund-acr')
+    fundSponsor = ApiField('fund-sponsor')
+    url = ApiField('prism:url')
+
+    links = ApiField('link', lambda value: [Link(link) for link in _list(value)])
+    affiliations = ApiField('affiliation', lambda value: [Affiliation(affil) for affil in _list(value)])
+    authors = ApiField('author', lambda value: [Author(author) for author in _list(value)])
+
+    NESTED_API_FIELDS = {
+        'authors': Author.API_FIELDS,
+        'affiliations': Affiliation.API_FIELDS
+    }
+
+    @staticmethod
+    def api_fields(attributes: Iterable[str]) -> list[str]:
+        """
+        Translate attribute names to Scopus Search API field names (for the `field` query parameter).
+
+        Attributes of the nested authors and affiliations are written with a prefix,
+        for example `authors.authid` or `affiliations.affilname`.
+
+        :param Iterable[str] attributes: Attribute names of :class:`SearchEntry`.
+        :raises ValueError: If an attribute is not known.
+        :return: API field names, without duplicates.
+        :rtype: list[str]
+        """
+        fields = []
+        for attribute in attributes:
+            parent, _, child = attribute.partition('.')
+            if child:
+                field = SearchEntry.NESTED_API_FIELDS.get(parent, {}).get(child)
+            else:
+                field = SearchEntry.API_FIELDS.get(attribute)
+            if field is None:
+                raise ValueError(f'Unknown SearchEntry attribute: {attribute}')
+            if field not in fields:
+                fields.append(field)
+        return fields
 
     def __str__(self):
         return f"{self.eid}: {self.title} by {self.creator} in {self.publication_name}"
@@ -142,6 +253,7 @@ class SearchResults:
         self.totalResults = int(json_data['search-results']['opensearch:totalResults'])
         self.startIndex = int(json_data['search-results']['opensearch:startIndex'])
         self.itemsPerPage = int(json_data['search-results']['opensearch:itemsPerPage'])
+        self.next_cursor = json_data['search-results'].get('cursor', {}).get('@next')
 
         self.entry = [SearchEntry(e) for e in json_data['search-results']['entry']]
 
@@ -159,4 +271,3 @@ class SearchResults:
             'itemsPerPage': self.itemsPerPage,
             'entry': [e.to_dict() for e in self.entry]
         }
-
@@ -0,0 +1,222 @@
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import httpx
+
+HEADER_RATE_LIMIT = 'X-RateLimit-Limit'
+HEADER_RATE_LIMIT_REMAINING = 'X-RateLimit-Remaining'
+HEADER_RATE_LIMIT_RESET = 'X-RateLimit-Reset'
+HEADER_ELS_STATUS = 'X-ELS-Status'
+HEADER_RETRY_AFTER = 'Retry-After'
+
+
+@dataclass
+class RateLimitBudget:
+    """
+    Snapshot of the request budget of a :class:`RateLimiter`.
+
+    :ivar float tokens:               Requests that can be sent right now, without waiting.
+    :ivar float requests_per_second:  Sustained request rate of the token bucket.
+    :ivar Optional[int] quota_limit:      Total quota of the API key (`X-RateLimit-Limit`), if known.
+    :ivar Optional[int] quota_remaining:  Requests left in the current quota period, if known.
+    :ivar Optional[float] quota_reset:    Unix timestamp of the next quota reset, if known.
+    """
+    tokens: float
+    requests_per_second: float
+    quota_limit: Optional[int]
+    quota_remaining: Optional[int]
+    quota_reset: Optional[float]
+
+
+class RateLimiter:
+    """
+    Token-bucket request scheduler for the Elsevier APIs.
+
+    The bucket refills at `requests_per_second` and holds at most `burst` tokens; every request
+    takes one token. On top of that, the quota reported by the API in the `X-RateLimit-*` headers
+    is tracked: once it is used up, no more tokens are handed out until the quota resets.
+
+    Failed requests (429 Too Many Requests and 5xx errors) should be retried after
+    :meth:`backoff_delay`, which grows exponentially with the attempt number and is randomized
+    (full jitter), so that concurrent requests do not retry in lockstep.
+    """
+
+    # Default throttling rate of the Scopus Search API
+    DEFAULT_REQUESTS_PER_SECOND = 9.0
+
+    def __init__(self,
+                 requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+                 burst: Optional[int] = None,
+                 max_retries: int = 5,
+                 backoff_base: float = 1.0,
+                 backoff_max: float = 60.0,
+                 max_quota_wait: float = 60.0):
+        """
+        Initialize the rate limiter.
+
+        :param float requests_per_second:  Sustained request rate (default: 9, the Scopus Search API throttling rate).
+        :param Optional[int] burst:        Maximum number of tokens in the bucket (default: `requests_per_second`).
+        :param int max_retries:            How many times a failed request may be retried (default: 5).
+        :param float backoff_base:         Backoff delay of the first retry, in seconds (default: 1).
+        :param float backoff_max:          Upper bound of the backoff delay, in seconds (default: 60).
+        :param float max_quota_wait:       Longest time to wait for a quota reset, in seconds. If the quota
+                                           resets later than that, :class:`ApiKeyPool` retires the key with
+                                           :class:`QuotaExceededError` instead (default: 60).
+        :raises ValueError: If `requests_per_second` is not positive.
+        """
+        if requests_per_second <= 0:
+            raise ValueError(f'requests_per_second must be positive (was {requests_per_second})')
+
+        self.requests_per_second = requests_per_second
+        self.burst = burst if burst is not None else max(1, int(requests_per_second))
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_quota_wait = max_quota_wait
+
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+
+        self._quota_limit: Optional[int] = None
+        self._quota_remaining: Optional[int] = None
+        self._quota_reset: Optional[float] = None
+
+        self._logger = logging.getLogger(__name__)
+
+    @property
+    def budget(self) -> RateLimitBudget:
+        """
+        The current request budget.
+
+        :rtype: RateLimitBudget
+        """
+        self._refill()
+        return RateLimitBudget(tokens=self._tokens,
+                               requests_per_second=self.requests_per_second,
+                               quota_limit=self._quota_limit,
+                               quota_remaining=self._quota_remaining,
+                               quota_reset=self._quota_reset)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(float(self.burst), self._tokens + (now - self._last_refill) * self.requests_per_second)
+        self._last_refill = now
+
+    def quota_wait(self) -> float:
+        """
+        Time left until the quota resets, if the quota is used up.
+
+        :return: Seconds to wait for the quota reset, or 0 if the quota is not used up (or unknown).
+        :rtype: float
+        """
+        if self._quota_remaining is None or self._quota_remaining > 0:
+            return 0.0
+        if self._quota_reset is None:
+            return 0.0
+        wait = self._quota_reset - time.time()
+        if wait <= 0:
+            # The quota period is over, the next response will tell the new values
+            self._quota_remaining = None
+            self._quota_reset = None
+            return 0.0
+        return wait
+
+    def try_acquire(self) -> float:
+        """
+        Take a token if one is available.
+
+        :return: 0 if a token was taken, otherwise the number of seconds to wait before trying again.
+        :rtype: float
+        """
+        quota_wait = self.quota_wait()
+        if quota_wait > 0:
+            return quota_wait
+
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            if self._quota_remaining is not None:
+                # Account for in-flight requests before their response headers arrive
+                self._quota_remaining -= 1
+            return 0.0
+        return (1 - self._tokens) / self.requests_per_second
+
+    def update(self, response: httpx.Response):
+        """
+        Update the tracked quota with the `X-RateLimit-*` headers of a response.
+
+        Retryable failures (see :meth:`is_retryable`) also empty the token bucket,
+        which slows down the other requests in flight.
+
+        :param httpx.Response response: Response from the API.
+        """
+        headers = response.headers
+
+        limit = _parse_number(headers.get(HEADER_RATE_LIMIT))
+        if limit is not None:
+            self._quota_limit = int(limit)
+        remaining = _parse_number(headers.get(HEADER_RATE_LIMIT_REMAINING))
+        if remaining is not None:
+            self._quota_remaining = int(remaining)
+        reset = _parse_number(headers.get(HEADER_RATE_LIMIT_RESET))
+        if reset is not None:
+            # Elsevier sends the reset time as a Unix timestamp (sometimes in milliseconds)
+            self._quota_reset = reset / 1000 if reset > 1e11 else reset
+
+        if RateLimiter.is_quota_exceeded(response):
+            self._quota_remaining = 0
+        if RateLimiter.is_retryable(response):
+            self._refill()
+            self._tokens = min(self._tokens, 0.0)
+
+    @staticmethod
+    def is_quota_exceeded(response: httpx.Response) -> bool:
+        """
+        Check whether the response reports a used-up quota (as opposed to plain throttling).
+
+        :param httpx.Response response: Response from the API.
+        :rtype: bool
+        """
+        if response.status_code != httpx.codes.TOO_MANY_REQUESTS:
+            return False
+        els_status = response.headers.get(HEADER_ELS_STATUS, '')
+        return 'QUOTA_EXCEEDED' in els_status.upper() or response.headers.get(HEADER_RATE_LIMIT_REMAINING) == '0'
+
+    @staticmethod
+    def is_retryable(response: httpx.Response) -> bool:
+        """
+        Check whether the request should be retried (429 Too Many Requests or a 5xx error).
+
+        :param httpx.Response response: Response from the API.
+        :rtype: bool
+        """
+        return response.status_code == httpx.codes.TOO_MANY_REQUESTS or response.is_server_error
+
+    def backoff_delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """
+        Compute the delay before retrying a failed request.
+
+        :param int attempt:  Zero-based number of the failed attempt.
+        :param Optional[httpx.Response] response: The failed response. Its `Retry-After` header,
+                                                  if present, is used as the lower bound of the delay.
+        :return: Delay in seconds.
+        :rtype: float
+        """
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if response is not None:
+            retry_after = _parse_number(response.headers.get(HEADER_RETRY_AFTER))
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+
+def _parse_number(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
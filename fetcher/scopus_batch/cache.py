@@ -0,0 +1,194 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+import zlib
+from dataclasses import fields as dataclass_fields
+from typing import Collection, Iterable, Iterator, Optional
+
+from fetcher.scopus_batch.parser import ScopusCsvParser
+from fetcher.scopus_batch.parser_models import Publication
+
+# Publication attributes in the order of the Publication constructor, the cached rows are tuples of them
+_PUBLICATION_FIELDS = [f.name for f in dataclass_fields(Publication)]
+
+
+# Format of the stored parts (zlib-compressed JSON arrays of the rows)
+_STORAGE_FORMAT = 'json'
+
+
+def _cache_version() -> str:
+    """Version of the cached data: the parser version, the storage format and the layout of the cached rows."""
+    layout = hashlib.sha256(json.dumps(_PUBLICATION_FIELDS).encode()).hexdigest()[:16]
+    return f'{ScopusCsvParser.VERSION}:{_STORAGE_FORMAT}:{layout}'
+
+
+def hash_file(path: str) -> str:
+    """
+    Hash the content of a file, e.g. to identify an export dump.
+
+    :param str path: Path to the file.
+    :return: The SHA-256 hex digest of the file content.
+    :rtype: str
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as hashed_file:
+        while block := hashed_file.read(1024 * 1024):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ParsedExportCache:
+    """
+    Persistent, size-bounded cache of parsed Scopus batch export files, stored in an SQLite file.
+
+    An entry holds the publications parsed from a file, keyed by the hash of the file content and the
+    parsed fields, so re-importing the same dump skips the CSV parsing. The publications are stored in
+    compressed JSON parts of a batch each, which are read back one at a time. Entries of a different
+    parser version (`ScopusCsvParser.VERSION`), or stored when the Publication attributes were different,
+    are deleted when the cache is opened. When the total
+    (compressed) size of the entries grows over `max_size` bytes, the least recently used entries are evicted.
+
+    :ivar int hits:    Number of lookups served from the cache.
+    :ivar int misses:  Number of lookups not found in the cache.
+    """
+
+    DEFAULT_MAX_SIZE = 2 * 1024 * 1024 * 1024
+
+    def __init__(self, path: str, max_size: int = DEFAULT_MAX_SIZE):
+        """
+        Open (or create) the cache.
+
+        :param str path:       Path to the cache file.
+        :param int max_size:   Maximum total size of the stored entries, in bytes (default: 2 GiB).
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._logger = logging.getLogger(__name__)
+
+        self._db = sqlite3.connect(path)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS Export (
+                Key TEXT PRIMARY KEY,
+                Version TEXT NOT NULL,
+                Size INTEGER NOT NULL,
+                Accessed REAL NOT NULL
+            )
+        """)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS ExportPart (
+                Key TEXT NOT NULL,
+                Seq INTEGER NOT NULL,
+                Body BLOB NOT NULL,
+                PRIMARY KEY (Key, Seq)
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_export_accessed ON Export(Accessed)")
+        self._size = 0
+        self._version = _cache_version()
+        for (key,) in self._db.execute("SELECT Key FROM Export WHERE Version != ?", (self._version,)).fetchall():
+            self._logger.debug(f'Deleting cached export of a different version: {key}')
+            self._delete(key)
+        self._db.commit()
+        self._size = self._db.execute("SELECT COALESCE(SUM(Size), 0) FROM Export").fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._db.close()
+
+    @staticmethod
+    def build_key(content_hash: str, fields: Optional[Collection[str]] = None) -> str:
+        """
+        Build a cache key from the content of an export file and the parsed fields.
+
+        :param str content_hash:                  Hash of the export file content (see :func:`hash_file`).
+        :param Optional[Collection[str]] fields:  Names of the parsed Publication attributes (None: all of them).
+        :rtype: str
+        """
+        return json.dumps([content_hash, sorted(fields) if fields is not None else None])
+
+    def get(self, key: str) -> Optional[Iterator[list[Publication]]]:
+        """
+        Look up the publications of an export.
+
+        :param str key: Key built with :meth:`build_key`.
+        :return: An iterator of the cached batches of publications, or None if the export is not cached.
+        :rtype: Optional[Iterator[list[Publication]]]
+        """
+        if self._db.execute("SELECT 1 FROM Export WHERE Key = ?", (key,)).fetchone() is None:
+            self.misses += 1
+            return None
+
+        self._db.execute("UPDATE Export SET Accessed = ? WHERE Key = ?", (time.time(), key))
+        self._db.commit()
+        self.hits += 1
+        return self._iter_parts(key)
+
+    def put(self, key: str, batches: Iterable[list[Publication]]) -> Iterator[list[Publication]]:
+        """
+        Store the publications of an export while they are being parsed.
+
+        The batches are passed through and written to the cache file as they come, the entry is committed
+        once all of them were read (if the parsing fails or is not completed, nothing is stored).
+        An entry bigger than `max_size` is not stored either.
+
+        :param str key:                             Key built with :meth:`build_key`.
+        :param Iterable[list[Publication]] batches: The batches of parsed publications.
+        :return: An iterator of the same batches.
+        :rtype: Iterator[list[Publication]]
+        """
+        self._delete(key)
+        self._db.commit()
+
+        size = 0
+        seq = 0
+        stored = False
+        try:
+            for batch in batches:
+                if size <= self.max_size:
+                    rows = [tuple(getattr(p, f) for f in _PUBLICATION_FIELDS) for p in batch]
+                    body = zlib.compress(json.dumps(rows, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+                    self._db.execute("INSERT INTO ExportPart (Key, Seq, Body) VALUES (?, ?, ?)", (key, seq, body))
+                    size += len(body)
+                    seq += 1
+                yield batch
+
+            if size > self.max_size:
+                self._logger.info(f'Parsed export of {size} bytes exceeds the cache size, it is not cached')
+                return
+            self._db.execute("INSERT INTO Export (Key, Version, Size, Accessed) VALUES (?, ?, ?, ?)",
+                             (key, self._version, size, time.time()))
+            self._size += size
+            self._evict()
+            self._db.commit()
+            stored = True
+        finally:
+            if not stored:
+                self._db.rollback()
+
+    def _iter_parts(self, key: str) -> Iterator[list[Publication]]:
+        seq = 0
+        while (row := self._db.execute("SELECT Body FROM ExportPart WHERE Key = ? AND Seq = ?",
+                                       (key, seq)).fetchone()) is not None:
+            yield [Publication(*values) for values in json.loads(zlib.decompress(row[0]))]
+            seq += 1
+
+    def _delete(self, key: str):
+        row = self._db.execute("SELECT Size FROM Export WHERE Key = ?", (key,)).fetchone()
+        if row is not None:
+            self._db.execute("DELETE FROM Export WHERE Key = ?", (key,))
+            self._db.execute("DELETE FROM ExportPart WHERE Key = ?", (key,))
+            self._size -= row[0]
+
+    def _evict(self):
+        while self._size > self.max_size:
+            key, = self._db.execute("SELECT Key FROM Export ORDER BY Accessed LIMIT 1").fetchone()
+            self._logger.debug(f'Evicting cached export: {key}')
+            self._delete(key)
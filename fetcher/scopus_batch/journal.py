@@ -0,0 +1,169 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+from typing import Optional
+
+from fetcher.scopus_batch.models import ExportFileType, FieldGroupIdentifiers
+
+
+class ExportJournal:
+    """
+    On-disk checkpoint of a Scopus batch export, used to resume an interrupted export.
+
+    The journal is a directory with a state file, recording the batch ID prefix and the searched
+    EID windows, and one file per exported batch. When an export is resumed, the recorded EID windows
+    are used instead of searching them again (the search continues after the last one) and the recorded
+    batches are read from disk instead of being exported again.
+
+    :ivar str path:            Path to the journal directory.
+    :ivar str batch_prefix:    Batch ID prefix of the export.
+    :ivar bool search_complete: Whether all EIDs of the export were searched.
+    :ivar int searched_eid_count: Number of EIDs searched for the recorded windows.
+    """
+
+    STATE_FILE = 'journal.json'
+
+    def __init__(self, path: str, key: dict, batch_prefix: str, resume: bool = True):
+        """
+        Open the journal in `path`, or start a new one if it does not exist or belongs to a different export.
+
+        :param str path:          Path to the journal directory (created if missing).
+        :param dict key:          Identifies the export (query, file type, fields, ...), must be JSON serializable.
+        :param str batch_prefix:  Batch ID prefix used if a new journal is started.
+        :param bool resume:       Continue the existing journal (if False, a new one is always started).
+        """
+        self.path = path
+        self._logger = logging.getLogger(__name__)
+
+        state = self._read_state() if resume else None
+        if state is not None and state.get('key') != key:
+            self._logger.warning(f'Export journal "{path}" belongs to a different export, starting a new one')
+            state = None
+        if state is None:
+            shutil.rmtree(path, ignore_errors=True)
+            os.makedirs(path)
+            state = {'key': key, 'batch_prefix': batch_prefix, 'search_complete': False, 'windows': []}
+
+        self._state = state
+        self._write_state()
+        if self._state['windows']:
+            self._logger.info(f'Resuming the export from journal "{path}" ({self.searched_eid_count} EIDs '
+                              f'searched, search complete: {self.search_complete})')
+
+    @classmethod
+    def for_export(cls, base_dir: str, query: str, file_type: ExportFileType, fields: list[FieldGroupIdentifiers],
+                   shard_size: Optional[int] = None, skip_known: bool = False, batch_prefix: str = '',
+                   resume: bool = True) -> 'ExportJournal':
+        """
+        Open the journal of an export, in a directory (under `base_dir`) named after the export parameters.
+
+        :param str base_dir:                     Directory with the journals.
+        :param str query:                        Scopus search query string.
+        :param ExportFileType file_type:         Export file format.
+        :param list[FieldGroupIdentifiers] fields: Exported field group identifiers.
+        :param Optional[int] shard_size:         Shard size of the export.
+        :param bool skip_known:                  Whether known EIDs are left out of the export (its EID windows
+                                                 are filtered then, so they cannot be reused without it, or vice versa).
+        :param str batch_prefix:                 Batch ID prefix used if a new journal is started.
+        :param bool resume:                      Continue the existing journal of the export.
+        :return: The journal.
+        :rtype: ExportJournal
+        """
+        key = {
+            'query': query,
+            'file_type': file_type.value,
+            'fields': [f.value for f in fields],
+            'shard_size': shard_size,
+            'skip_known': skip_known
+        }
+        name = hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()[:16]
+        return cls(os.path.join(base_dir, name), key, batch_prefix, resume=resume)
+
+    @property
+    def batch_prefix(self) -> str:
+        return self._state['batch_prefix']
+
+    @property
+    def search_complete(self) -> bool:
+        return self._state['search_complete']
+
+    def windows(self) -> list[tuple[list[str], int]]:
+        """
+        The recorded EID windows, in search order.
+
+        :return: EIDs of every window and the total number of documents reported with it.
+        :rtype: list[tuple[list[str], int]]
+        """
+        return [(w['eids'], w['total']) for w in self._state['windows']]
+
+    @property
+    def searched_eid_count(self) -> int:
+        return sum(w['searched'] for w in self._state['windows'])
+
+    def add_window(self, eids: list[str], total: int, searched: Optional[int] = None):
+        """
+        Record a searched EID window.
+
+        :param list[str] eids:  The EIDs of the window to export.
+        :param int total:       The total number of documents reported by the search.
+        :param Optional[int] searched: Number of searched EIDs, if some of them are not exported
+                                (default: the number of `eids`).
+        """
+        self._state['windows'].append({'eids': list(eids), 'total': total,
+                                       'searched': searched if searched is not None else len(eids)})
+        self._write_state()
+
+    def complete_search(self):
+        """Record that all EIDs were searched."""
+        self._state['search_complete'] = True
+        self._write_state()
+
+    def get_part(self, batch_offset: int) -> Optional[str]:
+        """
+        Read an exported batch.
+
+        :param int batch_offset: Offset of the first EID of the batch.
+        :return: The exported text of the batch, or None if it was not recorded.
+        :rtype: Optional[str]
+        """
+        try:
+            with open(self._part_path(batch_offset), 'r', encoding='utf-8', newline='') as part_file:
+                return part_file.read()
+        except FileNotFoundError:
+            return None
+
+    def save_part(self, batch_offset: int, data: str):
+        """
+        Record an exported batch.
+
+        :param int batch_offset: Offset of the first EID of the batch.
+        :param str data:         The exported text of the batch.
+        """
+        self._write_atomic(self._part_path(batch_offset), data)
+
+    def remove(self):
+        """Delete the journal (after the export was completed)."""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def _part_path(self, batch_offset: int) -> str:
+        return os.path.join(self.path, f'part-{batch_offset:08d}.txt')
+
+    def _read_state(self) -> Optional[dict]:
+        try:
+            with open(os.path.join(self.path, ExportJournal.STATE_FILE), 'r', encoding='utf-8') as state_file:
+                return json.load(state_file)
+        except (OSError, ValueError):
+            return None
+
+    def _write_state(self):
+        self._write_atomic(os.path.join(self.path, ExportJournal.STATE_FILE), json.dumps(self._state))
+
+    @staticmethod
+    def _write_atomic(path: str, data: str):
+        # An interrupted write must not leave a truncated file behind
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8', newline='') as temp_file:
+            temp_file.write(data)
+        os.replace(temp_path, path)
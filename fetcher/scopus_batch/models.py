@@ -89,4 +89,53 @@ def all_identifiers() -> list[FieldGroupIdentifiers]:
         FieldGroupIdentifiers.ACCESSION_NUMBERS_AND_CHEMICALS,
         FieldGroupIdentifiers.CONFERENCE_INFORMATION,
         FieldGroupIdentifiers.REFERENCES
-    ]
\ No newline at end of file
+    ]
+
+
+class ExportProfile(Enum):
+    """
+    Predefined sets of field groups to export.
+
+    MINIMAL:  Just enough for the charts (authors, affiliations, keywords, year, source, citations, ...).
+    DATABASE: Every field group stored in the database by the Scopus batch insert (the default).
+    FULL:     Every field group (all_identifiers), e.g. to archive the raw export.
+    """
+    MINIMAL = "minimal"
+    DATABASE = "database"
+    FULL = "full"
+
+    def identifiers(self) -> list[FieldGroupIdentifiers]:
+        """
+        The field groups exported with the profile.
+
+        :return: Field group identifiers, in the order of :func:`all_identifiers`.
+        :rtype: list[FieldGroupIdentifiers]
+        """
+        if self == ExportProfile.FULL:
+            return all_identifiers()
+        groups = _MINIMAL_IDENTIFIERS if self == ExportProfile.MINIMAL else _DATABASE_IDENTIFIERS
+        return [i for i in all_identifiers() if i in groups]
+
+
+_MINIMAL_IDENTIFIERS = {
+    FieldGroupIdentifiers.AUTHORS,
+    FieldGroupIdentifiers.TITLES,
+    FieldGroupIdentifiers.YEAR,
+    FieldGroupIdentifiers.EID,
+    FieldGroupIdentifiers.SOURCE_TITLE,
+    FieldGroupIdentifiers.CITED_BY,
+    FieldGroupIdentifiers.DOCUMENT_TYPE,
+    FieldGroupIdentifiers.DOI,
+    FieldGroupIdentifiers.AFFILIATIONS,
+    FieldGroupIdentifiers.AUTHOR_KEYWORDS,
+    FieldGroupIdentifiers.INDEXED_KEYWORDS
+}
+
+# Keep in sync with the columns read by scopusBatchInsertOptimised
+_DATABASE_IDENTIFIERS = _MINIMAL_IDENTIFIERS | {
+    FieldGroupIdentifiers.VOLUME_ISSUE_PAGES,
+    FieldGroupIdentifiers.SERIAL_IDENTIFIERS,
+    FieldGroupIdentifiers.PUBLISHER,
+    FieldGroupIdentifiers.ABSTRACT,
+    FieldGroupIdentifiers.FUNDING_DETAILS
+}
@@ -1,18 +1,98 @@
+import codecs
 import csv
+import itertools
+import mmap
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Collection, Iterable, Iterator, Optional
 
-from fetcher.scopus_batch.parser_models import Publication
+from fetcher.scopus_batch.parser_models import ParsedFilePart, Publication
 
 
 class ScopusCsvParser:
     """
     Parser for CSV data exported from Scopus.
 
-    :param text_data: The raw CSV text data, potentially containing a Byte Order Mark (BOM).
-    :type text_data: str
+    The data can also be given as an iterable of lines, e.g. a file opened with `newline=''`,
+    which is then read while parsing instead of being loaded into memory first (see `from_chunks`
+    for text split at arbitrary positions). Together with `iter_publications` or `iter_batches`,
+    an export of any size is parsed in constant memory. The lines are consumed while parsing,
+    so a parser can only be read once.
+
+    With `fields`, only the columns of these Publication attributes are read (and split into lists),
+    the other attributes are left empty. Unused columns, e.g. the long `References`, then cost nothing
+    beyond being tokenized by the CSV reader.
+
+    :param text_data: The raw CSV text data or lines, potentially containing a Byte Order Mark (BOM).
+    :type text_data: str | Iterable[str]
+    :param fields: Names of the Publication attributes to read (default: all of them).
+    :type fields: Optional[Collection[str]]
+    :raises ValueError: If `fields` contains a name which is not a Publication attribute read from the CSV.
     """
 
-    def __init__(self, text_data: str):
-        self._lines = text_data.splitlines()
+    DEFAULT_BATCH_SIZE = 1000
+    # Increase when the parsed publications change, it invalidates the ParsedExportCache entries
+    VERSION = 1
+
+    def __init__(self, text_data: str | Iterable[str], fields: Optional[Collection[str]] = None):
+        if fields is not None:
+            unknown_fields = set(fields).difference(_COLUMN_ATTRIBUTES.values())
+            if unknown_fields:
+                raise ValueError(f'Unknown Publication attributes: {", ".join(sorted(unknown_fields))}')
+        self._fields = fields
+        lines = iter(_iter_chunk_lines([text_data]) if isinstance(text_data, str) else text_data)
+        self._source = lines
+        first_line = next(lines, None)
+        if first_line is None:
+            self._lines = lines
+        else:
+            self._lines = itertools.chain([first_line.removeprefix('\ufeff')], lines)
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[str], fields: Optional[Collection[str]] = None) -> 'ScopusCsvParser':
+        """
+        Create a parser for CSV data given as text chunks split at arbitrary positions,
+        e.g. the parts yielded by `ScopusScraper.iter_export` or blocks read from a file.
+
+        :param chunks: The raw CSV text data in chunks.
+        :type chunks: Iterable[str]
+        :param fields: Names of the Publication attributes to read (default: all of them).
+        :type fields: Optional[Collection[str]]
+        :return: A parser reading the lines of the chunks.
+        :rtype: ScopusCsvParser
+        """
+
+        return cls(_iter_chunk_lines(chunks), fields=fields)
+
+    @classmethod
+    def from_file(cls, path: str, fields: Optional[Collection[str]] = None) -> 'ScopusCsvParser':
+        """
+        Create a parser for a (UTF-8) CSV file, e.g. a `--scopus-batch-file` dump.
+
+        The file is memory-mapped and decoded a line at a time while parsing, so it is never loaded
+        into memory as a whole and the first rows are parsed right away, whatever the file size.
+
+        :param path: Path to the CSV file.
+        :type path: str
+        :param fields: Names of the Publication attributes to read (default: all of them).
+        :type fields: Optional[Collection[str]]
+        :return: A parser reading the lines of the file.
+        :rtype: ScopusCsvParser
+        """
+
+        return cls(_iter_mapped_lines(path), fields=fields)
+
+    def close(self) -> None:
+        """
+        Close the source of the lines if it can be closed, e.g. release the memory map of `from_file`.
+
+        Use it (e.g. with `contextlib.closing`) when the rows may not all be parsed.
+        """
+
+        close = getattr(self._source, 'close', None)
+        if close is not None:
+            close()
 
     @staticmethod
     def _split_cell(cell: str) -> list:
@@ -34,90 +114,322 @@ class ScopusCsvParser:
         """
         Parse all rows from the CSV lines and convert them into Publication objects.
 
-        The first non‐empty line is expected to be a header matching the Scopus CSV export format.
-        All subsequent lines are parsed, with specific columns split into lists via `_split_cell`.
+        See `iter_publications`, which parses the rows one at a time.
 
-        :raises ValueError: If the actual CSV header row does not match the expected header row.
+        :raises ValueError: If the actual CSV header row does not match the expected header row
+                            (an unknown column, or a required one is missing).
         :return: A list of Publication instances populated with data from each CSV row.
         :rtype: List[Publication]
         """
 
-        publications = []
+        return list(self.iter_publications())
+
+    def iter_batches(self, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[list[Publication]]:
+        """
+        Parse the rows from the CSV lines into batches of Publication objects.
+
+        :param batch_size: Maximum number of publications in a batch (the last one may be smaller).
+        :type batch_size: int
+        :raises ValueError: If the actual CSV header row does not match the expected header row
+                            (an unknown column, or a required one is missing).
+        :return: An iterator of non-empty lists of Publication instances, in the order of the rows.
+        :rtype: Iterator[List[Publication]]
+        """
+
+        publications = self.iter_publications()
+        while batch := list(itertools.islice(publications, batch_size)):
+            yield batch
+
+    def iter_publications(self) -> Iterator[Publication]:
+        """
+        Parse the rows from the CSV lines one at a time and convert them into Publication objects.
+
+        The first non‐empty line is expected to be a header with the columns of the Scopus CSV export format,
+        in their usual order. Exports of a subset of the field groups (see `ExportProfile`) lack some of the
+        columns, the corresponding Publication attributes are left empty.
+        All subsequent lines are parsed, with specific columns split into lists via `_split_cell`.
+
+        :raises ValueError: If the actual CSV header row does not match the expected header row
+                            (an unknown column, or a required one is missing).
+        :return: An iterator of Publication instances populated with data from each CSV row.
+        :rtype: Iterator[Publication]
+        """
 
         reader = csv.reader(self._lines)
-        expected_header_row = ['Authors', 'Author full names', 'Author(s) ID', 'Title', 'Year', 'Source title',
-                               'Volume', 'Issue', 'Art. No.', 'Page start', 'Page end', 'Page count', 'Cited by', 'DOI',
-                               'Link', 'Affiliations', 'Authors with affiliations', 'Abstract', 'Author Keywords',
-                               'Index Keywords', 'Molecular Sequence Numbers', 'Chemicals/CAS', 'Tradenames',
-                               'Manufacturers', 'Funding Details', 'Funding Texts', 'References',
-                               'Correspondence Address', 'Editors', 'Publisher', 'Sponsors', 'Conference name',
-                               'Conference date', 'Conference location', 'Conference code', 'ISSN', 'ISBN', 'CODEN',
-                               'PubMed ID', 'Language of Original Document', 'Abbreviated Source Title',
-                               'Document Type', 'Publication Stage', 'Open Access', 'Source', 'EID']
-        actual_header_row = next(reader)
-        if actual_header_row != expected_header_row:
-            raise ValueError('The actual CSV header row does not match the expected header row.')
+        actual_header_row = next(reader, None)
+        if actual_header_row is None:
+            return
+        projection = self._project_header(actual_header_row)
 
         for row in reader:
-            if len(row) != len(expected_header_row):
+            # Concatenated exports repeat the header row
+            if len(row) != len(actual_header_row) or row == actual_header_row:
                 continue
 
-            (_, authors, _, title, year, source_title, volume, issue, article_number, page_start,
-             page_end, page_count, cited_by, doi, link, affiliations, _, abstract, author_keywords,
-             index_keywords, _, _, tradenames, manufacturers, funding_details, funding_texts, references,
-             correspondence_address, editors, publisher, sponsors, _, _, _, _, issn, isbn, coden, pubmed_id,
-             language_of_orig_doc, abbr_source_title, document_type, publication_stage, open_access, source, eid) = row
-
-            authors = self._split_cell(authors)
-            affiliations = self._split_cell(affiliations)
-            author_keywords = self._split_cell(author_keywords)
-            index_keywords = self._split_cell(index_keywords)
-            tradenames = self._split_cell(tradenames)
-            manufacturers = self._split_cell(manufacturers)
-            # TODO: References (also separated by ';', each ref might contain ';' inside the name)
-            editors = self._split_cell(editors.strip())
-            sponsors = self._split_cell(sponsors.strip())
-            open_access = self._split_cell(open_access)
-
-            publications.append(Publication(
-                authors=authors,
-                title=title,
-                year=year,
-                source_title=source_title,
-                volume=volume,
-                issue=issue,
-                article_number=article_number,
-                page_start=page_start,
-                page_end=page_end,
-                page_count=page_count,
-                cited_by=cited_by,
-                doi=doi,
-                link=link,
-                abstract=abstract,
-                funding_details=funding_details,
-                funding_texts=funding_texts,
-                references=references,
-                correspondence_address=correspondence_address,
-                publisher=publisher,
-                issn=issn,
-                isbn=isbn,
-                coden=coden,
-                pubmed_id=pubmed_id,
-                language_of_orig_doc=language_of_orig_doc,
-                abbr_source_title=abbr_source_title,
-                document_type=document_type,
-                publication_stage=publication_stage,
-                source=source,
-                eid=eid,
-
-                affiliations=affiliations,
-                author_keywords=author_keywords,
-                index_keywords=index_keywords,
-                tradenames=tradenames,
-                manufacturers=manufacturers,
-                editors=editors,
-                sponsors=sponsors,
-                open_access=open_access,
-            ))
-
-        return publications
+            values = dict.fromkeys(_TEXT_ATTRIBUTES, '')
+            for index, attribute, split in projection:
+                # TODO: References (also separated by ';', each ref might contain ';' inside the name)
+                values[attribute] = self._split_cell(row[index].strip()) if split else row[index]
+            yield Publication(**values)
+
+    def _project_header(self, header_row: list[str]) -> list[tuple[int, str, bool]]:
+        """
+        Map the columns of a header row to the requested Publication attributes.
+
+        :param header_row: The header row of the CSV export.
+        :type header_row: List[str]
+        :raises ValueError: If a column is not known (or out of order), or a required column is missing.
+        :return: Column index, attribute name and whether the cell is split into a list,
+                 for every column read into the Publication objects.
+        :rtype: List[Tuple[int, str, bool]]
+        """
+
+        expected_order = [c for c in _COLUMN_ATTRIBUTES if c in header_row]
+        if expected_order != header_row or any(c not in header_row for c in _REQUIRED_COLUMNS):
+            raise ValueError('The actual CSV header row does not match the expected header row.')
+        attributes = ((i, _COLUMN_ATTRIBUTES[c]) for i, c in enumerate(header_row))
+        return [(i, a, a in _LIST_ATTRIBUTES) for i, a in attributes
+                if a is not None and (self._fields is None or a in self._fields)]
+
+
+def _iter_chunk_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """Re-split text chunks into lines (with their line endings), the last line may lack one."""
+    pending = ''
+    for chunk in chunks:
+        # Only split at '\n' (like a file opened with newline=''), other line breaks may be part of a cell
+        *lines, pending = (pending + chunk).split('\n')
+        for line in lines:
+            yield line + '\n'
+    if pending:
+        yield pending
+
+
+def _iter_mapped_lines(path: str) -> Iterator[str]:
+    """Decode the lines of a UTF-8 file (with their line endings) from a memory map, skipping the BOM."""
+    with open(path, 'rb') as mapped_file:
+        if os.fstat(mapped_file.fileno()).st_size == 0:
+            # Empty files cannot be mapped
+            return
+        with mmap.mmap(mapped_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            start = len(codecs.BOM_UTF8) if mapped[:len(codecs.BOM_UTF8)] == codecs.BOM_UTF8 else 0
+            size = len(mapped)
+            while start < size:
+                end = mapped.find(b'\n', start)
+                end = size if end < 0 else end + 1
+                yield mapped[start:end].decode('utf-8')
+                start = end
+
+
+# Size of the parts of a CSV file parsed by the workers of parse_files_in_parallel
+PARALLEL_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def parse_file_in_parallel(path: str,
+                           workers: Optional[int] = None,
+                           fields: Optional[Collection[str]] = None,
+                           chunk_size: int = PARALLEL_CHUNK_SIZE) -> Iterator[list[Publication]]:
+    """
+    Parse a (UTF-8) Scopus CSV export file in a pool of worker processes.
+
+    The file is split into parts of about `chunk_size` bytes ending at record boundaries, i.e. at line breaks
+    outside quoted cells (abstracts and references may contain line breaks), found by the parity of the
+    quotes before them. Every part is parsed by a worker, with the header row of the file, and the
+    publications are yielded part by part in the order of the file. At most twice as many parts as there are
+    workers are parsed ahead, so the memory usage does not depend on the file size.
+
+    :param path: Path to the CSV file.
+    :type path: str
+    :param workers: Number of worker processes (default: the number of CPUs).
+    :type workers: Optional[int]
+    :param fields: Names of the Publication attributes to read (see `ScopusCsvParser`).
+    :type fields: Optional[Collection[str]]
+    :param chunk_size: Approximate size in bytes of the parts parsed by the workers.
+    :type chunk_size: int
+    :raises ValueError: If the actual CSV header row does not match the expected header row.
+    :return: An iterator of lists of Publication instances, one list per (non-empty) part of the file.
+    :rtype: Iterator[List[Publication]]
+    """
+
+    for part in parse_files_in_parallel([path], workers=workers, fields=fields, chunk_size=chunk_size):
+        if part.error is not None:
+            raise part.error
+        if part.publications:
+            yield part.publications
+
+
+def parse_files_in_parallel(paths: Iterable[str],
+                            workers: Optional[int] = None,
+                            fields: Optional[Collection[str]] = None,
+                            chunk_size: int = PARALLEL_CHUNK_SIZE) -> Iterator[ParsedFilePart]:
+    """
+    Parse (UTF-8) Scopus CSV export files in a pool of worker processes.
+
+    Like `parse_file_in_parallel`, but the parts of all the files are parsed by the same workers, so many
+    small files are parsed concurrently as well. The parts are yielded in the order of the files (and of the
+    parts in a file), every file ends with a part without publications. A file which cannot be parsed
+    (e.g. it has an unexpected header row or a malformed record) ends with a part with the error,
+    the other files are still parsed.
+
+    :param paths: Paths to the CSV files.
+    :type paths: Iterable[str]
+    :param workers: Number of worker processes (default: the number of CPUs).
+    :type workers: Optional[int]
+    :param fields: Names of the Publication attributes to read (see `ScopusCsvParser`).
+    :type fields: Optional[Collection[str]]
+    :param chunk_size: Approximate size in bytes of the parts parsed by the workers.
+    :type chunk_size: int
+    :return: An iterator of the parsed parts of the files.
+    :rtype: Iterator[ParsedFilePart]
+    """
+
+    workers = workers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        parsing = deque()
+        failed_paths = set()
+        for task in _iter_file_tasks(executor, paths, fields, chunk_size):
+            parsing.append(task)
+            if len(parsing) >= 2 * workers:
+                if part := _collect_file_part(*parsing.popleft(), failed_paths):
+                    yield part
+        while parsing:
+            if part := _collect_file_part(*parsing.popleft(), failed_paths):
+                yield part
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def _iter_file_tasks(executor: ProcessPoolExecutor, paths: Iterable[str], fields: Optional[Collection[str]],
+                     chunk_size: int) -> Iterator[tuple[str, Optional[Future], Optional[Exception]]]:
+    """Submit the parts of the files to the workers, a task without a future marks the end of a file."""
+    for path in paths:
+        try:
+            with open(path, 'rb') as csv_file:
+                header_line = csv_file.readline()
+            header = header_line.decode('utf-8')
+            # Check the header before the parts of the file are submitted
+            ScopusCsvParser([header], fields=fields).read_all_publications()
+        except (OSError, ValueError, csv.Error) as error:
+            yield path, None, error
+            continue
+
+        if header_line:
+            for start, end in _iter_record_ranges(path, len(header_line), chunk_size):
+                yield path, executor.submit(_parse_file_range, path, start, end, header, fields), None
+        yield path, None, None
+
+
+def _collect_file_part(path: str, future: Optional[Future], error: Optional[Exception],
+                       failed_paths: set[str]) -> Optional[ParsedFilePart]:
+    """Wait for a part to be parsed, the remaining parts of a file which failed are dropped."""
+    if path in failed_paths:
+        return None
+    if future is not None:
+        try:
+            return ParsedFilePart(path, future.result())
+        except (OSError, ValueError, csv.Error) as parse_error:
+            error = parse_error
+    if error is not None:
+        failed_paths.add(path)
+    return ParsedFilePart(path, error=error)
+
+
+def _parse_file_range(path: str, start: int, end: int, header: str,
+                      fields: Optional[Collection[str]]) -> list[Publication]:
+    """Parse the records between two offsets of a CSV file (run by the workers of parse_files_in_parallel)."""
+    with open(path, 'rb') as csv_file:
+        csv_file.seek(start)
+        text = csv_file.read(end - start).decode('utf-8')
+    lines = itertools.chain([header], _iter_chunk_lines([text]))
+    return ScopusCsvParser(lines, fields=fields).read_all_publications()
+
+
+def _iter_record_ranges(path: str, start: int, chunk_size: int) -> Iterator[tuple[int, int]]:
+    """Split a CSV file, from the record starting at `start`, into byte ranges ending at record boundaries."""
+    with open(path, 'rb') as csv_file:
+        csv_file.seek(start)
+        data = b''
+        while block := csv_file.read(chunk_size):
+            data += block
+            end = _last_record_end(data)
+            if end > 0:
+                yield start, start + end
+                data = data[end:]
+                start += end
+        if data:
+            yield start, start + len(data)
+
+
+def _last_record_end(data: bytes) -> int:
+    """
+    Offset after the last line break outside quoted cells of CSV data starting with a record, or 0.
+    A line break is outside the quoted cells when an even number of quotes precede it
+    (escaped quotes are doubled, so they do not change the parity).
+    """
+    quotes = data.count(b'"')
+    limit = len(data)
+    while (line_end := data.rfind(b'\n', 0, limit)) >= 0:
+        quotes -= data.count(b'"', line_end, limit)
+        if quotes % 2 == 0:
+            return line_end + 1
+        limit = line_end
+    return 0
+
+
+# Columns of the Scopus CSV export (all field groups) in their order, and the Publication attribute
+# each one is read into (None: not read)
+_COLUMN_ATTRIBUTES = {
+    'Authors': None,
+    'Author full names': 'authors',
+    'Author(s) ID': None,
+    'Title': 'title',
+    'Year': 'year',
+    'Source title': 'source_title',
+    'Volume': 'volume',
+    'Issue': 'issue',
+    'Art. No.': 'article_number',
+    'Page start': 'page_start',
+    'Page end': 'page_end',
+    'Page count': 'page_count',
+    'Cited by': 'cited_by',
+    'DOI': 'doi',
+    'Link': 'link',
+    'Affiliations': 'affiliations',
+    'Authors with affiliations': None,
+    'Abstract': 'abstract',
+    'Author Keywords': 'author_keywords',
+    'Index Keywords': 'index_keywords',
+    'Molecular Sequence Numbers': None,
+    'Chemicals/CAS': None,
+    'Tradenames': 'tradenames',
+    'Manufacturers': 'manufacturers',
+    'Funding Details': 'funding_details',
+    'Funding Texts': 'funding_texts',
+    'References': 'references',
+    'Correspondence Address': 'correspondence_address',
+    'Editors': 'editors',
+    'Publisher': 'publisher',
+    'Sponsors': 'sponsors',
+    'Conference name': None,
+    'Conference date': None,
+    'Conference location': None,
+    'Conference code': None,
+    'ISSN': 'issn',
+    'ISBN': 'isbn',
+    'CODEN': 'coden',
+    'PubMed ID': 'pubmed_id',
+    'Language of Original Document': 'language_of_orig_doc',
+    'Abbreviated Source Title': 'abbr_source_title',
+    'Document Type': 'document_type',
+    'Publication Stage': 'publication_stage',
+    'Open Access': 'open_access',
+    'Source': 'source',
+    'EID': 'eid'
+}
+
+# Every export profile contains these
+_REQUIRED_COLUMNS = ('Title', 'EID')
+
+_LIST_ATTRIBUTES = {'authors', 'affiliations', 'author_keywords', 'index_keywords', 'tradenames', 'manufacturers',
+                    'editors', 'sponsors', 'open_access'}
+_TEXT_ATTRIBUTES = [a for a in _COLUMN_ATTRIBUTES.values() if a is not None and a not in _LIST_ATTRIBUTES]
@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from typing import List
+from typing import List, Optional
 
 
 @dataclass
@@ -84,3 +84,17 @@ class Publication:
             f"source={self.source!r}"
         ]
         return "\n".join(lines)
+
+
+@dataclass
+class ParsedFilePart:
+    """
+    Publications parsed from a part of a CSV file, see `parse_files_in_parallel`.
+
+    :ivar str path:                 Path to the CSV file.
+    :ivar List[Publication] publications: The publications of the part (empty for the last part of a file).
+    :ivar Optional[Exception] error: Why the file could not be parsed (the last part of a file which failed).
+    """
+    path: str
+    publications: List[Publication] = field(default_factory=list)
+    error: Optional[Exception] = None
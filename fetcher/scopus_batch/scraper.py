@@ -1,18 +1,39 @@
 import asyncio
+import base64
 import itertools
+import json
 import logging
 import random
 import string
-from typing import Any, Optional
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Collection, Optional, TextIO
 
 import httpx
 from httpx import Cookies, URL, Proxy
 
 from fetcher.exceptions import InvalidCookiesError
+from fetcher.sharding import plan_year_shards, YearShard
 from fetcher.scopus_batch import consts
+from fetcher.scopus_batch.journal import ExportJournal
 from fetcher.scopus_batch.models import SearchEidsResult, ExportFileType, FieldGroupIdentifiers
 
 
+def decode_jwt_expiry(token: str) -> Optional[float]:
+    """
+    Read the expiry (`exp` claim) of a JWT token, without verifying its signature.
+
+    :param str token: The JWT token.
+    :return: The expiry as a UNIX timestamp, or None if the token has no (readable) expiry.
+    :rtype: Optional[float]
+    """
+    try:
+        payload = token.split('.')[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+        return float(claims['exp'])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
 class ScopusScraperConfig:
     """
     Configuration container for ScopusScraper authentication and session cookies.
@@ -57,19 +78,37 @@ class ScopusScraperConfig:
         cookies.set(consts.COOKIE_JWT, value=self.scopus_jwt, domain=self.scopus_jwt_domain, path='/')
         return cookies
 
+    @property
+    def jwt_expires_at(self) -> Optional[float]:
+        """
+        Expiry of the JWT token (see :func:`decode_jwt_expiry`).
+
+        :return: The expiry as a UNIX timestamp, or None if it is unknown.
+        :rtype: Optional[float]
+        """
+        return decode_jwt_expiry(self.scopus_jwt)
+
 
 class ScopusScraper:
     """
     Asynchronous scraper for Scopus document EID enumeration and export via the Scopus web interface.
 
     Uses an HTTPX AsyncClient with a cookie-based session, automatic JWT refresh, and
-    batched export requests.
+    batched export requests (up to `max_concurrency` at the same time).
+
+    When the expiry of the JWT token is known, the token is refreshed `jwt_refresh_margin` seconds
+    before it expires, in the background while the scraper is open (`async with`), so requests are
+    not rejected because of it. Otherwise, it is refreshed when a request is rejected (HTTP 403).
 
     :cvar str BASE_URI:                         Base URL for Scopus web interface.
     :cvar int __MAX_EIDS_PER_SEARCH__:         Maximum number of EIDs returned per search request.
     :cvar int __MAX_BATCH_ITEMS_PER_REQUEST__: Maximum number of EIDs per export batch request.
     :param ScopusScraperConfig config:         Configuration object with authentication and cookie data.
     :param bool verify_ssl:                    Whether to verify SSL certificates (default: True).
+    :param int max_concurrency:                Maximum number of export requests sent at the same time.
+    :param float jwt_refresh_margin:           How long before its expiry the JWT token is refreshed, in seconds.
+    :param Optional[Callable[[ScopusScraperConfig], None]] on_cookies_refreshed: Called with the new cookies
+                                               after every successful JWT refresh (e.g. to save them).
     """
 
     BASE_URI = 'https://www.scopus.com'
@@ -82,8 +121,27 @@ class ScopusScraper:
     __MAX_BATCH_ITEMS_PER_REQUEST__ = 100
     """Maximum number of items accepted by the `/gateway/export-service/export` endpoint."""
 
+    MAX_EXPORT_SHARD_SIZE = 20000
+    """Maximum number of documents Scopus lets export at once (a sensible `shard_size` for :meth:`export_all`)."""
+
+    DEFAULT_MAX_CONCURRENCY = 4
+    """Default number of export requests sent at the same time."""
+
+    JWT_REFRESH_MARGIN = 60
+    """Default number of seconds before its expiry the JWT token is refreshed."""
+
+    JWT_REFRESH_RETRY_DELAY = 60
+    """Number of seconds after which a failed background JWT refresh is tried again."""
+
+    EID_PREFETCH_WINDOWS = 2
+    """Number of EID search results searched ahead of the export (size of the queue between both)."""
+
     def __init__(self, config: ScopusScraperConfig, verify_ssl: bool = True, base_uri: str = BASE_URI,
-                 proxy: URL | str | Proxy | None = None, transport: Optional[httpx.AsyncBaseTransport] = None):
+                 proxy: URL | str | Proxy | None = None, transport: Optional[httpx.AsyncBaseTransport] = None,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY, jwt_refresh_margin: float = JWT_REFRESH_MARGIN,
+                 on_cookies_refreshed: Optional[Callable[[ScopusScraperConfig], None]] = None,
+                 clock: Callable[[], float] = time.time,
+                 sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep):
         """
         Initialize the ScopusScraper.
 
@@ -92,7 +150,20 @@ class ScopusScraper:
         :param str base_uri:         Override the base URI (default: BASE_URI).
         :param URL | str | Proxy | None proxy:  Proxy to use when making HTTP(S) requests.
         :param Optional[httpx.AsyncBaseTransport] transport: Use a custom HTTPX transport
+        :param int max_concurrency:         Maximum number of export requests sent at the same time
+                                            (default: DEFAULT_MAX_CONCURRENCY).
+        :param float jwt_refresh_margin:    Refresh the JWT token this many seconds before it expires
+                                            (default: JWT_REFRESH_MARGIN).
+        :param Optional[Callable[[ScopusScraperConfig], None]] on_cookies_refreshed: Called with the new
+                                            cookies after every successful JWT refresh.
+        :param Callable[[], float] clock:   Returns the current time (UNIX timestamp), compared with the expiry
+                                            of the JWT token (default: time.time).
+        :param Callable[[float], Awaitable[Any]] sleep: Waits the given number of seconds before the JWT token
+                                            is refreshed in the background (default: asyncio.sleep).
+        :raises ValueError:                 If `max_concurrency` is lower than 1.
         """
+        if max_concurrency < 1:
+            raise ValueError(f'max_concurrency must be at least 1 (was {max_concurrency})')
 
         self._base = base_uri
         self._session = httpx.AsyncClient(verify=verify_ssl, timeout=60, proxy=proxy,
@@ -104,18 +175,63 @@ class ScopusScraper:
         self._sessionId = config.sc_session_id
         self._nextTransactionId = 1
         self._logger = logging.getLogger(__name__)
-        self._post_lock = asyncio.Lock()
+        self._max_concurrency = max_concurrency
+
+        # Only one JWT refresh at a time, the generation tells the callers waiting for it whether
+        # the token was refreshed in the meantime
+        self._refresh_lock = asyncio.Lock()
+        self._jwt_generation = 0
 
         # keep config for JWT refresh
         self._config = config
         self._refreshed = False
+        self._on_cookies_refreshed = on_cookies_refreshed
+        self._jwt_refresh_margin = jwt_refresh_margin
+        self._jwt_expires_at = config.jwt_expires_at
+        self._jwt_refresher: Optional[asyncio.Task] = None
+        self._clock = clock
+        self._sleep = sleep
 
     async def __aenter__(self):
+        if self._jwt_expires_at is not None:
+            self._jwt_refresher = asyncio.create_task(self._refresh_jwt_before_expiry())
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self._jwt_refresher is not None:
+            self._jwt_refresher.cancel()
         await self._session.aclose()
 
+    def _jwt_expiring(self) -> bool:
+        return self._jwt_expires_at is not None and self._clock() >= self._jwt_expires_at - self._jwt_refresh_margin
+
+    async def _refresh_jwt_before_expiry(self):
+        """
+        Background task refreshing the JWT token `jwt_refresh_margin` seconds before it expires.
+
+        Stops when the expiry of the token becomes unknown (e.g. after a rejected refresh). If the refresh fails
+        with an error, it is tried again after `JWT_REFRESH_RETRY_DELAY` seconds (meanwhile, an expiring token
+        is refreshed before the next request).
+        """
+
+        while self._jwt_expires_at is not None:
+            delay = self._jwt_expires_at - self._jwt_refresh_margin - self._clock()
+            if delay > 0:
+                self._logger.debug(f'Refreshing JWT token in {delay:.0f} s')
+                await self._sleep(delay)
+            if self._jwt_expiring():
+                try:
+                    await self._refresh_jwt_once(self._jwt_generation)
+                except Exception as error:
+                    # The task must keep running, or the token would not be refreshed proactively any more
+                    self._logger.warning(f'Refreshing the JWT token in the background failed ({error!r}), '
+                                         f'retrying in {self.JWT_REFRESH_RETRY_DELAY} s', exc_info=True)
+                    await self._sleep(self.JWT_REFRESH_RETRY_DELAY)
+                    continue
+                if self._jwt_expiring():
+                    self._logger.warning('The refreshed JWT token expires too soon, it will be refreshed when rejected')
+                    self._jwt_expires_at = None
+
     @staticmethod
     def _raise_for_error(response: httpx.Response):
         if response.status_code == httpx.codes.UNAUTHORIZED or response.status_code == httpx.codes.FORBIDDEN:
@@ -230,69 +346,294 @@ class ScopusScraper:
         ScopusScraper._raise_for_error(r)
         return r.text
 
-    async def export_all(self, title: str, file_type: ExportFileType, fields: list[FieldGroupIdentifiers]) -> str:
+    async def export_all(self, title: str, file_type: ExportFileType, fields: list[FieldGroupIdentifiers],
+                         shard_size: Optional[int] = None, sink: Optional[TextIO] = None,
+                         journal: Optional[ExportJournal] = None,
+                         skip_eids: Optional[Callable[[list[str]], Collection[str]]] = None) -> Optional[str]:
         """
         Export all search results for a given title, batching as necessary.
 
+        The parts are exported as described in :meth:`iter_export`. Without `sink`, they are concatenated
+        and returned. With `sink`, each part is written to it as soon as it is exported, so the
+        export is never held in memory as a whole.
+
+        :param str title:                        Document title or query string.
+        :param ExportFileType file_type:         Desired export file format.
+        :param list[FieldGroupIdentifiers] fields: Field group identifiers to include.
+        :param Optional[int] shard_size:         Split the query into publication year ranges of at most
+                                                 this many documents.
+        :param Optional[TextIO] sink:            Writable text stream (e.g. a file) the export is written to.
+        :param Optional[ExportJournal] journal:  Checkpoint the export (see :meth:`iter_export`).
+        :param Optional[Callable[[list[str]], Collection[str]]] skip_eids: Select EIDs not to export
+                                                 (see :meth:`iter_export`).
+        :return: Concatenated export text of all batches, or None when written to `sink`.
+        :rtype: Optional[str]
+        """
+
+        export_data = []
+        async for part in self.iter_export(title, file_type, fields, shard_size=shard_size, journal=journal,
+                                           skip_eids=skip_eids):
+            if sink is not None:
+                sink.write(part)
+            else:
+                export_data.append(part)
+        return ''.join(export_data) if sink is None else None
+
+    async def iter_export(self, title: str, file_type: ExportFileType, fields: list[FieldGroupIdentifiers],
+                          shard_size: Optional[int] = None,
+                          journal: Optional[ExportJournal] = None,
+                          skip_eids: Optional[Callable[[list[str]], Collection[str]]] = None) -> AsyncIterator[str]:
+        """
+        Export all search results for a given title part by part, batching as necessary.
+
         1. Searches up to `__MAX_EIDS_PER_SEARCH__` EIDs.
         2. Splits into batches of `__MAX_BATCH_ITEMS_PER_REQUEST__`.
-        3. Exports each batch in sequence, concatenating the text results.
-        4. Continues fetching more EIDs until totalResults is reached.
+        3. Exports up to `max_concurrency` batches at the same time, yielding the text results
+           in the order of the EIDs (each followed by a newline).
+        4. Continues fetching more EIDs until totalResults is reached. The next EIDs are searched
+           in the background while the current ones are exported (see :meth:`iter_eid_windows`).
+
+        With `shard_size`, the query is first split into disjoint publication year ranges (shards)
+        of at most `shard_size` documents (see :func:`fetcher.sharding.plan_year_shards`).
+        The EIDs of all shards are searched concurrently, merged without duplicates and exported
+        in batches as above.
+
+        With `journal`, the searched EIDs and the exported batches are recorded as they complete.
+        If the journal already contains some of them (from an interrupted export), they are taken
+        from it instead of Scopus, so only the rest is searched and exported. The journal is kept
+        when the export completes, the caller removes it once the export is stored.
+
+        With `skip_eids`, every searched window of EIDs is passed to it before being exported and the
+        EIDs it returns (e.g. the documents already stored) are left out of the export.
 
         :param str title:                        Document title or query string.
         :param ExportFileType file_type:         Desired export file format.
         :param list[FieldGroupIdentifiers] fields: Field group identifiers to include.
-        :return: Concatenated export text of all batches.
-        :rtype: str
+        :param Optional[int] shard_size:         Split the query into publication year ranges of at most
+                                                 this many documents.
+        :param Optional[ExportJournal] journal:  Checkpoint of the export (see
+                                                 :meth:`ExportJournal.for_export`).
+        :param Optional[Callable[[list[str]], Collection[str]]] skip_eids: Returns the EIDs of a window
+                                                 which should not be exported.
+        :raises HTTPError:                       If the HTTP response status indicates an error.
+        :raises InvalidCookiesError: If the provided cookies were invalid
+        :return: Async iterator of the exported text parts. Only the first part contains the headers.
+        :rtype: AsyncIterator[str]
         """
 
-        batch_prefix = ScopusScraper.get_batch_id_prefix()
+        batch_prefix = journal.batch_prefix if journal is not None else ScopusScraper.get_batch_id_prefix()
         self._logger.debug(f"export_all: using {batch_prefix} as the batch prefix")
 
         query = f'TITLE-ABS-KEY({title})'
 
+        skipped_eid_count = 0
+
+        def unskipped_eids(eids: list[str]) -> list[str]:
+            nonlocal skipped_eid_count
+            if skip_eids is None:
+                return eids
+            skipped = skip_eids(eids)
+            skipped_eid_count += len(skipped)
+            return [eid for eid in eids if eid not in skipped]
+
+        async def sharded_eid_windows() -> AsyncIterator[tuple[list[str], int]]:
+            sharded_eids = unskipped_eids(await self.search_sharded_eids(query, shard_size))
+            for eid_window in itertools.batched(sharded_eids, ScopusScraper.__MAX_EIDS_PER_SEARCH__):
+                yield list(eid_window), len(sharded_eids)
+
+        async def journaled_eid_windows() -> AsyncIterator[tuple[list[str], int]]:
+            if shard_size is not None and not journal.search_complete:
+                # Shards cannot continue a partial search, so all their EIDs are recorded before exporting
+                async for eids, all_eid_count in sharded_eid_windows():
+                    journal.add_window(eids, all_eid_count)
+                journal.complete_search()
+            for eid_window in journal.windows():
+                yield eid_window
+            if journal.search_complete:
+                return
+            async for eids, all_eid_count in self.iter_eid_windows(query, offset=journal.searched_eid_count):
+                new_eids = unskipped_eids(eids)
+                journal.add_window(new_eids, all_eid_count, searched=len(eids))
+                if journal.searched_eid_count >= all_eid_count:
+                    journal.complete_search()
+                yield new_eids, all_eid_count
+            journal.complete_search()
+
+        async def searched_eid_windows() -> AsyncIterator[tuple[list[str], int]]:
+            async for eids, all_eid_count in self.iter_eid_windows(query):
+                yield unskipped_eids(eids), all_eid_count
+
+        if journal is not None:
+            eid_windows = journaled_eid_windows()
+        elif shard_size is not None:
+            eid_windows = sharded_eid_windows()
+        else:
+            eid_windows = searched_eid_windows()
+
         # TODO: Handle timeouts
-        eid_search_results = await self.search_eids(ScopusScraper.__MAX_EIDS_PER_SEARCH__, 0, query)
-        all_eid_count = eid_search_results.response.num_found
-        eids = eid_search_results.response.docs
         exported_eid_count = 0
-        export_data = []
+        async for eids, all_eid_count in eid_windows:
+            for batch_data in await self._export_batches(eids, exported_eid_count, all_eid_count, file_type, fields,
+                                                         batch_prefix, journal):
+                yield batch_data
+                yield '\n'
+            exported_eid_count += len(eids)
+        self._logger.info(f'export_all: exported total of {exported_eid_count} EIDs')
+        if skipped_eid_count > 0:
+            self._logger.info(f'export_all: skipped {skipped_eid_count} EIDs')
+
+    async def iter_eid_windows(self, query: str, offset: int = 0) -> AsyncIterator[tuple[list[str], int]]:
+        """
+        Search all EIDs matching a query, `__MAX_EIDS_PER_SEARCH__` at a time.
 
-        self._logger.debug(f"export_all: EIDs to export: {all_eid_count}")
+        The search runs in a background task, which stays up to `EID_PREFETCH_WINDOWS` results
+        ahead of the consumer, so the next EIDs are already searched while the current ones are
+        being exported.
 
-        while exported_eid_count < all_eid_count:
-            for eid_batch in itertools.batched(eids, ScopusScraper.__MAX_BATCH_ITEMS_PER_REQUEST__):
-                batch_id = ScopusScraper.get_batch_id(exported_eid_count, batch_prefix)
-                self._logger.debug(f'export_all: batch_id: {batch_id}')
+        :param str query:       Scopus search query string (e.g. `"TITLE-ABS-KEY(...)"`).
+        :param int offset:      Zero-based offset of the first EID to search.
+        :raises HTTPError:      If the HTTP response status indicates an error.
+        :raises InvalidCookiesError: If the provided cookies were invalid
+        :return: Async iterator of the found EIDs and the total number of documents
+                 (as reported by the latest search).
+        :rtype: AsyncIterator[tuple[list[str], int]]
+        """
+
+        windows = asyncio.Queue(maxsize=ScopusScraper.EID_PREFETCH_WINDOWS)
+        done = object()
+
+        async def search():
+            nonlocal offset
+            try:
+                while True:
+                    result = await self.search_eids(ScopusScraper.__MAX_EIDS_PER_SEARCH__, offset, query)
+                    eids = result.response.docs
+                    all_eid_count = result.response.num_found
+                    self._logger.debug(f'iter_eid_windows: found {len(eids)} EIDs (offset={offset}, '
+                                       f'total={all_eid_count})')
+                    if len(eids) <= 0:
+                        break
+                    await windows.put((eids, all_eid_count))
+                    offset += len(eids)
+                    if offset >= all_eid_count:
+                        break
+            except Exception as error:
+                # Handed over to the consumer
+                await windows.put(error)
+            await windows.put(done)
+
+        searcher = asyncio.create_task(search())
+        try:
+            while True:
+                window = await windows.get()
+                if window is done:
+                    break
+                if isinstance(window, Exception):
+                    raise window
+                yield window
+        finally:
+            searcher.cancel()
+
+    async def search_sharded_eids(self, query: str, shard_size: int) -> list[str]:
+        """
+        Search all EIDs matching a query, split into publication year shards searched concurrently.
 
+        :param str query:      Scopus search query string (e.g. `"TITLE-ABS-KEY(...)"`).
+        :param int shard_size: Maximum number of documents of a shard.
+        :raises HTTPError:     If the HTTP response status indicates an error.
+        :raises InvalidCookiesError: If the provided cookies were invalid
+        :return: EIDs of all shards (ordered by shard), without duplicates.
+        :rtype: list[str]
+        """
+
+        async def count_results(shard_query: str) -> int:
+            result = await self.search_eids(1, 0, shard_query)
+            return result.response.num_found
+
+        async def search_shard(shard: YearShard) -> list[str]:
+            shard_query = shard.restrict(query)
+            shard_eids = []
+            while True:
+                result = await self.search_eids(ScopusScraper.__MAX_EIDS_PER_SEARCH__, len(shard_eids), shard_query)
+                shard_eids.extend(result.response.docs)
+                if len(result.response.docs) <= 0 or len(shard_eids) >= result.response.num_found:
+                    break
+            self._logger.debug(f'search_sharded_eids: {shard}: found {len(shard_eids)} EIDs')
+            return shard_eids
+
+        shards = await plan_year_shards(query, count_results, shard_size)
+        shard_eids = await asyncio.gather(*(search_shard(shard) for shard in shards))
+        eids = list(dict.fromkeys(itertools.chain.from_iterable(shard_eids)))
+        self._logger.info(f'search_sharded_eids: found {len(eids)} EIDs in {len(shards)} shard(s)')
+        return eids
+
+    async def _export_batches(self, eids: list[str], offset: int, total_docs: int, file_type: ExportFileType,
+                              fields: list[FieldGroupIdentifiers], batch_prefix: str,
+                              journal: Optional[ExportJournal] = None) -> list[str]:
+        """
+        Export EIDs in batches of `__MAX_BATCH_ITEMS_PER_REQUEST__`, up to `max_concurrency` batches at the same time.
+
+        :param list[str] eids:                   The EIDs to export.
+        :param int offset:                       Number of EIDs of the export exported before these
+                                                 (the headers are only exported with the first EID).
+        :param int total_docs:                   Total number of documents being exported.
+        :param ExportFileType file_type:         Desired export file format.
+        :param list[FieldGroupIdentifiers] fields: Field group identifiers to include.
+        :param str batch_prefix:                 Prefix of the batch IDs.
+        :param Optional[ExportJournal] journal:  Take the batches recorded in the journal from it,
+                                                 record the exported ones.
+        :raises HTTPError:                       If the HTTP response status indicates an error
+                                                 (the remaining batches are cancelled).
+        :raises InvalidCookiesError: If the provided cookies were invalid
+        :return: Export text of every batch, in the order of the EIDs.
+        :rtype: list[str]
+        """
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+        exported_eid_count = offset
+
+        async def export_batch(batch_offset: int, eid_batch: list[str]) -> str:
+            nonlocal exported_eid_count
+            if journal is not None:
+                batch_data = journal.get_part(batch_offset)
+                if batch_data is not None:
+                    exported_eid_count += len(eid_batch)
+                    return batch_data
+
+            async with semaphore:
+                batch_id = ScopusScraper.get_batch_id(batch_offset, batch_prefix)
+                self._logger.debug(f'export_all: batch_id: {batch_id}')
                 batch_data = await self.export_part(
                     batch_id,
-                    all_eid_count,
+                    total_docs,
                     eid_batch,
                     file_type,
                     fields,
-                    hide_headers=exported_eid_count > 0)
-                self._logger.debug(f'export_all: batch_data: {batch_data}')
-                export_data.append(batch_data)
-                export_data.append('\n')
-
-                exported_eid_count += len(eid_batch)
-                self._logger.info(f'export_all: exported {exported_eid_count}/{all_eid_count}')
-            self._logger.debug(f'export_all: researching EIDs (offset={exported_eid_count})')
-            eid_search_results = await self.search_eids(ScopusScraper.__MAX_EIDS_PER_SEARCH__, exported_eid_count,
-                                                        query)
-            all_eid_count = eid_search_results.response.num_found
-            eids = eid_search_results.response.docs
-            self._logger.debug(f'export_all: found {len(eids)} new EIDs')
-        self._logger.info(f'export_all: exported total of {exported_eid_count} EIDs')
-        return ''.join(export_data)
+                    hide_headers=batch_offset > 0)
+            self._logger.debug(f'export_all: batch_data: {batch_data}')
+            if journal is not None:
+                journal.save_part(batch_offset, batch_data)
+
+            exported_eid_count += len(eid_batch)
+            self._logger.info(f'export_all: exported {exported_eid_count}/{total_docs}')
+            return batch_data
+
+        batch_size = ScopusScraper.__MAX_BATCH_ITEMS_PER_REQUEST__
+        tasks = [asyncio.create_task(export_batch(offset + i * batch_size, list(eid_batch)))
+                 for i, eid_batch in enumerate(itertools.batched(eids, batch_size))]
+        try:
+            return await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
 
     async def _post(self, url: str, json: Any | None = None) -> httpx.Response:
         """
-        Internal helper to serialize POST requests and refresh JWT if needed.
+        Internal helper to send POST requests and refresh JWT if needed.
 
-        Automatically refreshes the JWT on HTTP status 403, and retries the original request
-        one time if the token was refreshed successfully.
+        Refreshes the JWT before sending the request if it is about to expire. Otherwise,
+        automatically refreshes the JWT on HTTP status 403, and retries the original request
+        one time if the token was refreshed successfully. Concurrent requests rejected with
+        the same token wait for a single refresh (see :meth:`_refresh_jwt_once`).
 
         :param str url:         Full request URL.
         :param Any json:        JSON payload for the POST.
@@ -300,14 +641,37 @@ class ScopusScraper:
         :rtype: httpx.Response
         """
 
-        async with self._post_lock:
-            r = await self._session.post(url, json=json)
-            if r.status_code == 403:
-                refresh_successful = await self._refresh_jwt_token()
-                if refresh_successful:
-                    r = await self._session.post(url, json=json)
+        generation = self._jwt_generation
+        if self._jwt_expiring():
+            await self._refresh_jwt_once(generation)
+            generation = self._jwt_generation
+        r = await self._session.post(url, json=json)
+        if r.status_code == 403:
+            if await self._refresh_jwt_once(generation):
+                r = await self._session.post(url, json=json)
         return r
 
+    async def _refresh_jwt_once(self, generation: int) -> bool:
+        """
+        Refresh the JWT token, unless it was already refreshed since a request was sent.
+
+        :param int generation: The token generation (`_jwt_generation`) the rejected request was sent with.
+        :return: Whether a newer token is available.
+        :rtype: bool
+        """
+
+        async with self._refresh_lock:
+            if self._jwt_generation != generation:
+                return True
+            r = await self._refresh_jwt_token()
+            if r.is_success:
+                self._jwt_generation += 1
+                self._jwt_expires_at = self._config.jwt_expires_at
+            else:
+                # Don't try to refresh proactively again, the requests rejected with the token will
+                self._jwt_expires_at = None
+            return r.is_success
+
     async def _refresh_jwt_token(self) -> httpx.Response:
         """
         Refresh the Scopus JWT token by calling the refresh endpoint.
@@ -331,6 +695,8 @@ class ScopusScraper:
                 scopus_session_uuid=self._session.cookies[consts.COOKIE_SESSION_UUID],
                 sc_session_id=self._session.cookies[consts.COOKIE_SESSION_ID]
             )
+            if self._on_cookies_refreshed is not None:
+                self._on_cookies_refreshed(self._config)
         else:
             self._logger.error('An error has occurred while refreshing the Scopus JWT token')
             self._logger.error(r.text)
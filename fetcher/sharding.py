@@ -0,0 +1,96 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import date
+from typing import Awaitable, Callable, Optional
+
+# Years considered when splitting a query, records published outside are still covered by the open-ended shards
+MIN_SHARD_YEAR = 1900
+
+
+@dataclass(frozen=True)
+class YearShard:
+    """
+    Part of a search query restricted to a range of publication years.
+
+    :ivar Optional[int] first_year:  First publication year of the shard (None: no lower bound).
+    :ivar Optional[int] last_year:   Last publication year of the shard (None: no upper bound).
+    :ivar int count:                 Number of results of the shard, as reported when it was planned.
+    """
+    first_year: Optional[int]
+    last_year: Optional[int]
+    count: int = 0
+
+    def restrict(self, query: str) -> str:
+        """
+        Restrict a Scopus search query to the shard.
+
+        :param str query: The search query, e.g. `TITLE-ABS-KEY(python)`.
+        :return: The query with a `PUBYEAR` condition.
+        :rtype: str
+        """
+        if self.first_year is not None and self.first_year == self.last_year:
+            return f'{query} AND PUBYEAR = {self.first_year}'
+        if self.first_year is not None:
+            query += f' AND PUBYEAR > {self.first_year - 1}'
+        if self.last_year is not None:
+            query += f' AND PUBYEAR < {self.last_year + 1}'
+        return query
+
+    def __str__(self):
+        first = self.first_year if self.first_year is not None else '...'
+        last = self.last_year if self.last_year is not None else '...'
+        return f'PUBYEAR {first}-{last} ({self.count} results)'
+
+
+async def plan_year_shards(query: str,
+                           count_results: Callable[[str], Awaitable[int]],
+                           max_shard_size: int,
+                           min_year: int = MIN_SHARD_YEAR,
+                           max_year: Optional[int] = None) -> list[YearShard]:
+    """
+    Split a search query into disjoint publication year ranges of at most `max_shard_size` results.
+
+    Ranges with too many results are split in half (by years) until they are small enough,
+    counting the results of both halves concurrently. A single year with too many results
+    cannot be split any further and is returned as is. The ranges at both ends are open-ended,
+    so together the shards cover every record with a publication year (ranges without
+    results are left out).
+
+    :param str query: The search query to split.
+    :param Callable[[str], Awaitable[int]] count_results: Returns the number of results of a query.
+    :param int max_shard_size: Maximum number of results of a shard.
+    :param int min_year: Lower bound of the split points (default: MIN_SHARD_YEAR).
+    :param Optional[int] max_year: Upper bound of the split points (default: next year).
+    :raises ValueError: If `max_shard_size` is lower than 1.
+    :return: The shards ordered by year, without the empty ones. A single unrestricted shard if the query is
+             small enough.
+    :rtype: list[YearShard]
+    """
+    if max_shard_size < 1:
+        raise ValueError(f'max_shard_size must be at least 1 (was {max_shard_size})')
+    if max_year is None:
+        max_year = date.today().year + 1
+    logger = logging.getLogger(__name__)
+
+    async def split(shard: YearShard) -> list[YearShard]:
+        if shard.count <= max_shard_size:
+            return [shard] if shard.count > 0 else []
+
+        low = shard.first_year if shard.first_year is not None else min_year
+        high = shard.last_year if shard.last_year is not None else max_year
+        if low >= high:
+            logger.warning(f'Cannot split {shard} any further, it exceeds the shard size of {max_shard_size}')
+            return [shard]
+        middle = (low + high) // 2
+
+        halves = [YearShard(shard.first_year, middle), YearShard(middle + 1, shard.last_year)]
+        counts = await asyncio.gather(*(count_results(h.restrict(query)) for h in halves))
+        halves = [YearShard(h.first_year, h.last_year, c) for h, c in zip(halves, counts)]
+        split_halves = await asyncio.gather(*(split(h) for h in halves))
+        return split_halves[0] + split_halves[1]
+
+    whole = YearShard(None, None, await count_results(query))
+    shards = await split(whole)
+    logger.info(f'Split the query into {len(shards)} shard(s): {", ".join(str(s) for s in shards)}')
+    return shards
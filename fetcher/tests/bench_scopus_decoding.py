@@ -0,0 +1,77 @@
+"""
+Micro-benchmark of the Scopus API response decoding paths.
+
+Compares decoding a response with the standard library json module and with the fast decoder
+(orjson, if installed), each followed by building :class:`SearchResults` and touching the fields
+the database inserter reads.
+
+Usage::
+
+    python -m fetcher.tests.bench_scopus_decoding [PAGE.json ...] [--repeat N]
+
+Without arguments, the recorded page in `fetcher/tests/data/scopus-api` is used.
+"""
+import argparse
+import glob
+import os
+import time
+import tracemalloc
+from typing import Callable
+
+from fetcher.scopus.decoding import fast_loads, stdlib_loads, FAST_BACKEND
+from fetcher.scopus.models import SearchResults
+
+
+def _consume(results: SearchResults):
+    for entry in results.entry:
+        _ = entry.title, entry.authkeywords, [a.authid for a in entry.authors], [a.afid for a in entry.affiliations]
+
+
+def _decoder(loads) -> Callable[[bytes], SearchResults]:
+    def decode(raw: bytes) -> SearchResults:
+        return SearchResults(json_data=loads(raw))
+    return decode
+
+
+def _measure(decode: Callable[[bytes], SearchResults], pages: list[bytes], repeat: int) -> tuple[float, int]:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for raw in pages:
+            _consume(decode(raw))
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    for raw in pages:
+        _consume(decode(raw))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    default_pages = os.path.join(os.path.dirname(__file__), 'data', 'scopus-api', '*.json')
+
+    parser = argparse.ArgumentParser(description='Scopus API response decoding benchmark')
+    parser.add_argument('pages', nargs='*', help='Recorded Scopus Search API responses (JSON)')
+    parser.add_argument('--repeat', type=int, default=200, help='How many times to decode every page (default: 200)')
+    args = parser.parse_args()
+
+    pages = []
+    for path in args.pages or sorted(glob.glob(default_pages)):
+        with open(path, 'rb') as page_file:
+            pages.append(page_file.read())
+    total_size = sum(len(p) for p in pages)
+    print(f'{len(pages)} page(s), {total_size / 1024:.0f} KiB, {args.repeat} repeats')
+
+    paths = [
+        ('json', _decoder(stdlib_loads)),
+        (FAST_BACKEND, _decoder(fast_loads)),
+    ]
+    for name, decode in paths:
+        elapsed, peak = _measure(decode, pages, args.repeat)
+        throughput = total_size * args.repeat / elapsed / 1024 / 1024
+        print(f'{name:40} {elapsed:8.3f} s {throughput:8.1f} MiB/s   peak {peak / 1024:8.0f} KiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+import json
+import os
+import tempfile
+import unittest
+from dataclasses import fields as dataclass_fields
+from unittest import mock
+
+from database import dbContext
+from database.dbInsertsAIOptimised import scopusApiInsertOptimised, scopusBatchInsertOptimised
+from fetcher.scopus.models import SearchEntry
+from fetcher.scopus_batch.parser import ScopusCsvParser
+from fetcher.scopus_batch.parser_models import Publication
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+
+class _RecordingDict(dict):
+    """API JSON object recording the fields read from it (with the field of the parent object, if nested)."""
+
+    def __init__(self, data: dict, accessed: set[tuple[str, str]], parent: str = ''):
+        super().__init__({key: self._wrap(value, accessed, key if not parent else parent)
+                          for key, value in data.items()})
+        self._accessed = accessed
+        self._parent = parent
+
+    @staticmethod
+    def _wrap(value, accessed: set[tuple[str, str]], parent: str):
+        if isinstance(value, dict):
+            return _RecordingDict(value, accessed, parent)
+        if isinstance(value, list):
+            return [_RecordingDict(v, accessed, parent) if isinstance(v, dict) else v for v in value]
+        return value
+
+    def get(self, key, default=None):
+        self._accessed.add((self._parent, key))
+        return super().get(key, default)
+
+    def __getitem__(self, key):
+        self._accessed.add((self._parent, key))
+        return super().__getitem__(key)
+
+
+class TestConsumedAttributes(unittest.TestCase):
+    """The inserters must not read anything outside of the fields they request from the fetchers."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(dbContext, 'DATABASE', os.path.join(self.temp_dir.name, 'test.db'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        dbContext.create_db_if_missing()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_scopus_api(self):
+        with open(os.path.join(DATA_DIR, 'scopus-api', 'complete-view-page.json'), 'rb') as page_file:
+            entries_json = json.load(page_file)['search-results']['entry']
+        accessed = set()
+        entries = [SearchEntry(_RecordingDict(entry, accessed)) for entry in entries_json]
+
+        with dbContext.app.app_context():
+            scopusApiInsertOptimised.scopusAPIInsertOptimised(entries)
+
+        consumed = set()
+        for attribute in scopusApiInsertOptimised.CONSUMED_ATTRIBUTES:
+            parent, _, child = attribute.partition('.')
+            if child:
+                parent_field = SearchEntry.API_FIELDS[parent]
+                consumed.add(('', parent_field))
+                consumed.add((parent_field, SearchEntry.NESTED_API_FIELDS[parent][child]))
+            else:
+                consumed.add(('', SearchEntry.API_FIELDS[attribute]))
+        self.assertTrue(accessed, msg='No access was recorded')
+        self.assertEqual(set(), accessed - consumed, msg='Fields read outside of CONSUMED_ATTRIBUTES')
+
+    def test_scopus_batch(self):
+        accessed = set()
+        field_names = {f.name for f in dataclass_fields(Publication)}
+
+        class RecordingPublication(Publication):
+            def __getattribute__(self, name):
+                if name in field_names:
+                    accessed.add(name)
+                return super().__getattribute__(name)
+
+        publications = [RecordingPublication(**p.__dict__) for p in ScopusCsvParser.from_file(
+            os.path.join(DATA_DIR, 'scopus-batch', 'golden-1.csv')).read_all_publications()]
+
+        with dbContext.app.app_context():
+            scopusBatchInsertOptimised.scopusBatchInsertOptimised(publications)
+
+        self.assertTrue(accessed, msg='No access was recorded')
+        self.assertEqual(set(), accessed - set(scopusBatchInsertOptimised.CONSUMED_ATTRIBUTES),
+                         msg='Attributes read outside of CONSUMED_ATTRIBUTES')
+
+
+if __name__ == '__main__':
+    unittest.main()
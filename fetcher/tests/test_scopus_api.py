@@ -0,0 +1,190 @@
+import asyncio
+import unittest
+from datetime import date
+
+import httpx
+
+from fetcher.scopus.api import ScopusApi, SCOBUS_SEARCH_MAX_OFFSET
+from fetcher.scopus.models import PaginationMode, SearchEntry
+from fetcher.scopus.rate_limiter import RateLimiter
+
+
+def _unlimited() -> RateLimiter:
+    return RateLimiter(requests_per_second=100000)
+
+
+def _build_entry(index: int) -> dict:
+    return {
+        'eid': f'2-s2.0-{index:011d}',
+        'dc:identifier': f'SCOPUS_ID:{index:011d}',
+        'dc:title': f'Publication {index}',
+        'prism:coverDate': '2024-01-01',
+        'author': [{'authid': str(index), 'authname': f'Author {index}'}],
+        'affiliation': [{'afid': str(index), 'affilname': f'University {index}'}]
+    }
+
+
+def _build_page(total: int, start: int, count: int, next_cursor: str | None = None) -> dict:
+    entries = [_build_entry(i) for i in range(start, min(start + count, total))]
+    page = {
+        'search-results': {
+            'opensearch:totalResults': str(total),
+            'opensearch:startIndex': str(start),
+            'opensearch:itemsPerPage': str(len(entries)),
+            'entry': entries
+        }
+    }
+    if next_cursor is not None:
+        page['search-results']['cursor'] = {'@current': '', '@next': next_cursor}
+    return page
+
+
+class TestScopusApiSearch(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.total = 110
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requested_starts = []
+
+        async def mock_handler(request: httpx.Request) -> httpx.Response:
+            start = int(request.url.params['start'])
+            count = int(request.url.params['count'])
+            self.requested_starts.append(start)
+
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            # Let the other requests catch up, so that concurrency can be observed
+            await asyncio.sleep(0.01)
+            self.in_flight -= 1
+
+            return httpx.Response(200, json=_build_page(self.total, start, count))
+        self.mock_t = httpx.MockTransport(mock_handler)
+
+    def _client(self, **kwargs) -> ScopusApi:
+        kwargs.setdefault('transport', self.mock_t)
+        return ScopusApi(api_key='key', rate_limiter_factory=_unlimited, **kwargs)
+
+    async def test_search_sequential(self):
+        async with self._client() as client:
+            entries = await client.search('python')
+
+        self.assertEqual([_build_entry(i)['eid'] for i in range(self.total)], [e.eid for e in entries])
+        self.assertEqual(1, self.max_in_flight, msg='Pages were fetched concurrently with max_concurrency=1')
+
+    async def test_search_concurrent(self):
+        async with self._client(max_concurrency=3) as client:
+            entries = await client.search('python')
+
+        self.assertEqual([_build_entry(i)['eid'] for i in range(self.total)], [e.eid for e in entries],
+                         msg='Entries were not returned in page order')
+        self.assertEqual(3, self.max_in_flight, msg='The in-flight limit was not used or not respected')
+        self.assertCountEqual([0, 25, 50, 75, 100], self.requested_starts)
+
+    async def test_iter_search_batches(self):
+        async with self._client(max_concurrency=2) as client:
+            batches = [batch async for batch in client.iter_search('python')]
+
+        self.assertEqual([25, 25, 25, 25, 10], [len(batch) for batch in batches])
+        self.assertEqual(self.total, len({e.eid for batch in batches for e in batch}))
+
+    async def test_iter_search_stop_early(self):
+        async with self._client(max_concurrency=2) as client:
+            async for batch in client.iter_search('python'):
+                self.assertEqual(25, len(batch))
+                break
+
+        # first page + at most max_concurrency prefetched pages
+        self.assertLessEqual(len(self.requested_starts), 3)
+
+    async def test_iter_search_empty(self):
+        async def empty_handler(_: httpx.Request) -> httpx.Response:
+            page = _build_page(0, 0, 25)
+            page['search-results']['entry'] = [{'@_fa': 'true', 'error': 'Result set was empty'}]
+            return httpx.Response(200, json=page)
+
+        async with self._client(transport=httpx.MockTransport(empty_handler)) as client:
+            entries = await client.search('python')
+        self.assertEqual(0, len(entries))
+
+    async def test_offset_limit(self):
+        self.total = SCOBUS_SEARCH_MAX_OFFSET + 100
+        async with self._client(max_concurrency=8) as client:
+            entries = await client.search('python')
+
+            self.assertEqual(SCOBUS_SEARCH_MAX_OFFSET, len(entries))
+            self.assertLess(max(self.requested_starts), SCOBUS_SEARCH_MAX_OFFSET)
+            self.assertTrue(client.truncated, msg='The truncated search was not reported')
+
+            # The next search is not truncated
+            self.total = 100
+            await client.search('python')
+            self.assertFalse(client.truncated, msg='The truncation of the previous search was reported')
+
+    async def test_offset_limit_not_reached(self):
+        self.total = SCOBUS_SEARCH_MAX_OFFSET
+        async with self._client(max_concurrency=8) as client:
+            entries = await client.search('python')
+
+        self.assertEqual(SCOBUS_SEARCH_MAX_OFFSET, len(entries))
+        self.assertFalse(client.truncated)
+
+    async def test_cursor_pagination(self):
+        total = SCOBUS_SEARCH_MAX_OFFSET + 10
+        requested_cursors = []
+
+        async def cursor_handler(request: httpx.Request) -> httpx.Response:
+            self.assertNotIn('start', request.url.params)
+            cursor = request.url.params['cursor']
+            requested_cursors.append(cursor)
+
+            # The cursor encodes the next start index, the last page still returns a cursor
+            start = 0 if cursor == '*' else int(cursor.removeprefix('c'))
+            count = int(request.url.params['count'])
+            return httpx.Response(200, json=_build_page(total, start, count, next_cursor=f'c{start + count}'))
+
+        async with self._client(pagination=PaginationMode.CURSOR,
+                               transport=httpx.MockTransport(cursor_handler)) as client:
+            entries = await client.search('python')
+
+        self.assertEqual([_build_entry(i)['eid'] for i in range(total)], [e.eid for e in entries])
+        self.assertEqual('*', requested_cursors[0])
+        self.assertEqual(len(requested_cursors), len(set(requested_cursors)), msg='A cursor was requested twice')
+
+    async def test_fields(self):
+        requested_fields = []
+
+        async def fields_handler(request: httpx.Request) -> httpx.Response:
+            requested_fields.append(request.url.params.get('field'))
+            return httpx.Response(200, json=_build_page(10, 0, 25))
+
+        fields = SearchEntry.api_fields(['title', 'eid', 'authors.authid', 'affiliations.afid'])
+        self.assertEqual(['dc:title', 'eid', 'authid', 'afid'], fields)
+
+        async with self._client(transport=httpx.MockTransport(fields_handler)) as client:
+            await client.search('python')
+        async with self._client(transport=httpx.MockTransport(fields_handler), fields=fields) as client:
+            await client.search('python')
+        self.assertEqual([None, 'dc:title,eid,authid,afid'], requested_fields)
+
+    async def test_loaded_after(self):
+        queries = []
+
+        async def query_handler(request: httpx.Request) -> httpx.Response:
+            queries.append(request.url.params['query'])
+            return httpx.Response(200, json=_build_page(30, int(request.url.params['start']), 25))
+
+        async with self._client(transport=httpx.MockTransport(query_handler)) as client:
+            await client.search('python', loaded_after=date(2025, 3, 7))
+        self.assertEqual(['TITLE-ABS-KEY(python) AND ORIG-LOAD-DATE AFT 20250307'] * 2, queries)
+
+    def test_unknown_field(self):
+        with self.assertRaises(ValueError):
+            SearchEntry.api_fields(['authors.title'])
+
+    async def test_invalid_concurrency(self):
+        with self.assertRaises(ValueError):
+            ScopusApi(api_key='key', transport=self.mock_t, max_concurrency=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import copy
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from database import dbContext
+from database.dbInsertsAIOptimised.scopusApiInsertOptimised import scopusAPIBeginInsert, scopusAPIInsertOptimised
+from fetcher.scopus.models import SearchEntry
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+
+class TestScopusApiInsert(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'test.db')
+        patcher = mock.patch.object(dbContext, 'DATABASE', self.db_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        dbContext.create_db_if_missing()
+
+        with open(os.path.join(DATA_DIR, 'scopus-api', 'complete-view-page.json'), 'rb') as page_file:
+            self.entries_json = json.load(page_file)['search-results']['entry']
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _article_count(self) -> int:
+        with sqlite3.connect(self.db_path) as db:
+            return db.execute("SELECT COUNT(*) FROM Article").fetchone()[0]
+
+    def _harvest(self, entries_json: list[dict]):
+        # Every incremental run is a separate import, inserted page by page
+        with dbContext.app.app_context():
+            insert_id = scopusAPIBeginInsert()
+            scopusAPIInsertOptimised([SearchEntry(e) for e in entries_json], insert_id=insert_id)
+
+    def test_incremental_overlap(self):
+        self._harvest(self.entries_json)
+        count = self._article_count()
+        self.assertEqual(len(self.entries_json), count)
+
+        # The next run fetches the records of the overlap again, and a new one
+        new_entry = copy.deepcopy(self.entries_json[0])
+        new_entry['eid'] = '2-s2.0-00000000001'
+        new_entry['prism:doi'] = '10.0000/new'
+        self._harvest(self.entries_json[len(self.entries_json) // 2:] + [new_entry])
+        self.assertEqual(count + 1, self._article_count(), msg='Articles of the overlap were inserted again')
+
+        self._harvest(self.entries_json)
+        self.assertEqual(count + 1, self._article_count())
+
+    def test_known_doi(self):
+        entry = next(e for e in self.entries_json if e.get('prism:doi'))
+        self._harvest([entry])
+        # Stored by an import with the DOI but without the EID, e.g. an older Scopus batch import
+        with sqlite3.connect(self.db_path) as db:
+            db.execute("UPDATE Article SET EID = NULL, DOI = ?", (entry['prism:doi'],))
+
+        self._harvest([entry])
+        self.assertEqual(1, self._article_count())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+import zlib
+from unittest import mock
+
+from fetcher.scopus_batch import cache as cache_module
+from fetcher.scopus_batch.cache import ParsedExportCache, hash_file
+from fetcher.scopus_batch.parser import ScopusCsvParser
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data', 'scopus-batch')
+
+
+class TestParsedExportCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'cache.db')
+        self.csv_path = os.path.join(DATA_DIR, 'golden-1.csv')
+        self.expected = ScopusCsvParser.from_file(self.csv_path).read_all_publications()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _parse(self, batch_size: int = 2):
+        return ScopusCsvParser.from_file(self.csv_path).iter_batches(batch_size=batch_size)
+
+    def test_hit_miss(self):
+        with ParsedExportCache(self.path) as cache:
+            key = ParsedExportCache.build_key(hash_file(self.csv_path))
+            self.assertIsNone(cache.get(key))
+            self.assertEqual(self.expected, [p for b in cache.put(key, self._parse()) for p in b])
+
+        with ParsedExportCache(self.path) as cache:
+            batches = list(cache.get(key))
+            self.assertEqual((1, 0), (cache.hits, cache.misses))
+        self.assertEqual([2, 1], [len(b) for b in batches], msg='The batches were not kept')
+        self.assertEqual(self.expected, [p for b in batches for p in b])
+
+    def test_json_parts(self):
+        with ParsedExportCache(self.path) as cache:
+            list(cache.put('key', self._parse()))
+        # The parts are plain data, loading them cannot run any code
+        with sqlite3.connect(self.path) as db:
+            bodies = [row[0] for row in db.execute("SELECT Body FROM ExportPart ORDER BY Seq")]
+        rows = [r for body in bodies for r in json.loads(zlib.decompress(body))]
+        eid = cache_module._PUBLICATION_FIELDS.index('eid')
+        self.assertEqual([p.eid for p in self.expected], [r[eid] for r in rows])
+
+    def test_key(self):
+        key = ParsedExportCache.build_key(hash_file(self.csv_path))
+        self.assertEqual(key, ParsedExportCache.build_key(hash_file(self.csv_path)))
+        self.assertNotEqual(key, ParsedExportCache.build_key(hash_file(self.csv_path), ['eid']))
+        self.assertNotEqual(key, ParsedExportCache.build_key(hash_file(os.path.join(DATA_DIR, 'empty.csv'))))
+
+    def test_incomplete_not_stored(self):
+        with ParsedExportCache(self.path) as cache:
+            batches = cache.put('key', self._parse(batch_size=1))
+            next(batches)
+            batches.close()
+            self.assertIsNone(cache.get('key'))
+
+    def test_parser_version(self):
+        with ParsedExportCache(self.path) as cache:
+            list(cache.put('key', self._parse()))
+        with mock.patch.object(ScopusCsvParser, 'VERSION', ScopusCsvParser.VERSION + 1):
+            with ParsedExportCache(self.path) as cache:
+                self.assertIsNone(cache.get('key'), msg='An entry of the previous parser version was used')
+
+    def test_publication_fields(self):
+        with ParsedExportCache(self.path) as cache:
+            list(cache.put('key', self._parse()))
+        fields = list(reversed(cache_module._PUBLICATION_FIELDS))
+        with mock.patch.object(cache_module, '_PUBLICATION_FIELDS', fields):
+            with ParsedExportCache(self.path) as cache:
+                self.assertIsNone(cache.get('key'), msg='An entry of a different Publication layout was used')
+
+    def test_evict_least_recently_used(self):
+        with ParsedExportCache(self.path) as cache:
+            list(cache.put('a', self._parse()))
+            size = cache._size
+
+        # Room for 2 entries only
+        with ParsedExportCache(self.path, max_size=2 * size) as cache:
+            time.sleep(0.01)
+            list(cache.put('b', self._parse()))
+            time.sleep(0.01)
+            cache.get('a')
+            time.sleep(0.01)
+            list(cache.put('c', self._parse()))
+
+            self.assertIsNone(cache.get('b'))
+            self.assertIsNotNone(cache.get('a'))
+            self.assertIsNotNone(cache.get('c'))
+
+    def test_too_big(self):
+        with ParsedExportCache(self.path, max_size=10) as cache:
+            self.assertEqual(self.expected, [p for b in cache.put('key', self._parse()) for p in b])
+            self.assertIsNone(cache.get('key'))
+
+
+if __name__ == '__main__':
+    unittest.main()
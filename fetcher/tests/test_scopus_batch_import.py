@@ -0,0 +1,88 @@
+import csv
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from cli import scopus_batch
+from cli.options import CommonFetcherOptions
+from fetcher.scopus_batch.parser import ScopusCsvParser
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data', 'scopus-batch')
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestDirectoryImport(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        golden_path = os.path.join(DATA_DIR, 'golden-1.csv')
+        self.expected_count = len(ScopusCsvParser.from_file(golden_path).read_all_publications())
+
+        shutil.copy(golden_path, os.path.join(self.temp_dir.name, 'a.csv'))
+        # A record with a field over the csv module field size limit
+        with open(golden_path, 'r', encoding='utf-8-sig', newline='') as golden_file:
+            header = golden_file.readline()
+        with open(os.path.join(self.temp_dir.name, 'b.csv'), 'w', encoding='utf-8', newline='') as malformed_file:
+            malformed_file.write(header + '"' + 'x' * (csv.field_size_limit() + 1) + '"\r\n')
+        shutil.copy(golden_path, os.path.join(self.temp_dir.name, 'c.csv'))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    async def _import(self, parse_workers: int):
+        events = []
+        result = await scopus_batch.use(CommonFetcherOptions(search_query='x', verify_ssl=True, debug_proxy=None),
+                                        input_file_path=self.temp_dir.name,
+                                        parse_workers=parse_workers,
+                                        on_batch=lambda batch: events.append(('batch', len(batch))),
+                                        on_imported=lambda fingerprint: events.append(('imported',)),
+                                        on_import_end=lambda: events.append(('end',)))
+        return result, events
+
+    async def test_malformed_dump(self):
+        for parse_workers in (1, 2):
+            with self.subTest(parse_workers=parse_workers):
+                result, events = await self._import(parse_workers)
+
+                self.assertEqual(1, len(result.errors))
+                self.assertIn('b.csv', result.errors[0])
+                # Every dump ends its import, the malformed one without being recorded as imported
+                self.assertEqual([('batch', self.expected_count), ('imported',), ('end',),
+                                  ('end',),
+                                  ('batch', self.expected_count), ('imported',), ('end',)], events)
+
+
+class TestDirectoryImportCli(unittest.TestCase):
+    def test_spawned_workers(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            dump_dir = os.path.join(temp_dir, 'dumps')
+            os.makedirs(dump_dir)
+            with open(os.path.join(DATA_DIR, 'golden-1.csv'), 'r', encoding='utf-8-sig', newline='') as golden_file:
+                golden = golden_file.read()
+            for i in range(3):
+                with open(os.path.join(dump_dir, f'{i}.csv'), 'w', encoding='utf-8', newline='') as dump_file:
+                    # Different data in every dump, so none of them is skipped as already imported
+                    dump_file.write(golden + '\n' * i)
+
+            # The workers are spawned (as on Windows and macOS, and in the frozen executable),
+            # so they import main.py again
+            site_dir = os.path.join(temp_dir, 'site')
+            os.makedirs(site_dir)
+            with open(os.path.join(site_dir, 'sitecustomize.py'), 'w') as site_file:
+                site_file.write("import multiprocessing\nmultiprocessing.set_start_method('spawn', force=True)\n")
+            env = dict(os.environ, PYTHONPATH=os.pathsep.join([site_dir, REPO_DIR]))
+
+            process = subprocess.run([sys.executable, os.path.join(REPO_DIR, 'main.py'), '--scopus-batch',
+                                      '--scopus-batch-file', dump_dir, '--scopus-batch-parse-workers', '2', 'x'],
+                                     cwd=temp_dir, env=env, capture_output=True, text=True, timeout=120)
+
+        output = process.stdout + process.stderr
+        self.assertEqual(0, process.returncode, msg=output)
+        self.assertEqual(1, output.count('using Scopus batch export'), msg='A worker ran the CLI again')
+        self.assertIn('imported 9 publications from 3 files (3 imported)', output)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,13 @@
+import csv
+import inspect
+import io
 import json
 import os
+import tempfile
 import unittest
 
-from fetcher.scopus_batch.parser import ScopusCsvParser
+from fetcher.scopus_batch.models import ExportProfile, FieldGroupIdentifiers, all_identifiers
+from fetcher.scopus_batch.parser import ScopusCsvParser, parse_file_in_parallel, parse_files_in_parallel
 
 
 class TestParser(unittest.TestCase):
@@ -32,6 +37,179 @@ class TestParser(unittest.TestCase):
                     expected_ith_pub = expected[i]
                     self.assertEqual(actual_ith_pub, expected_ith_pub)
 
+    def test_lines_and_bom(self):
+        input_path = os.path.join(self.data_dir, 'golden-1.csv')
+        with open(input_path, 'r') as input_file:
+            expected = [p.__dict__ for p in ScopusCsvParser(input_file.read()).read_all_publications()]
+
+        with open(input_path, 'r', newline='') as input_file:
+            pubs = ScopusCsvParser(input_file).read_all_publications()
+        self.assertEqual(expected, [p.__dict__ for p in pubs])
+
+        with open(input_path, 'r') as input_file:
+            pubs = ScopusCsvParser('\ufeff' + input_file.read()).read_all_publications()
+        self.assertEqual(expected, [p.__dict__ for p in pubs])
+
+    def test_from_file(self):
+        input_path = os.path.join(self.data_dir, 'golden-1.csv')
+        with open(input_path, 'r', encoding='utf-8', newline='') as input_file:
+            data = input_file.read()
+        expected = [p.__dict__ for p in ScopusCsvParser(data).read_all_publications()]
+
+        pubs = ScopusCsvParser.from_file(input_path).read_all_publications()
+        self.assertEqual(expected, [p.__dict__ for p in pubs])
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            bom_path = os.path.join(temp_dir, 'bom.csv')
+            with open(bom_path, 'w', encoding='utf-8-sig', newline='') as bom_file:
+                bom_file.write(data.replace('\r\n', '\n').replace('\n', '\r\n'))
+            pubs = ScopusCsvParser.from_file(bom_path).read_all_publications()
+            self.assertEqual(expected, [p.__dict__ for p in pubs])
+
+            zero_path = os.path.join(temp_dir, 'zero.csv')
+            open(zero_path, 'w').close()
+            self.assertEqual([], ScopusCsvParser.from_file(zero_path).read_all_publications())
+
+        pubs = ScopusCsvParser.from_file(os.path.join(self.data_dir, 'empty.csv')).read_all_publications()
+        self.assertEqual([], pubs)
+
+    def test_close(self):
+        parser = ScopusCsvParser.from_file(os.path.join(self.data_dir, 'golden-1.csv'))
+        self.assertEqual(inspect.GEN_SUSPENDED, inspect.getgeneratorstate(parser._source))
+        parser.close()
+        # The file and its memory map are released before all the rows are parsed
+        self.assertEqual(inspect.GEN_CLOSED, inspect.getgeneratorstate(parser._source))
+        self.assertEqual([], parser.read_all_publications())
+
+        # Sources which cannot be closed are accepted
+        ScopusCsvParser(['a\n']).close()
+
+    def test_batches_and_chunks(self):
+        input_path = os.path.join(self.data_dir, 'golden-1.csv')
+        with open(input_path, 'r', newline='') as input_file:
+            data = input_file.read()
+        expected = [p.__dict__ for p in ScopusCsvParser(data).read_all_publications()]
+
+        batches = list(ScopusCsvParser(data).iter_batches(batch_size=2))
+        self.assertEqual([2, 1], [len(b) for b in batches])
+        self.assertEqual(expected, [p.__dict__ for b in batches for p in b])
+
+        for chunk_size in (1, 7, 4096):
+            with self.subTest(chunk_size=chunk_size):
+                chunks = (data[i:i + chunk_size] for i in range(0, len(data), chunk_size))
+                pubs = ScopusCsvParser.from_chunks(chunks).iter_publications()
+                self.assertEqual(expected, [p.__dict__ for p in pubs])
+
+    def test_parallel(self):
+        # A concatenated export (the header is repeated) with line breaks and quotes in the abstracts
+        input_path = os.path.join(self.data_dir, 'golden-1.csv')
+        with open(input_path, 'r', newline='') as input_file:
+            header, *rows = list(csv.reader(input_file))
+        abstract = header.index('Abstract')
+        data = io.StringIO()
+        writer = csv.writer(data, quoting=csv.QUOTE_ALL)
+        writer.writerow(header)
+        for i in range(40):
+            if i == 20:
+                writer.writerow(header)
+            row = list(rows[i % len(rows)])
+            row[abstract] = f'{i}\n"quoted"\n\n' + row[abstract][:i * 20]
+            writer.writerow(row)
+        expected = [p.__dict__ for p in ScopusCsvParser(data.getvalue()).read_all_publications()]
+        self.assertEqual(40, len(expected))
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            csv_path = os.path.join(temp_dir, 'export.csv')
+            with open(csv_path, 'w', encoding='utf-8', newline='') as csv_file:
+                csv_file.write('\ufeff' + data.getvalue())
+
+            batches = list(parse_file_in_parallel(csv_path, workers=2, chunk_size=500))
+
+        self.assertGreater(len(batches), 2, msg='The file was not split')
+        self.assertEqual(expected, [p.__dict__ for b in batches for p in b])
+
+    def test_parallel_files(self):
+        golden_path = os.path.join(self.data_dir, 'golden-1.csv')
+        invalid_path = os.path.join(self.data_dir, 'invalid-header.csv')
+        empty_path = os.path.join(self.data_dir, 'empty.csv')
+        expected = [p.__dict__ for p in ScopusCsvParser.from_file(golden_path).read_all_publications()]
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # A record with a field over the csv module field size limit
+            malformed_path = os.path.join(temp_dir, 'malformed.csv')
+            with open(golden_path, 'r', encoding='utf-8-sig', newline='') as golden_file:
+                header = golden_file.readline()
+            with open(malformed_path, 'w', encoding='utf-8', newline='') as malformed_file:
+                malformed_file.write(header + '"' + 'x' * (csv.field_size_limit() + 1) + '"\r\n')
+
+            parts = list(parse_files_in_parallel([golden_path, invalid_path, malformed_path, empty_path, golden_path],
+                                                 workers=2, chunk_size=500))
+
+        paths = [part.path for part in parts]
+        self.assertEqual([golden_path, invalid_path, malformed_path, empty_path, golden_path],
+                         [path for i, path in enumerate(paths) if i == 0 or paths[i - 1] != path],
+                         msg='The parts are not in the order of the files')
+        for path in (golden_path, invalid_path, malformed_path, empty_path):
+            self.assertEqual([], parts[len(paths) - 1 - paths[::-1].index(path)].publications,
+                             msg='A file does not end with an empty part')
+
+        invalid_parts = [part for part in parts if part.path == invalid_path]
+        self.assertEqual(1, len(invalid_parts))
+        self.assertIsInstance(invalid_parts[0].error, ValueError)
+        malformed_parts = [part for part in parts if part.path == malformed_path]
+        self.assertIsInstance(malformed_parts[-1].error, csv.Error)
+        self.assertEqual(expected + expected, [p.__dict__ for part in parts for p in part.publications])
+        self.assertTrue(all(part.error is None for part in parts if part.path not in (invalid_path, malformed_path)))
+
+    def test_fields(self):
+        input_path = os.path.join(self.data_dir, 'golden-1.csv')
+        with open(input_path, 'r', newline='') as input_file:
+            data = input_file.read()
+        full = ScopusCsvParser(data).read_all_publications()
+
+        pubs = ScopusCsvParser(data, fields=['eid', 'authors', 'doi']).read_all_publications()
+
+        self.assertEqual(len(full), len(pubs))
+        for pub, full_pub in zip(pubs, full):
+            self.assertEqual(full_pub.eid, pub.eid)
+            self.assertEqual(full_pub.authors, pub.authors)
+            self.assertEqual(full_pub.doi, pub.doi)
+            self.assertEqual('', pub.references)
+            self.assertEqual('', pub.title)
+            self.assertEqual([], pub.open_access)
+
+        with self.assertRaises(ValueError):
+            ScopusCsvParser(data, fields=['eid', 'author_names'])
+
+    def test_reduced_header(self):
+        # An export of fewer field groups, the missing columns are left empty
+        columns = ['Author full names', 'Title', 'Year', 'Source title', 'Cited by', 'DOI', 'Link', 'Affiliations',
+                   'Author Keywords', 'Index Keywords', 'Document Type', 'Source', 'EID']
+        input_path = os.path.join(self.data_dir, 'golden-1.csv')
+        with open(input_path, 'r', newline='') as input_file:
+            rows = list(csv.DictReader(input_file))
+        reduced = io.StringIO()
+        writer = csv.DictWriter(reduced, fieldnames=columns, extrasaction='ignore', quoting=csv.QUOTE_ALL)
+        writer.writeheader()
+        writer.writerows(rows)
+        with open(os.path.join(self.data_dir, 'golden-1-expected.json'), 'r') as golden_file:
+            expected = json.load(golden_file)
+
+        pubs = ScopusCsvParser(reduced.getvalue()).read_all_publications()
+
+        self.assertEqual(len(expected), len(pubs))
+        for pub, expected_pub in zip(pubs, expected):
+            self.assertEqual(expected_pub['eid'], pub.eid)
+            self.assertEqual(expected_pub['authors'], pub.authors)
+            self.assertEqual(expected_pub['index_keywords'], pub.index_keywords)
+            self.assertEqual('', pub.abstract)
+            self.assertEqual('', pub.volume)
+            self.assertEqual([], pub.sponsors)
+
+    def test_reordered_header_throw(self):
+        with self.assertRaises(ValueError):
+            ScopusCsvParser('"EID","Title"\n"2-s2.0-1","t"\n').read_all_publications()
+
     def test_invalid_header_throw(self):
         input_path = os.path.join(self.data_dir, 'invalid-header.csv')
         with open(input_path, 'r') as input_file:
@@ -50,5 +228,18 @@ class TestParser(unittest.TestCase):
             self.assertEqual(len(pubs), 0, f'Expected empty array, got array of length={len(pubs)}')
 
 
+class TestExportProfile(unittest.TestCase):
+    def test_identifiers(self):
+        self.assertEqual(all_identifiers(), ExportProfile.FULL.identifiers())
+
+        minimal = ExportProfile.MINIMAL.identifiers()
+        database = ExportProfile.DATABASE.identifiers()
+        self.assertTrue(set(minimal) < set(database) < set(all_identifiers()))
+        self.assertEqual([i for i in all_identifiers() if i in database], database, msg='Not in the export order')
+        for profile in ExportProfile:
+            self.assertIn(FieldGroupIdentifiers.EID, profile.identifiers())
+        self.assertNotIn(FieldGroupIdentifiers.REFERENCES, database)
+
+
 if __name__ == '__main__':
     unittest.main()
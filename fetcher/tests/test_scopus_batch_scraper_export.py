@@ -0,0 +1,144 @@
+import asyncio
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import httpx
+
+from fetcher.scopus_batch.journal import ExportJournal
+from fetcher.scopus_batch.models import ExportFileType, FieldGroupIdentifiers
+from fetcher.scopus_batch.scraper import ScopusScraper, ScopusScraperConfig
+
+EIDS = [f'eid-{i}' for i in range(2450)]
+
+
+class TestScopusScraperExport(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.events = []
+        self.fail_search_offset = None
+        self.fail_export_eid = None
+
+        async def mock_handler(request: httpx.Request) -> httpx.Response:
+            payload = json.loads(request.content)
+            if request.url.path == '/api/documents/search/eids':
+                offset = payload['offset']
+                self.events.append(('search', offset))
+                if offset == self.fail_search_offset:
+                    return httpx.Response(500)
+                docs = EIDS[offset:offset + payload['itemcount']]
+                return httpx.Response(200, json={'response': {'numFound': len(EIDS), 'docs': docs}})
+
+            if payload['eids'][0] == self.fail_export_eid:
+                return httpx.Response(500)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            # Later batches complete first
+            await asyncio.sleep(0.001 * (len(EIDS) - EIDS.index(payload['eids'][0])) / 100)
+            self.in_flight -= 1
+            self.events.append(('exported', payload['eids'][0]))
+
+            header = '' if payload['hideHeaders'] else '"EID"\n'
+            return httpx.Response(200, text=header + '\n'.join(payload['eids']))
+        self.mock_t = httpx.MockTransport(mock_handler)
+        self.config = ScopusScraperConfig(user_agent='saturday/1.0', scopus_jwt='jwt', scopus_jwt_domain='.scopus.com',
+                                          awselb='a', scopus_session_uuid='b', sc_session_id='c')
+
+    async def test_export_order(self):
+        for max_concurrency in (1, 4):
+            with self.subTest(max_concurrency=max_concurrency):
+                self.max_in_flight = 0
+                async with ScopusScraper(self.config, transport=self.mock_t,
+                                         max_concurrency=max_concurrency) as scraper:
+                    data = await scraper.export_all('python', ExportFileType.CSV, [FieldGroupIdentifiers.EID])
+
+                self.assertEqual(['"EID"'] + EIDS, data.split())
+                self.assertEqual(max_concurrency, self.max_in_flight)
+
+    async def test_export_sink(self):
+        sink = io.StringIO()
+        async with ScopusScraper(self.config, transport=self.mock_t) as scraper:
+            self.assertIsNone(await scraper.export_all('python', ExportFileType.CSV, [FieldGroupIdentifiers.EID],
+                                                       sink=sink))
+            parts = [part async for part in scraper.iter_export('python', ExportFileType.CSV,
+                                                                [FieldGroupIdentifiers.EID])]
+
+        self.assertEqual(['"EID"'] + EIDS, sink.getvalue().split())
+        self.assertEqual(sink.getvalue(), ''.join(parts))
+        self.assertGreater(len(parts), 1)
+
+    async def test_eid_prefetch(self):
+        async with ScopusScraper(self.config, transport=self.mock_t) as scraper:
+            await scraper.export_all('python', ExportFileType.CSV, [FieldGroupIdentifiers.EID])
+
+        self.assertEqual([('search', 0), ('search', 2000)], [e for e in self.events if e[0] == 'search'])
+        self.assertLess(self.events.index(('search', 2000)), self.events.index(('exported', 'eid-1900')),
+                        msg='The next EIDs were searched after exporting the current ones')
+
+    async def test_search_error(self):
+        self.fail_search_offset = 2000
+        async with ScopusScraper(self.config, transport=self.mock_t) as scraper:
+            with self.assertRaises(httpx.HTTPStatusError):
+                await scraper.export_all('python', ExportFileType.CSV, [FieldGroupIdentifiers.EID])
+
+    async def test_skip_eids(self):
+        known_eids = set(EIDS[100:2100])
+        for shard_size in (None, 10000):
+            with self.subTest(shard_size=shard_size):
+                self.events = []
+                async with ScopusScraper(self.config, transport=self.mock_t) as scraper:
+                    data = await scraper.export_all('python', ExportFileType.CSV, [FieldGroupIdentifiers.EID],
+                                                    shard_size=shard_size, skip_eids=known_eids.intersection)
+
+                self.assertEqual(['"EID"'] + [e for e in EIDS if e not in known_eids], data.split())
+                self.assertEqual(5, len([e for e in self.events if e[0] == 'exported']))
+
+    async def test_resume(self):
+        with tempfile.TemporaryDirectory() as journal_dir:
+            def open_journal() -> ExportJournal:
+                return ExportJournal.for_export(journal_dir, 'python', ExportFileType.CSV,
+                                                [FieldGroupIdentifiers.EID], batch_prefix='abcdef')
+
+            # The export is interrupted in the second EID window
+            self.fail_export_eid = 'eid-2100'
+            async with ScopusScraper(self.config, transport=self.mock_t) as scraper:
+                with self.assertRaises(httpx.HTTPStatusError):
+                    await scraper.export_all('python', ExportFileType.CSV, [FieldGroupIdentifiers.EID],
+                                             journal=open_journal())
+            saved_parts = len([n for n in os.listdir(open_journal().path) if n.startswith('part-')])
+            self.assertGreaterEqual(saved_parts, 20)
+
+            self.fail_export_eid = None
+            self.events = []
+            journal = open_journal()
+            async with ScopusScraper(self.config, transport=self.mock_t) as scraper:
+                data = await scraper.export_all('python', ExportFileType.CSV, [FieldGroupIdentifiers.EID],
+                                                journal=journal)
+            self.assertEqual(['"EID"'] + EIDS, data.split())
+            self.assertEqual([], [e for e in self.events if e[0] == 'search'], msg='The EIDs were searched again')
+            self.assertEqual(25 - saved_parts, len([e for e in self.events if e[0] == 'exported']))
+
+            journal.remove()
+            self.assertFalse(os.path.exists(journal.path))
+
+    def test_journal_key(self):
+        with tempfile.TemporaryDirectory() as journal_dir:
+            def journal_path(**kwargs) -> str:
+                return ExportJournal.for_export(journal_dir, 'python', ExportFileType.CSV,
+                                                [FieldGroupIdentifiers.EID], **kwargs).path
+
+            self.assertEqual(journal_path(), journal_path())
+            # The EID windows of an export without the known EIDs cannot be resumed with them, or vice versa
+            self.assertNotEqual(journal_path(), journal_path(skip_known=True))
+            self.assertNotEqual(journal_path(), journal_path(shard_size=100))
+
+    async def test_invalid_concurrency(self):
+        with self.assertRaises(ValueError):
+            ScopusScraper(self.config, transport=self.mock_t, max_concurrency=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
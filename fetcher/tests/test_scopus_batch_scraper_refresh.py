@@ -1,16 +1,24 @@
+import asyncio
+import base64
 import http.cookies
+import json
 import unittest
 
 import httpx
 
 from fetcher.scopus_batch import consts
-from fetcher.scopus_batch.scraper import ScopusScraper, ScopusScraperConfig
+from fetcher.scopus_batch.models import ExportFileType, FieldGroupIdentifiers
+from fetcher.scopus_batch.scraper import ScopusScraper, ScopusScraperConfig, decode_jwt_expiry
 
 
 class TestScopusBatchScraperRefresh(unittest.IsolatedAsyncioTestCase):
     async def asyncSetUp(self):
+        self.refresh_count = 0
+
         async def mock_handler(request: httpx.Request) -> httpx.Response:
             if request.url.path == '/api/auth/refresh-scopus-jwt':
+                self.refresh_count += 1
+                await asyncio.sleep(0)
                 new_cookie = http.cookies.SimpleCookie()
                 new_cookie[consts.COOKIE_JWT] = 'fresh_jwt'
                 new_cookie[consts.COOKIE_JWT]['Path'] = '/'
@@ -20,7 +28,11 @@ class TestScopusBatchScraperRefresh(unittest.IsolatedAsyncioTestCase):
                 })
             cookie = request.headers.get('Cookie')
             if 'expired_jwt' in cookie:
+                # Let the concurrent requests be sent before rejecting them
+                await asyncio.sleep(0)
                 return httpx.Response(403)
+            elif 'fresh_jwt' in cookie and request.url.path == '/gateway/export-service/export':
+                return httpx.Response(200, text='data')
             elif 'fresh_jwt' in cookie and request.url.path == '/api/documents/search/eids':
                 payload = {
                     'response': {
@@ -50,3 +62,139 @@ class TestScopusBatchScraperRefresh(unittest.IsolatedAsyncioTestCase):
 
         new_cookies = self.scraper.get_cookies()
         self.assertEqual('fresh_jwt', new_cookies.scopus_jwt, msg='The JWT token was not refreshed')
+
+    async def test_single_refresh(self):
+        # Concurrent requests rejected with the same token share one refresh
+        parts = await asyncio.gather(*(self.scraper.export_part(f'batch_{i}', 4, [f'eid-{i}'], ExportFileType.CSV,
+                                                                [FieldGroupIdentifiers.EID])
+                                       for i in range(4)))
+        self.assertEqual(['data'] * 4, parts)
+        self.assertEqual(1, self.refresh_count, msg='The JWT token was refreshed more than once')
+
+
+def _build_jwt(expires_at: float) -> str:
+    def encode(data: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip('=')
+    return f'{encode({"alg": "none"})}.{encode({"exp": expires_at})}.signature'
+
+
+class _FakeClock:
+    """Time of the scraper, which only advances when the test wakes up the sleeping scraper."""
+
+    def __init__(self, now: float):
+        self.now = now
+        self.sleeping = asyncio.Queue()
+
+    def time(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float):
+        wake = asyncio.get_running_loop().create_future()
+        await self.sleeping.put((delay, wake))
+        await wake
+        self.now += delay
+
+
+class TestScopusBatchScraperJwtExpiry(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.refreshed_configs = []
+        self.rejected_count = 0
+        self.refresh_error = False
+        self.refreshed_jwt = None
+        self.clock = _FakeClock(1700000000)
+
+        async def mock_handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path == '/api/auth/refresh-scopus-jwt':
+                if self.refresh_error:
+                    raise httpx.ConnectError('connection refused', request=request)
+                new_cookie = http.cookies.SimpleCookie()
+                new_cookie[consts.COOKIE_JWT] = self.refreshed_jwt or _build_jwt(self.clock.time() + 3600)
+                new_cookie[consts.COOKIE_JWT]['Path'] = '/'
+                new_cookie[consts.COOKIE_JWT]['Domain'] = '.scopus.com'
+                return httpx.Response(200, headers={'Set-Cookie': new_cookie.output(header='').strip()})
+
+            jwt = http.cookies.SimpleCookie(request.headers.get('Cookie'))[consts.COOKIE_JWT].value
+            if decode_jwt_expiry(jwt) <= self.clock.time():
+                self.rejected_count += 1
+                return httpx.Response(403)
+            return httpx.Response(200, json={'response': {'numFound': 0, 'docs': []}})
+        self.mock_t = httpx.MockTransport(mock_handler)
+
+    def _scraper(self, expires_at: float) -> ScopusScraper:
+        config = ScopusScraperConfig(user_agent='saturday/1.0', scopus_jwt=_build_jwt(expires_at),
+                                     scopus_jwt_domain='.scopus.com', awselb='a', scopus_session_uuid='b',
+                                     sc_session_id='c')
+        return ScopusScraper(config, transport=self.mock_t, jwt_refresh_margin=60,
+                             on_cookies_refreshed=self.refreshed_configs.append,
+                             clock=self.clock.time, sleep=self.clock.sleep)
+
+    def test_decode_jwt_expiry(self):
+        self.assertEqual(1700000000, decode_jwt_expiry(_build_jwt(1700000000)))
+        self.assertEqual(1700000000, ScopusScraperConfig('ua', _build_jwt(1700000000), '.scopus.com', 'a', 'b',
+                                                         'c').jwt_expires_at)
+        for token in ('not-a-jwt', 'a.!!!.c', f'a.{base64.urlsafe_b64encode(b"{}").decode()}.c'):
+            with self.subTest(token=token):
+                self.assertIsNone(decode_jwt_expiry(token))
+
+    async def test_background_refresh(self):
+        async with self._scraper(self.clock.time() + 100) as scraper:
+            delay, wake = await self.clock.sleeping.get()
+            self.assertEqual(40, delay, msg='The refresh was not scheduled before the expiry margin')
+            self.assertEqual([], self.refreshed_configs)
+            wake.set_result(None)
+
+            # Waits for the refreshed token now
+            delay, _ = await self.clock.sleeping.get()
+            self.assertEqual(1, len(self.refreshed_configs), msg='The JWT token was not refreshed before its expiry')
+            self.assertEqual(3600 - 60, delay)
+
+            # The initial token has expired by now
+            self.clock.now += 100
+            _ = await scraper.search_eids(item_count=1, offset=0, query='whatever')
+
+        self.assertEqual(0, self.rejected_count)
+        self.assertEqual(self.refreshed_configs[0].scopus_jwt, scraper.get_cookies().scopus_jwt)
+
+    async def test_background_refresh_error(self):
+        self.refresh_error = True
+        async with self._scraper(self.clock.time() + 100) as scraper:
+            _, wake = await self.clock.sleeping.get()
+            with self.assertLogs('fetcher.scopus_batch.scraper', level='WARNING'):
+                wake.set_result(None)
+                delay, wake = await self.clock.sleeping.get()
+            self.assertEqual(ScopusScraper.JWT_REFRESH_RETRY_DELAY, delay, msg='The refresh is not tried again')
+
+            # Meanwhile, the expiring token is refreshed before the next request
+            self.refresh_error = False
+            _ = await scraper.search_eids(item_count=1, offset=0, query='whatever')
+            self.assertEqual(1, len(self.refreshed_configs))
+
+            # The background task keeps refreshing the new token
+            wake.set_result(None)
+            delay, _ = await self.clock.sleeping.get()
+            self.assertEqual(3600 - 60 - ScopusScraper.JWT_REFRESH_RETRY_DELAY, delay)
+
+        self.assertEqual(0, self.rejected_count)
+
+    async def test_background_refresh_malformed_token(self):
+        # The expiry of the refreshed token cannot be read (it overflows a float)
+        self.refreshed_jwt = _build_jwt(10 ** 400)
+        async with self._scraper(self.clock.time() + 100) as scraper:
+            _, wake = await self.clock.sleeping.get()
+            with self.assertLogs('fetcher.scopus_batch.scraper', level='WARNING'):
+                wake.set_result(None)
+                delay, wake = await self.clock.sleeping.get()
+            self.assertEqual(ScopusScraper.JWT_REFRESH_RETRY_DELAY, delay)
+            self.assertFalse(scraper._jwt_refresher.done(), msg='The background refresh stopped')
+
+            self.refreshed_jwt = None
+            wake.set_result(None)
+            delay, _ = await self.clock.sleeping.get()
+            self.assertEqual(3600 - 60, delay, msg='The token was not refreshed again')
+        self.assertEqual(2, len(self.refreshed_configs))
+
+    async def test_refresh_before_request(self):
+        scraper = self._scraper(self.clock.time() - 10)
+        _ = await scraper.search_eids(item_count=1, offset=0, query='whatever')
+        self.assertEqual(0, self.rejected_count)
+        self.assertEqual(1, len(self.refreshed_configs))
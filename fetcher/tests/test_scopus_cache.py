@@ -0,0 +1,115 @@
+import os
+import tempfile
+import time
+import unittest
+import zlib
+from unittest import mock
+
+import httpx
+
+from fetcher.scopus.api import ScopusApi
+from fetcher.scopus.cache import ResponseCache
+from fetcher.scopus.models import PaginationMode
+from fetcher.scopus.rate_limiter import RateLimiter
+from fetcher.tests.test_scopus_api import _build_page
+
+
+def _unlimited() -> RateLimiter:
+    return RateLimiter(requests_per_second=100000)
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'cache.db')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_hit_miss(self):
+        with ResponseCache(self.path) as cache:
+            key = ResponseCache.build_key('https://api', {'query': 'python', 'start': '0'})
+            self.assertIsNone(cache.get(key))
+            cache.put(key, '{"a": 1}')
+            self.assertEqual('{"a": 1}', cache.get(key))
+            self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+    def test_persistent(self):
+        with ResponseCache(self.path) as cache:
+            cache.put('key', 'value')
+        with ResponseCache(self.path) as cache:
+            self.assertEqual('value', cache.get('key'))
+
+    def test_key_ignores_param_order(self):
+        self.assertEqual(ResponseCache.build_key('e', {'a': '1', 'b': '2'}),
+                         ResponseCache.build_key('e', {'b': '2', 'a': '1'}))
+
+    def test_expired(self):
+        with ResponseCache(self.path, ttl=60) as cache:
+            cache.put('key', 'value')
+            with mock.patch('fetcher.scopus.cache.time.time', return_value=time.time() + 61):
+                self.assertIsNone(cache.get('key'))
+            self.assertIsNone(cache.get('key'), msg='The expired entry was not removed')
+
+    def test_evict_least_recently_used(self):
+        values = {k: os.urandom(500).hex() for k in ('a', 'b', 'c')}
+        # Room for 2 entries only
+        max_size = sum(sorted(len(zlib.compress(v.encode())) for v in values.values())[1:])
+        with ResponseCache(self.path, max_size=max_size) as cache:
+            cache.put('a', values['a'])
+            time.sleep(0.01)
+            cache.put('b', values['b'])
+            time.sleep(0.01)
+            cache.get('a')
+            time.sleep(0.01)
+            cache.put('c', values['c'])
+
+            self.assertIsNone(cache.get('b'), msg='The least recently used entry was not evicted')
+            self.assertEqual(values['a'], cache.get('a'))
+            self.assertEqual(values['c'], cache.get('c'))
+
+
+class TestScopusApiCache(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = ResponseCache(os.path.join(self.temp_dir.name, 'cache.db'))
+        self.request_count = 0
+
+        async def mock_handler(request: httpx.Request) -> httpx.Response:
+            self.request_count += 1
+            params = request.url.params
+            if 'cursor' in params:
+                return httpx.Response(200, json=_build_page(30, 0 if params['cursor'] == '*' else 25, 25,
+                                                            next_cursor='next'))
+            return httpx.Response(200, json=_build_page(60, int(params['start']), int(params['count'])))
+        self.mock_t = httpx.MockTransport(mock_handler)
+
+    async def asyncTearDown(self):
+        self.cache.close()
+        self.temp_dir.cleanup()
+
+    def _client(self, **kwargs) -> ScopusApi:
+        return ScopusApi(api_key='key', rate_limiter_factory=_unlimited, cache=self.cache,
+                         transport=self.mock_t, **kwargs)
+
+    async def test_repeated_search(self):
+        async with self._client() as client:
+            first = await client.search('python')
+        async with self._client() as client:
+            second = await client.search('python')
+
+        self.assertEqual([e.eid for e in first], [e.eid for e in second])
+        self.assertEqual(3, self.request_count, msg='The repeated search was not served from the cache')
+        self.assertEqual((3, 3), (self.cache.hits, self.cache.misses))
+
+    async def test_cursor_not_cached(self):
+        async with self._client(pagination=PaginationMode.CURSOR) as client:
+            await client.search('python')
+            await client.search('python')
+
+        self.assertEqual(4, self.request_count)
+        self.assertEqual((0, 0), (self.cache.hits, self.cache.misses))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import json
+import os
+import unittest
+
+import httpx
+
+from fetcher.scopus.api import ScopusApi
+from fetcher.scopus.decoding import fast_loads, stdlib_loads
+from fetcher.scopus.rate_limiter import RateLimiter
+
+
+class TestDecoding(unittest.TestCase):
+    def test_loads(self):
+        base_path = os.path.dirname(__file__)
+        with open(os.path.join(base_path, 'data', 'scopus-api', 'complete-view-page.json'), 'rb') as page_file:
+            raw = page_file.read()
+        expected = json.loads(raw)
+
+        self.assertEqual(expected, fast_loads(raw))
+        self.assertEqual(expected, stdlib_loads(raw))
+
+
+class TestScopusApiDecoding(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        base_path = os.path.dirname(__file__)
+        with open(os.path.join(base_path, 'data', 'scopus-api', 'complete-view-page.json'), 'rb') as page_file:
+            raw = page_file.read()
+        self.expected = json.loads(raw)['search-results']['entry']
+
+        async def mock_handler(_: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, stream=httpx.ByteStream(raw))
+        self.mock_t = httpx.MockTransport(mock_handler)
+
+    async def test_decoders(self):
+        loads_calls = []
+
+        def counting_loads(data):
+            loads_calls.append(len(data))
+            return stdlib_loads(data)
+
+        for kwargs in ({}, {'json_loads': counting_loads}):
+            with self.subTest(**{k: str(v) for k, v in kwargs.items()}):
+                async with ScopusApi(api_key='key', rate_limiter_factory=lambda: RateLimiter(requests_per_second=1000),
+                                     transport=self.mock_t, **kwargs) as client:
+                    page = await client.search_one_page('python')
+                self.assertEqual([e['eid'] for e in self.expected], [e.eid for e in page.entry])
+                self.assertEqual(1377, page.totalResults)
+        self.assertEqual(1, len(loads_calls), msg='The custom decoder was not used')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+from fetcher.scopus.models import SearchEntry, SearchResults
+
+ENTRY = {
+    'eid': '2-s2.0-85000000001',
+    'dc:identifier': 'SCOPUS_ID:85000000001',
+    'dc:title': 'Publication',
+    'prism:coverDate': '2024-01-01',
+    'authkeywords': 'python | c++',
+    'freetoread': {'value': [{'$': 'all'}]},
+    'link': [{'@ref': 'self', '@href': 'https://api.elsevier.com/content/abstract/scopus_id/85000000001'}],
+    'author': [
+        {'@seq': '1', 'authid': '1', 'authname': 'Doe J.', 'given-name': 'John', 'afid': [{'$': '2'}]},
+        {'@seq': '2', 'authid': '3', 'authname': 'Roe R.'}
+    ],
+    'affiliation': [{'afid': '2', 'affilname': 'University', 'affiliation-city': 'Warsaw'}]
+}
+
+
+class TestSearchEntry(unittest.TestCase):
+    def test_fields(self):
+        entry = SearchEntry(ENTRY)
+
+        self.assertEqual('Publication', entry.title)
+        self.assertEqual(['python', 'c++'], entry.authkeywords)
+        self.assertEqual([{'$': 'all'}], entry.freetoread)
+        self.assertEqual([], entry.freetoread_label)
+        self.assertIsNone(entry.doi)
+        self.assertEqual(['1', '3'], [a.authid for a in entry.authors])
+        self.assertEqual('John', entry.authors[0].given_name)
+        self.assertEqual([], entry.authors[1].afid)
+        self.assertEqual('Warsaw', entry.affiliations[0].affiliation_city)
+        self.assertEqual('self', entry.links[0].ref)
+
+    def test_to_dict(self):
+        d = SearchEntry(ENTRY).to_dict()
+
+        self.assertEqual('2-s2.0-85000000001', d['eid'])
+        self.assertEqual(['python', 'c++'], d['authkeywords'])
+        self.assertEqual({'seq': '1', 'author_url': None, 'authid': '1', 'authname': 'Doe J.', 'surname': None,
+                          'given_name': 'John', 'initials': None, 'afid': [{'$': '2'}]}, d['authors'][0])
+        self.assertEqual([], SearchEntry({}).to_dict()['authors'])
+
+    def test_decoded_once(self):
+        entry = SearchEntry(ENTRY)
+        self.assertIs(entry.authors, entry.authors)
+        self.assertIs(entry.authkeywords, entry.authkeywords)
+
+    def test_slots(self):
+        entry = SearchResults({'search-results': {
+            'opensearch:totalResults': '1',
+            'opensearch:startIndex': '0',
+            'opensearch:itemsPerPage': '1',
+            'entry': [ENTRY]
+        }}).entry[0]
+
+        for obj in (entry, entry.authors[0], entry.affiliations[0], entry.links[0]):
+            self.assertFalse(hasattr(obj, '__dict__'), msg=f'{type(obj).__name__} has a __dict__')
+
+
+if __name__ == '__main__':
+    unittest.main()
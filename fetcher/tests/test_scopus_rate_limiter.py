@@ -0,0 +1,156 @@
+import time
+import unittest
+
+import httpx
+
+from fetcher.exceptions import QuotaExceededError, InvalidAPIKeyError
+from fetcher.scopus.api import ScopusApi
+from fetcher.scopus.key_pool import ApiKeyPool
+from fetcher.scopus.rate_limiter import RateLimiter
+
+EMPTY_PAGE = {
+    'search-results': {
+        'opensearch:totalResults': '0',
+        'opensearch:startIndex': '0',
+        'opensearch:itemsPerPage': '0',
+        'entry': [{'@_fa': 'true', 'error': 'Result set was empty'}]
+    }
+}
+
+
+class TestRateLimiter(unittest.IsolatedAsyncioTestCase):
+    async def test_token_bucket_pacing(self):
+        pool = ApiKeyPool(['key'], rate_limiter_factory=lambda: RateLimiter(requests_per_second=50, burst=1))
+
+        started = time.monotonic()
+        for _ in range(6):
+            await pool.acquire()
+        elapsed = time.monotonic() - started
+
+        # The first token is available right away, the other 5 take 1/50 s each
+        self.assertGreaterEqual(elapsed, 0.09)
+
+    async def test_quota_headers(self):
+        limiter = RateLimiter()
+        pool = ApiKeyPool(['key'], rate_limiter_factory=lambda: limiter)
+        reset = time.time() + 3600
+        limiter.update(httpx.Response(200, headers={
+            'X-RateLimit-Limit': '20000',
+            'X-RateLimit-Remaining': '2',
+            'X-RateLimit-Reset': str(int(reset))
+        }))
+
+        budget = limiter.budget
+        self.assertEqual(20000, budget.quota_limit)
+        self.assertEqual(2, budget.quota_remaining)
+        self.assertAlmostEqual(reset, budget.quota_reset, delta=1)
+
+        await pool.acquire()
+        await pool.acquire()
+        self.assertEqual(0, limiter.budget.quota_remaining)
+        with self.assertRaises(QuotaExceededError):
+            await pool.acquire()
+
+    def test_backoff_delay(self):
+        limiter = RateLimiter(backoff_base=1, backoff_max=10)
+        for attempt in range(8):
+            delay = limiter.backoff_delay(attempt)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(10, 2 ** attempt))
+
+        retry_after = httpx.Response(429, headers={'Retry-After': '5'})
+        self.assertGreaterEqual(limiter.backoff_delay(0, retry_after), 5)
+
+
+class TestScopusApiRetries(unittest.IsolatedAsyncioTestCase):
+    async def test_retry_throttled(self):
+        responses = [
+            httpx.Response(429),
+            httpx.Response(503),
+            httpx.Response(200, json=EMPTY_PAGE)
+        ]
+
+        async def mock_handler(_: httpx.Request) -> httpx.Response:
+            return responses.pop(0)
+
+        limiter = RateLimiter(requests_per_second=1000, backoff_base=0.001)
+        async with ScopusApi(api_key='key', rate_limiter_factory=lambda: limiter,
+                             transport=httpx.MockTransport(mock_handler)) as client:
+            page = await client.search_one_page('python')
+
+        self.assertEqual(0, page.totalResults)
+        self.assertEqual(0, len(responses), msg='The throttled requests were not retried')
+
+    async def test_retries_exhausted(self):
+        async def mock_handler(_: httpx.Request) -> httpx.Response:
+            return httpx.Response(503)
+
+        limiter = RateLimiter(requests_per_second=1000, backoff_base=0.001, max_retries=2)
+        async with ScopusApi(api_key='key', rate_limiter_factory=lambda: limiter,
+                             transport=httpx.MockTransport(mock_handler)) as client:
+            with self.assertRaises(httpx.HTTPStatusError):
+                await client.search_one_page('python')
+
+    async def test_quota_exceeded(self):
+        async def mock_handler(_: httpx.Request) -> httpx.Response:
+            return httpx.Response(429, headers={
+                'X-ELS-Status': 'QUOTA_EXCEEDED - Quota Exceeded',
+                'X-RateLimit-Reset': str(int(time.time() + 24 * 3600))
+            })
+
+        limiter = RateLimiter(requests_per_second=1000, backoff_base=0.001)
+        async with ScopusApi(api_key='key', rate_limiter_factory=lambda: limiter,
+                             transport=httpx.MockTransport(mock_handler)) as client:
+            with self.assertRaises(QuotaExceededError):
+                await client.search_one_page('python')
+            self.assertEqual({}, client.rate_limit_budgets, msg='The out of quota key was not retired')
+
+
+class TestApiKeyPool(unittest.IsolatedAsyncioTestCase):
+    async def test_spread_across_keys(self):
+        pool = ApiKeyPool(['key-a', 'key-b', 'key-c'],
+                          rate_limiter_factory=lambda: RateLimiter(requests_per_second=1, burst=2))
+
+        # Every key has 2 tokens, 6 requests can be sent right away
+        used_keys = [await pool.acquire() for _ in range(6)]
+        self.assertCountEqual(['key-a', 'key-a', 'key-b', 'key-b', 'key-c', 'key-c'], used_keys)
+
+    async def test_prefer_remaining_quota(self):
+        pool = ApiKeyPool(['key-a', 'key-b'])
+        pool.limiter('key-a').update(httpx.Response(200, headers={'X-RateLimit-Remaining': '10'}))
+        pool.limiter('key-b').update(httpx.Response(200, headers={'X-RateLimit-Remaining': '5000'}))
+
+        self.assertEqual('key-b', await pool.acquire())
+
+    async def test_retire_keys(self):
+        async def mock_handler(request: httpx.Request) -> httpx.Response:
+            if request.headers['X-ELS-APIKey'] == 'invalid-key':
+                return httpx.Response(401)
+            if request.headers['X-ELS-APIKey'] == 'used-up-key':
+                return httpx.Response(429, headers={'X-ELS-Status': 'QUOTA_EXCEEDED - Quota Exceeded'})
+            return httpx.Response(200, json=EMPTY_PAGE)
+
+        async with ScopusApi(api_key=['invalid-key', 'used-up-key', 'valid-key'],
+                             rate_limiter_factory=lambda: RateLimiter(requests_per_second=1000),
+                             transport=httpx.MockTransport(mock_handler)) as client:
+            for _ in range(5):
+                await client.search_one_page('python')
+            self.assertEqual(['vali...-key'], list(client.rate_limit_budgets.keys()))
+
+    async def test_all_keys_retired(self):
+        async def mock_handler(_: httpx.Request) -> httpx.Response:
+            return httpx.Response(401)
+
+        async with ScopusApi(api_key=['key-a', 'key-b'],
+                             rate_limiter_factory=lambda: RateLimiter(requests_per_second=1000),
+                             transport=httpx.MockTransport(mock_handler)) as client:
+            with self.assertRaises(InvalidAPIKeyError):
+                await client.search_one_page('python')
+
+    def test_no_keys(self):
+        with self.assertRaises(ValueError):
+            ApiKeyPool([])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import asyncio
+import json
+import re
+import unittest
+
+import httpx
+
+from fetcher.scopus.api import ScopusApi
+from fetcher.scopus.rate_limiter import RateLimiter
+from fetcher.scopus_batch.models import ExportFileType, FieldGroupIdentifiers
+from fetcher.scopus_batch.scraper import ScopusScraper, ScopusScraperConfig
+from fetcher.sharding import YearShard, plan_year_shards
+from fetcher.tests.test_scopus_api import _build_entry
+
+# 300 records: 2000-2019, 10 per year, plus 100 in 2020
+RECORD_YEARS = [2000 + i // 10 for i in range(200)] + [2020] * 100
+
+
+def _filter_records(query: str) -> list[int]:
+    """Indices of the records matching the PUBYEAR conditions of a query."""
+    records = range(len(RECORD_YEARS))
+    for operator, year in re.findall(r'PUBYEAR ([<>=]) (\d+)', query):
+        year = int(year)
+        if operator == '>':
+            records = [r for r in records if RECORD_YEARS[r] > year]
+        elif operator == '<':
+            records = [r for r in records if RECORD_YEARS[r] < year]
+        else:
+            records = [r for r in records if RECORD_YEARS[r] == year]
+    return list(records)
+
+
+class TestPlanYearShards(unittest.IsolatedAsyncioTestCase):
+    async def count_results(self, query: str) -> int:
+        self.counted_queries.append(query)
+        return len(_filter_records(query))
+
+    async def asyncSetUp(self):
+        self.counted_queries = []
+
+    async def test_small_query(self):
+        shards = await plan_year_shards('q', self.count_results, 1000)
+        self.assertEqual([YearShard(None, None, 300)], shards)
+        self.assertEqual('q', shards[0].restrict('q'))
+
+    async def test_split(self):
+        shards = await plan_year_shards('q', self.count_results, 100, max_year=2030)
+
+        self.assertTrue(all(s.count <= 100 for s in shards), msg=str(shards))
+        self.assertEqual(300, sum(s.count for s in shards), msg='The shards overlap or miss records')
+
+        covered = [r for s in shards for r in _filter_records(s.restrict('q'))]
+        self.assertCountEqual(range(300), covered)
+
+    async def test_unsplittable_year(self):
+        shards = await plan_year_shards('q', self.count_results, 50, max_year=2030)
+        self.assertIn(YearShard(2020, 2020, 100), shards)
+        self.assertEqual('q AND PUBYEAR = 2020', YearShard(2020, 2020).restrict('q'))
+
+    async def test_invalid_size(self):
+        with self.assertRaises(ValueError):
+            await plan_year_shards('q', self.count_results, 0)
+
+
+class TestScopusApiSharding(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.fail_next_page = False
+
+        async def mock_handler(request: httpx.Request) -> httpx.Response:
+            query = request.url.params['query']
+            records = _filter_records(query)
+            start = int(request.url.params['start'])
+            count = int(request.url.params['count'])
+            if self.fail_next_page and start > 0:
+                self.fail_next_page = False
+                return httpx.Response(400)
+            await asyncio.sleep(0)
+
+            entries = [_build_entry(r) for r in records[start:start + count]]
+            return httpx.Response(200, json={'search-results': {
+                'opensearch:totalResults': str(len(records)),
+                'opensearch:startIndex': str(start),
+                'opensearch:itemsPerPage': str(len(entries)),
+                'entry': entries
+            }})
+        self.mock_t = httpx.MockTransport(mock_handler)
+
+    def _client(self) -> ScopusApi:
+        return ScopusApi(api_key='key', max_concurrency=3, transport=self.mock_t,
+                         rate_limiter_factory=lambda: RateLimiter(requests_per_second=100000))
+
+    async def test_sharded_search(self):
+        async with self._client() as client:
+            entries = await client.search('python', shard_size=120)
+        self.assertCountEqual([_build_entry(r)['eid'] for r in range(300)], [e.eid for e in entries])
+
+    async def test_shard_retried(self):
+        # A shard fails after yielding its first page, the repeated entries are dropped
+        self.fail_next_page = True
+        async with self._client() as client:
+            entries = await client.search('python', shard_size=120)
+        self.assertFalse(self.fail_next_page, msg='The shard did not fail')
+        self.assertCountEqual([_build_entry(r)['eid'] for r in range(300)], [e.eid for e in entries])
+
+
+class TestScopusScraperSharding(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.exported_eids = []
+
+        async def mock_handler(request: httpx.Request) -> httpx.Response:
+            payload = json.loads(request.content)
+            if request.url.path == '/api/documents/search/eids':
+                records = _filter_records(payload['query'])
+                offset = payload['offset']
+                docs = [f'eid-{r}' for r in records[offset:offset + payload['itemcount']]]
+                return httpx.Response(200, json={'response': {'numFound': len(records), 'docs': docs}})
+            self.exported_eids.extend(payload['eids'])
+            return httpx.Response(200, text='"EID"\n' if not payload['hideHeaders'] else '')
+
+        config = ScopusScraperConfig(user_agent='saturday/1.0', scopus_jwt='jwt', scopus_jwt_domain='.scopus.com',
+                                     awselb='a', scopus_session_uuid='b', sc_session_id='c')
+        self.scraper = ScopusScraper(config, transport=httpx.MockTransport(mock_handler))
+
+    async def test_sharded_export(self):
+        async with self.scraper:
+            data = await self.scraper.export_all('python', ExportFileType.CSV, [FieldGroupIdentifiers.EID],
+                                                 shard_size=120)
+
+        self.assertCountEqual([f'eid-{r}' for r in range(300)], self.exported_eids)
+        self.assertEqual(1, data.count('"EID"'), msg='The header was exported more than once')
+
+
+if __name__ == '__main__':
+    unittest.main()
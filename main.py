@@ -1,6 +1,8 @@
 import argparse
 import asyncio
 import logging
+import multiprocessing
+from datetime import datetime, timezone
 
 from dotenv import load_dotenv
 
@@ -8,8 +10,19 @@ from cli import gscholar, scopus_batch, elsevier_api
 from cli.options import ProxiesFetcherOptions, FetcherModuleResult
 from database.dbContext import *
 from database.dbInsertsAIOptimised.gscholarAPIInsert import scholarInsertOptimised
-from database.dbInsertsAIOptimised.scopusApiInsertOptimised import scopusAPIInsertOptimised
-from database.dbInsertsAIOptimised.scopusBatchInsertOptimised import scopusBatchInsertOptimised
+from database.dbInsertsAIOptimised.scopusApiInsertOptimised import scopusAPIInsertOptimised, scopusAPIBeginInsert, \
+    scopusAPIConsumedFields
+from database.dbInsertsAIOptimised.scopusBatchInsertOptimised import scopusBatchInsertOptimised, \
+    scopusBatchBeginInsert, scopusBatchConsumedFields
+from database.articleEids import getKnownEids
+from database.insertFingerprint import getInsertByFingerprint, saveInsertFingerprint
+from database.harvestWatermark import getIncrementalStartDate, saveHarvestWatermark
+from fetcher.scopus.cache import ResponseCache
+from fetcher.scopus.decoding import FAST_BACKEND
+from fetcher.scopus.models import SearchEntry, PaginationMode
+from fetcher.scopus_batch.models import ExportProfile
+from fetcher.scopus_batch.parser_models import Publication
+from fetcher.scopus_batch.scraper import ScopusScraper
 
 
 async def main():
@@ -34,11 +47,63 @@ async def main():
     parser.add_argument('-s', '--scopus-api', action='store_true', help='Use Scopus API for scraping metadata')
     parser.add_argument('--scopus-api-output',
                         help='Path to a file where raw data fetched from Elsevier API will be saved. File type: JSON.')
+    parser.add_argument('--scopus-api-concurrency',
+                        type=int,
+                        default=1,
+                        help='Maximum number of Elsevier API pages fetched at the same time (default: 1)')
+    parser.add_argument('--scopus-api-cursor',
+                        action='store_true',
+                        help='Use cursor pagination with the Elsevier API. Slower (one page at a time), but not '
+                             'limited to the first 5000 results')
+    parser.add_argument('--scopus-api-cache',
+                        help='Path to a file where Elsevier API result pages are cached between runs. '
+                             'File type: SQLite.')
+    parser.add_argument('--scopus-api-cache-ttl',
+                        type=float,
+                        default=ResponseCache.DEFAULT_TTL,
+                        help='Time (in seconds) after which cached Elsevier API pages expire (default: 86400)')
+    parser.add_argument('--scopus-api-stored-fields',
+                        action='store_true',
+                        help='Request only the fields stored in the database from the Elsevier API (smaller '
+                             'responses, the --scopus-api-output file will be missing the other fields)')
+    parser.add_argument('--shard-by-year',
+                        action='store_true',
+                        help='Split large searches (Elsevier API, Scopus batch export) into publication year ranges, '
+                             'harvested concurrently')
+    parser.add_argument('--incremental',
+                        action='store_true',
+                        help='Only fetch Elsevier API records added to Scopus since the last harvest of the same '
+                             'search query')
 
     parser.add_argument('-b', '--scopus-batch',
                         action='store_true',
                         help='Use Scopus batch export for scraping metadata')
-    parser.add_argument('--scopus-batch-file', help='Use a local .CSV dump instead of exporting from Scopus')
+    parser.add_argument('--scopus-batch-concurrency',
+                        type=int,
+                        default=ScopusScraper.DEFAULT_MAX_CONCURRENCY,
+                        help='Maximum number of Scopus batch export requests sent at the same time (default: 4)')
+    parser.add_argument('--scopus-batch-profile',
+                        choices=[p.value for p in ExportProfile],
+                        default=ExportProfile.DATABASE.value,
+                        help='Field groups exported by Scopus batch export: "minimal" (enough for the charts), '
+                             '"database" (everything stored in the database) or "full" (default: database)')
+    parser.add_argument('--resume',
+                        action='store_true',
+                        help='Continue an interrupted Scopus batch export of the same search query, instead of '
+                             'starting it again')
+    parser.add_argument('--skip-known-eids',
+                        action='store_true',
+                        help='Do not export Scopus batch documents which are already stored in the database')
+    parser.add_argument('--scopus-batch-file',
+                        help='Use local .CSV dumps instead of exporting from Scopus: a file, a directory '
+                             '(its .csv files) or a glob pattern')
+    parser.add_argument('--scopus-batch-parse-workers',
+                        type=int,
+                        default=1,
+                        help='Number of processes parsing the --scopus-batch-file dumps (default: 1)')
+    parser.add_argument('--scopus-batch-cache',
+                        help='Path to a file where the publications parsed from --scopus-batch-file dumps are cached, '
+                             'so the same dump is not parsed again')
     parser.add_argument('--scopus-batch-output',
                         help='Path to a file where raw data fetched from Scopus batch export will be saved. '
                              'File type: CSV.')
@@ -60,10 +125,23 @@ async def main():
 
     use_scopus = args.scopus_api or args.all
     scopus_api_output_path = args.scopus_api_output
+    scopus_api_concurrency = args.scopus_api_concurrency
+    scopus_api_pagination = PaginationMode.CURSOR if args.scopus_api_cursor else PaginationMode.OFFSET
+    scopus_api_cache_path = args.scopus_api_cache
+    scopus_api_cache_ttl = args.scopus_api_cache_ttl
+    scopus_api_fields = scopusAPIConsumedFields() if args.scopus_api_stored_fields else None
+    scopus_api_incremental = args.incremental
+    shard_by_year = args.shard_by_year
 
     use_scopus_batch = args.scopus_batch or args.all
     scopus_batch_input_file = args.scopus_batch_file
+    scopus_batch_concurrency = args.scopus_batch_concurrency
+    scopus_batch_profile = ExportProfile(args.scopus_batch_profile)
+    scopus_batch_resume = args.resume
+    scopus_batch_skip_eids = getKnownEids if args.skip_known_eids else None
     scopus_batch_output_path = args.scopus_batch_output
+    scopus_batch_parse_workers = args.scopus_batch_parse_workers
+    scopus_batch_cache_path = args.scopus_batch_cache
 
     use_gscholar = args.google_scholar or args.all
 
@@ -71,29 +149,106 @@ async def main():
                                             search_query=search_query,
                                             proxies=prod_proxies,
                                             debug_proxy=debug_proxy)
-    scrapers_tasks = []
-    if use_gscholar:
-        scrapers_tasks.append(gscholar.use(fetcher_options))
+    with app.app_context():
+        init_app(app)
 
-    if use_scopus_batch:
-        scrapers_tasks.append(scopus_batch.use(fetcher_options,
-                                               raw_output_path=scopus_batch_output_path,
-                                               input_file_path=scopus_batch_input_file))
-    if use_scopus:
-        scrapers_tasks.append(elsevier_api.use(fetcher_options,
-                                               output_path=scopus_api_output_path))
+        scopus_api_insert_id = None
+        scopus_api_max_cover_date = None
+        scopus_api_started = datetime.now(timezone.utc)
+        scopus_api_loaded_after = None
+        if use_scopus:
+            logger.info(f'Decoding Elsevier API responses with {FAST_BACKEND}')
+        if use_scopus and scopus_api_incremental:
+            scopus_api_loaded_after = getIncrementalStartDate('Scopus', search_query)
+            if scopus_api_loaded_after is None:
+                logger.info('The search query was not harvested before, fetching all Elsevier API records')
+            else:
+                logger.info(f'Fetching Elsevier API records loaded after {scopus_api_loaded_after}')
 
-    # noinspection PyTypeChecker
-    done_tasks: list[FetcherModuleResult] = await asyncio.gather(*scrapers_tasks)
+        def insert_scopus_api_batch(batch: list[SearchEntry]):
+            # Elsevier API results are inserted page by page, as soon as they arrive
+            nonlocal scopus_api_insert_id, scopus_api_max_cover_date
+            if scopus_api_insert_id is None:
+                scopus_api_insert_id = scopusAPIBeginInsert()
+            scopusAPIInsertOptimised(batch, insert_id=scopus_api_insert_id)
+            cover_dates = [e.cover_date for e in batch if e.cover_date]
+            if cover_dates:
+                scopus_api_max_cover_date = max(cover_dates + [scopus_api_max_cover_date or ''])
+
+        scopus_batch_insert_id = None
+
+        def insert_scopus_batch_batch(batch: list[Publication]):
+            # Scopus batch exports are inserted while they are parsed, a batch of publications at a time
+            nonlocal scopus_batch_insert_id
+            if scopus_batch_insert_id is None:
+                scopus_batch_insert_id = scopusBatchBeginInsert()
+            scopusBatchInsertOptimised(batch, insert_id=scopus_batch_insert_id)
+
+        def is_scopus_batch_imported(fingerprint: str) -> bool:
+            insert_id = getInsertByFingerprint('Scopus', fingerprint)
+            if insert_id is not None:
+                logger.info(f'The Scopus batch data was already imported (InsertLog {insert_id})')
+            return insert_id is not None
+
+        def save_scopus_batch_fingerprint(fingerprint: str):
+            # Only complete imports are recorded, an interrupted one is imported again (the difference)
+            if scopus_batch_insert_id is not None:
+                saveInsertFingerprint(scopus_batch_insert_id, fingerprint)
+
+        def end_scopus_batch_import():
+            # Every dump of a directory is a separate import, also after a dump which failed
+            nonlocal scopus_batch_insert_id
+            scopus_batch_insert_id = None
+
+        scrapers_tasks = []
+        if use_gscholar:
+            scrapers_tasks.append(gscholar.use(fetcher_options))
+
+        if use_scopus_batch:
+            scrapers_tasks.append(scopus_batch.use(fetcher_options,
+                                                   raw_output_path=scopus_batch_output_path,
+                                                   input_file_path=scopus_batch_input_file,
+                                                   concurrency=scopus_batch_concurrency,
+                                                   shard_by_year=shard_by_year,
+                                                   profile=scopus_batch_profile,
+                                                   resume=scopus_batch_resume,
+                                                   skip_eids=scopus_batch_skip_eids,
+                                                   on_batch=insert_scopus_batch_batch,
+                                                   fields=scopusBatchConsumedFields(),
+                                                   parse_workers=scopus_batch_parse_workers,
+                                                   cache_path=scopus_batch_cache_path,
+                                                   is_imported=is_scopus_batch_imported,
+                                                   on_imported=save_scopus_batch_fingerprint,
+                                                   on_import_end=end_scopus_batch_import))
+        if use_scopus:
+            scrapers_tasks.append(elsevier_api.use(fetcher_options,
+                                                   output_path=scopus_api_output_path,
+                                                   concurrency=scopus_api_concurrency,
+                                                   pagination=scopus_api_pagination,
+                                                   cache_path=scopus_api_cache_path,
+                                                   cache_ttl=scopus_api_cache_ttl,
+                                                   fields=scopus_api_fields,
+                                                   loaded_after=scopus_api_loaded_after,
+                                                   shard_by_year=shard_by_year,
+                                                   on_batch=insert_scopus_api_batch))
+
+        # noinspection PyTypeChecker
+        done_tasks: list[FetcherModuleResult] = await asyncio.gather(*scrapers_tasks)
 
-    with app.app_context():
-        init_app(app)
         for task in done_tasks:
             if task.module == 'cli.elsevier_api':
                 e_msg = task.get_error_message()
                 if e_msg:
                     logger.error(e_msg)
-                scopusAPIInsertOptimised(task.results)
+                elif not task.complete:
+                    # A watermark would make the next incremental runs skip the records which were not fetched
+                    logger.warning('The Elsevier API harvest is incomplete, its watermark is not saved. '
+                                   'Use --scopus-api-cursor or --shard-by-year to fetch all the results.')
+                else:
+                    # The next incremental run continues from here
+                    saveHarvestWatermark('Scopus', search_query, scopus_api_started,
+                                         max_cover_date=scopus_api_max_cover_date,
+                                         insert_id=scopus_api_insert_id)
             elif task.module == 'cli.gscholar':
                 e_msg = task.get_error_message()
                 if e_msg:
@@ -104,7 +259,11 @@ async def main():
                 e_msg = task.get_error_message()
                 if e_msg:
                     logger.error(e_msg)
-                scopusBatchInsertOptimised(task.results)
 
 
-asyncio.run(main())
+if __name__ == '__main__':
+    # In the frozen (PyInstaller) executable, the processes parsing Scopus batch dumps start here as well:
+    # freeze_support runs the worker and exits instead of running the CLI again
+    multiprocessing.freeze_support()
+    # The guard keeps the processes parsing Scopus batch dumps from running the CLI again
+    asyncio.run(main())